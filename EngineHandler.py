@@ -1,17 +1,38 @@
 from engine import engine_process_main
 import shared
 import multiprocessing as mp
+import atexit
 
-def GetBestMove(board, color, depth=4, time_limit=100.0):
-    task_q = mp.Queue()
-    user_interrupt_q = mp.Queue()
-    result_q = mp.Queue()
+# The engine process (and the worker pool it owns) is started on the first GetBestMove call
+# and kept alive between moves, so only the first search pays for process startup.
+_engine = None   # (engine_proc, task_q, user_interrupt_q, result_q)
+
+
+def _get_engine():
+    global _engine
+    if _engine is None or not _engine[0].is_alive():
+        task_q = mp.Queue()
+        user_interrupt_q = mp.Queue()
+        result_q = mp.Queue()
 
-    engine_proc = mp.Process(target=engine_process_main, args=(task_q, user_interrupt_q, result_q))
-    engine_proc.start()
+        engine_proc = mp.Process(target=engine_process_main, args=(task_q, user_interrupt_q, result_q))
+        engine_proc.start()
+        # registered after start() so it runs before multiprocessing's own exit hook,
+        # which would otherwise wait forever on the still-running engine process
+        atexit.register(Shutdown)
+        _engine = (engine_proc, task_q, user_interrupt_q, result_q)
+    return _engine
+
+
+def GetBestMove(board, color, depth=4, time_limit=100.0):
+    engine_proc, task_q, user_interrupt_q, result_q = _get_engine()
 
     # send search task
-    task_q.put(("SEARCH", shared.current_board_arrangement.copy(), "black", depth, None)) # You can replace None with time_limit (not recommended, as it causes errors)
+    if isinstance(board, str):
+        # FEN: side to move, castling rights and en passant travel with the position
+        task_q.put(("SEARCH", board, depth, time_limit))
+    else:
+        task_q.put(("SEARCH", shared.current_board_arrangement.copy(), "black", depth, time_limit)) # depth is the maximum depth, time_limit the per-move budget (None = no limit)
 
 
     # wait for engine result
@@ -20,18 +41,29 @@ def GetBestMove(board, color, depth=4, time_limit=100.0):
 
     print("Engine best:", from_sq, to_sq, "score", score)
 
-    # --- update shared.py board ---
-    piece = shared.current_board_arrangement[from_sq]
-    shared.current_board_arrangement[to_sq] = piece
-    shared.current_board_arrangement[from_sq] = "empty"
+    # --- update shared.py board (a FEN search is independent of it) ---
+    if not isinstance(board, str):
+        piece = shared.current_board_arrangement[from_sq]
+        shared.current_board_arrangement[to_sq] = piece
+        shared.current_board_arrangement[from_sq] = "empty"
 
     # now shared.current_board_arrangement contains the new board
 
-    # quit engine process
-    task_q.put(("QUIT",))
-    engine_proc.join()
-
     return from_sq, to_sq, score
 
+
+def Shutdown():
+    # quit engine process
+    global _engine
+    if _engine is not None:
+        engine_proc, task_q, _, _ = _engine
+        _engine = None
+        atexit.unregister(Shutdown)
+        if engine_proc.is_alive():
+            task_q.put(("QUIT",))
+            engine_proc.join(5.0)
+            if engine_proc.is_alive():
+                engine_proc.terminate()
+
 if __name__ == "__main__":
     ...
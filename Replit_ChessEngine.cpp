@@ -15,9 +15,21 @@
 #include <queue>
 #include <unordered_map>
 #include <cstring>
+#include <memory>
+#include <cstdint>
+#include <functional>
+#include <condition_variable>
 
 #include <cctype>
 
+// Exported C entry points (loaded with ctypes, see native.py): dllexport on Windows, default
+// visibility elsewhere, so the Makefile's -fvisibility=hidden keeps everything else private.
+#if defined(_WIN32)
+#define ENGINE_EXPORT extern "C" __declspec(dllexport)
+#else
+#define ENGINE_EXPORT extern "C" __attribute__((visibility("default")))
+#endif
+
 // #include <nlohmann/json.hpp>
 // #include "engine.cpp" // or wherever engine_search_legacy is declared
 
@@ -75,8 +87,9 @@ struct GameState {
     Board board;
     CastlingRights castling;
     int8_t en_passant; // -1 or 0-63
+    uint64_t key;      // Zobrist key, side to move included (compute_key, then apply_move)
     
-    GameState() : en_passant(-1) {}
+    GameState() : en_passant(-1), key(0) {}
 };
 
 // ============================================================================
@@ -107,7 +120,7 @@ inline string square_to_string(int sq) {
 
 // Piece type helpers
 inline bool is_white(Piece p) { return p >= W_PAWN && p <= W_KING; }
-inline bool is_black(Piece p) { return p >= B_PAWN && p <= B_QUEEN; }
+inline bool is_black(Piece p) { return p >= B_PAWN && p <= B_KING; }
 inline bool is_piece_empty(Piece p) { return p == EMPTY; }
 inline bool is_color(Piece p, bool white) { return white ? is_white(p) : is_black(p); }
 
@@ -349,6 +362,48 @@ vector<Move> generate_pseudo_legal_moves(const GameState& state, bool white) {
     return moves;
 }
 
+// ============================================================================
+// ZOBRIST KEYS
+// ============================================================================
+
+// One random 64-bit number per (piece code, square), castling rights set and en passant
+// square, and one for black to move; a position's key is the XOR of those that apply.
+// apply_move updates GameState::key as it moves pieces, so no node hashes the whole board.
+struct ZobristKeys {
+    uint64_t pieces[16][64];
+    uint64_t castling[16];
+    uint64_t en_passant[64];
+    uint64_t black_to_move;
+
+    ZobristKeys() {
+        uint64_t seed = 0;   // fixed seed: the same keys in every run (splitmix64)
+        auto next = [&seed]() {
+            uint64_t z = (seed += 0x9E3779B97F4A7C15ULL);
+            z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+            z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+            return z ^ (z >> 31);
+        };
+        for (auto& square_keys : pieces)
+            for (auto& key : square_keys) key = next();
+        for (auto& key : castling) key = next();
+        for (auto& key : en_passant) key = next();
+        black_to_move = next();
+    }
+};
+
+const ZobristKeys ZOBRIST;
+
+// The full key of state with white (or black) to move; apply_move keeps it up to date from there
+uint64_t compute_key(const GameState& state, bool white) {
+    uint64_t key = ZOBRIST.castling[state.castling.rights & 15];
+    for (int sq = 0; sq < 64; ++sq) {
+        if (!is_piece_empty(state.board[sq])) key ^= ZOBRIST.pieces[state.board[sq]][sq];
+    }
+    if (state.en_passant >= 0) key ^= ZOBRIST.en_passant[state.en_passant];
+    if (!white) key ^= ZOBRIST.black_to_move;
+    return key;
+}
+
 // ============================================================================
 // MOVE SIMULATION & VALIDATION
 // ============================================================================
@@ -453,9 +508,17 @@ bool is_in_check(const Board& board, bool white) {
 GameState apply_move(const GameState& state, const Move& move) {
     GameState new_state = state;
     
+    // every square change goes through here to keep the Zobrist key in step
+    auto set_square = [&new_state](int sq, Piece p) {
+        if (!is_piece_empty(new_state.board[sq])) new_state.key ^= ZOBRIST.pieces[new_state.board[sq]][sq];
+        new_state.board[sq] = p;
+        if (!is_piece_empty(p)) new_state.key ^= ZOBRIST.pieces[p][sq];
+    };
+    
     Piece piece = new_state.board[move.from];
-    new_state.board[move.to] = piece;
-    new_state.board[move.from] = EMPTY;
+    Piece captured = state.board[move.to];
+    set_square(move.to, piece);
+    set_square(move.from, EMPTY);
     
     bool white = is_white(piece);
     int ptype = piece_type(piece);
@@ -467,17 +530,17 @@ GameState apply_move(const GameState& state, const Move& move) {
         
         // Handle castling rook move
         if (white && move.from == 4 && move.to == 6) { // White O-O
-            new_state.board[7] = EMPTY;
-            new_state.board[5] = W_ROOK;
+            set_square(7, EMPTY);
+            set_square(5, W_ROOK);
         } else if (white && move.from == 4 && move.to == 2) { // White O-O-O
-            new_state.board[0] = EMPTY;
-            new_state.board[3] = W_ROOK;
+            set_square(0, EMPTY);
+            set_square(3, W_ROOK);
         } else if (!white && move.from == 60 && move.to == 62) { // Black O-O
-            new_state.board[63] = EMPTY;
-            new_state.board[61] = B_ROOK;
+            set_square(63, EMPTY);
+            set_square(61, B_ROOK);
         } else if (!white && move.from == 60 && move.to == 58) { // Black O-O-O
-            new_state.board[56] = EMPTY;
-            new_state.board[59] = B_ROOK;
+            set_square(56, EMPTY);
+            set_square(59, B_ROOK);
         }
     } else if (ptype == 4) { // rook moved
         if (white) {
@@ -490,7 +553,6 @@ GameState apply_move(const GameState& state, const Move& move) {
     }
     
     // Rook captured
-    Piece captured = state.board[move.to];
     if (piece_type(captured) == 4) {
         if (move.to == 0) new_state.castling.set(true, false, false);
         else if (move.to == 7) new_state.castling.set(true, true, false);
@@ -512,10 +574,15 @@ GameState apply_move(const GameState& state, const Move& move) {
         // En passant capture
         if (move.to == state.en_passant) {
             int victim_rank = white ? to_rank - 1 : to_rank + 1;
-            new_state.board[make_square(square_to_file(move.to), victim_rank)] = EMPTY;
+            set_square(make_square(square_to_file(move.to), victim_rank), EMPTY);
         }
     }
     
+    new_state.key ^= ZOBRIST.castling[state.castling.rights & 15] ^ ZOBRIST.castling[new_state.castling.rights & 15];
+    if (state.en_passant >= 0) new_state.key ^= ZOBRIST.en_passant[state.en_passant];
+    if (new_state.en_passant >= 0) new_state.key ^= ZOBRIST.en_passant[new_state.en_passant];
+    new_state.key ^= ZOBRIST.black_to_move;
+    
     return new_state;
 }
 
@@ -569,10 +636,36 @@ int move_score_for_ordering(const Board& board, const Move& move) {
     return score;
 }
 
-void order_moves(const Board& board, vector<Move>& moves) {
+// History heuristic: quiet moves that caused cutoffs in earlier searches are tried first.
+// One table per search thread, kept by the engine handle between searches.
+struct HistoryTable {
+    int scores[64][64];
+
+    HistoryTable() { clear(); }
+    void clear() { memset(scores, 0, sizeof(scores)); }
+    void age() {
+        for (int from = 0; from < 64; ++from)
+            for (int to = 0; to < 64; ++to) scores[from][to] /= 2;
+    }
+    void reward(const Move& move, int depth) {
+        int& score = scores[move.from][move.to];
+        score += depth * depth;
+        if (score > HISTORY_MAX) age();
+    }
+    static const int HISTORY_MAX = 1 << 20;
+};
+
+// Captures above quiet moves (which the history table sorts, when there is one)
+static const int CAPTURE_ORDER_BONUS = 1 << 24;
+
+void order_moves(const Board& board, vector<Move>& moves, const HistoryTable* history = nullptr) {
     // Simple ordering: captures first (better moves earlier)
-    sort(moves.begin(), moves.end(), [&board](const Move& a, const Move& b) {
-        return move_score_for_ordering(board, a) > move_score_for_ordering(board, b);
+    auto key = [&board, history](const Move& m) {
+        if (!is_piece_empty(board[m.to])) return CAPTURE_ORDER_BONUS + move_score_for_ordering(board, m);
+        return history ? history->scores[m.from][m.to] : 0;
+    };
+    sort(moves.begin(), moves.end(), [&key](const Move& a, const Move& b) {
+        return key(a) > key(b);
     });
 }
 
@@ -580,46 +673,120 @@ void order_moves(const Board& board, vector<Move>& moves) {
 // TRANSPOSITION TABLE
 // ============================================================================
 
-// Simple zobrist hashing for board positions
-struct TranspositionEntry {
-    uint64_t hash;
-    double score;
+// One table shared by all the search threads, sized at runtime (engine_set_hash). Buckets
+// of four entries fill one 64-byte cache line; an entry holds score, depth, bound, age and
+// best move, and the replacement policy evicts entries of older searches first and
+// shallower ones second. There are no locks: an entry is two words, key ^ data and data,
+// so an entry torn by two threads writing at once no longer matches its key and reads as
+// a miss.
+
+const int TT_EXACT = 1, TT_LOWER = 2, TT_UPPER = 3;   // 0 = empty slot
+const int DEFAULT_HASH_MB = 16;
+
+struct TTEntry {
+    int score;   // from the view of the side to move
     int depth;
-    
-    TranspositionEntry() : hash(0), score(0), depth(-1) {}
+    int bound;
+    int move;    // pack_move, 0 for none
 };
 
+// a Move in 16 bits (the table's best move); 0 is no move
+inline int pack_move(const Move& move) { return move.from | move.to << 6; }
+
 class TranspositionTable {
-    static const int TABLE_SIZE = 1048576; // 1M entries
-    TranspositionEntry table[TABLE_SIZE];
-    
 public:
-    bool probe(uint64_t hash, int depth, double& score) {
-        int index = hash % TABLE_SIZE;
-        if (table[index].hash == hash && table[index].depth >= depth) {
-            score = table[index].score;
-            return true;
+    explicit TranspositionTable(size_t size_mb = DEFAULT_HASH_MB) { resize(size_mb); }
+
+    // size_mb 0 disables the table; not while a search runs
+    void resize(size_t size_mb) {
+        size_t fit = size_mb * 1024 * 1024 / sizeof(Bucket);
+        n_buckets = 0;
+        if (fit > 0) {
+            n_buckets = 1;   // a power of two, so the index is key & (n_buckets - 1)
+            while (n_buckets * 2 <= fit) n_buckets *= 2;
+        }
+        buckets.reset(n_buckets ? new Bucket[n_buckets]() : nullptr);
+        age = 0;
+    }
+
+    void clear() {
+        for (size_t i = 0; i < n_buckets; ++i) {
+            for (Slot& slot : buckets[i].slots) {
+                slot.check.store(0, memory_order_relaxed);
+                slot.data.store(0, memory_order_relaxed);
+            }
+        }
+        age = 0;
+    }
+
+    // entries of earlier searches are replaced first
+    void new_search() { age = (age + 1) & AGE_MASK; }
+
+    bool probe(uint64_t key, TTEntry& entry) const {
+        if (n_buckets == 0) return false;
+        const Bucket& bucket = buckets[key & (n_buckets - 1)];
+        for (const Slot& slot : bucket.slots) {
+            uint64_t data = slot.data.load(memory_order_relaxed);
+            if (data != 0 && (slot.check.load(memory_order_relaxed) ^ data) == key) {
+                entry.score = static_cast<int32_t>(data & 0xFFFFFFFF);
+                entry.move = static_cast<int>((data >> 32) & 0xFFFF);
+                entry.depth = static_cast<int>((data >> 48) & 0xFF);
+                entry.bound = static_cast<int>((data >> 56) & 3);
+                return true;
+            }
         }
         return false;
     }
-    
-    void store(uint64_t hash, int depth, double score) {
-        int index = hash % TABLE_SIZE;
-        if (table[index].depth <= depth) {
-            table[index].hash = hash;
-            table[index].depth = depth;
-            table[index].score = score;
+
+    void store(uint64_t key, int depth, int bound, int score, int move) {
+        if (n_buckets == 0) return;
+        Bucket& bucket = buckets[key & (n_buckets - 1)];
+        Slot* victim = nullptr;
+        int victim_worth = 0;
+        for (Slot& slot : bucket.slots) {
+            uint64_t data = slot.data.load(memory_order_relaxed);
+            if (data == 0 || (slot.check.load(memory_order_relaxed) ^ data) == key) {
+                if (data != 0 && move == 0) move = static_cast<int>((data >> 32) & 0xFFFF);   // keep the old best move
+                victim = &slot;
+                break;
+            }
+            // stale entries are worth less than any entry from the current search
+            int worth = static_cast<int>((data >> 48) & 0xFF) - (((data >> 58) & AGE_MASK) != age ? 256 : 0);
+            if (victim == nullptr || worth < victim_worth) {
+                victim = &slot;
+                victim_worth = worth;
+            }
         }
+        uint64_t data = static_cast<uint32_t>(score)
+                      | static_cast<uint64_t>(move & 0xFFFF) << 32
+                      | static_cast<uint64_t>(min(max(depth, 0), 0xFF)) << 48
+                      | static_cast<uint64_t>(bound) << 56
+                      | static_cast<uint64_t>(age) << 58;
+        victim->check.store(key ^ data, memory_order_relaxed);
+        victim->data.store(data, memory_order_relaxed);
     }
+
+private:
+    static const uint32_t AGE_MASK = 0x3F;
+
+    struct Slot {
+        atomic<uint64_t> check;   // key ^ data
+        atomic<uint64_t> data;    // score (32) | move (16) | depth (8) | bound (2) | age (6)
+    };
+    struct alignas(64) Bucket {
+        Slot slots[4];
+    };
+
+    unique_ptr<Bucket[]> buckets;
+    size_t n_buckets = 0;
+    uint32_t age = 0;
 };
 
-// Simple hash function (Zobrist would be better but this is simpler)
-uint64_t hash_board(const Board& board) {
-    uint64_t h = 0;
-    for (int sq = 0; sq < 64; ++sq) {
-        h = h * 31 + board[sq];
-    }
-    return h;
+// A bound from one side's view as seen from the other: lower and upper swap
+inline int flip_bound(int bound) {
+    if (bound == TT_LOWER) return TT_UPPER;
+    if (bound == TT_UPPER) return TT_LOWER;
+    return bound;
 }
 
 // ============================================================================
@@ -629,20 +796,36 @@ uint64_t hash_board(const Board& board) {
 double minimax(const GameState& state, bool maximizing_player, bool current_player, 
                int depth, double alpha, double beta, 
                const atomic<bool>* stop_event = nullptr,
-               TranspositionTable* tt_table = nullptr) {
+               TranspositionTable* tt_table = nullptr,
+               HistoryTable* history = nullptr) {
     
     if (stop_event && stop_event->load()) return 0.0;
     
     if (depth == 0) {
-        return evaluate_position(state.board);
+        // evaluate_position is from white's view
+        double eval = evaluate_position(state.board);
+        return maximizing_player ? eval : -eval;
     }
     
-    // Transposition table lookup
+    const double alpha_orig = alpha, beta_orig = beta;
+    // the table keeps scores and bounds from the side to move's view (the evaluation is
+    // symmetric), so one table serves searches for either colour
+    const bool maximizing = current_player == maximizing_player;
+    
+    // Transposition table lookup: a deep enough entry whose bound settles this window
+    // returns at once; any entry's best move is tried first
+    int hash_move = 0;
     if (tt_table) {
-        uint64_t hash = hash_board(state.board);
-        double tt_score;
-        if (tt_table->probe(hash, depth, tt_score)) {
-            return tt_score;
+        TTEntry entry;
+        if (tt_table->probe(state.key, entry)) {
+            hash_move = entry.move;
+            if (entry.depth >= depth) {
+                double score = maximizing ? entry.score : -entry.score;
+                int bound = maximizing ? entry.bound : flip_bound(entry.bound);
+                if (bound == TT_EXACT || (bound == TT_LOWER && score >= beta) || (bound == TT_UPPER && score <= alpha)) {
+                    return score;
+                }
+            }
         }
     }
     
@@ -660,9 +843,15 @@ double minimax(const GameState& state, bool maximizing_player, bool current_play
     }
     
     // Move ordering
-    order_moves(state.board, legal_moves);
+    order_moves(state.board, legal_moves, history);
+    if (hash_move != 0) {
+        auto it = find_if(legal_moves.begin(), legal_moves.end(),
+                          [hash_move](const Move& m) { return pack_move(m) == hash_move; });
+        if (it != legal_moves.end()) rotate(legal_moves.begin(), it, it + 1);
+    }
     
     double value;
+    Move best_move = legal_moves[0];
     
     if (current_player == maximizing_player) {
         value = -numeric_limits<double>::infinity();
@@ -671,11 +860,17 @@ double minimax(const GameState& state, bool maximizing_player, bool current_play
             
             GameState new_state = apply_move(state, move);
             double score = minimax(new_state, maximizing_player, !current_player, 
-                                 depth - 1, alpha, beta, stop_event, tt_table);
+                                 depth - 1, alpha, beta, stop_event, tt_table, history);
             
-            value = max(value, score);
+            if (score > value) {
+                value = score;
+                best_move = move;
+            }
             alpha = max(alpha, value);
-            if (alpha >= beta) break; // Beta cutoff
+            if (alpha >= beta) { // Beta cutoff
+                if (history && is_piece_empty(state.board[move.to])) history->reward(move, depth);
+                break;
+            }
         }
     } else {
         value = numeric_limits<double>::infinity();
@@ -684,18 +879,30 @@ double minimax(const GameState& state, bool maximizing_player, bool current_play
             
             GameState new_state = apply_move(state, move);
             double score = minimax(new_state, maximizing_player, !current_player, 
-                                 depth - 1, alpha, beta, stop_event, tt_table);
+                                 depth - 1, alpha, beta, stop_event, tt_table, history);
             
-            value = min(value, score);
+            if (score < value) {
+                value = score;
+                best_move = move;
+            }
             beta = min(beta, value);
-            if (alpha >= beta) break; // Alpha cutoff
+            if (alpha >= beta) { // Alpha cutoff
+                if (history && is_piece_empty(state.board[move.to])) history->reward(move, depth);
+                break;
+            }
         }
     }
     
-    // Store in transposition table
-    if (tt_table) {
-        uint64_t hash = hash_board(state.board);
-        tt_table->store(hash, depth, value);
+    // Store in transposition table, with the bound a cut-off value gives; nothing from an
+    // interrupted search
+    if (tt_table && !(stop_event && stop_event->load())) {
+        int bound = value <= alpha_orig ? TT_UPPER : (value >= beta_orig ? TT_LOWER : TT_EXACT);
+        int score = static_cast<int>(value);
+        if (!maximizing) {
+            score = -score;
+            bound = flip_bound(bound);
+        }
+        tt_table->store(state.key, depth, bound, score, pack_move(best_move));
     }
     
     return value;
@@ -713,13 +920,15 @@ tuple<Move, double> engine_search(const GameState& state, bool white, int depth,
         if (max_workers <= 0) max_workers = 1;
     }
     
-    vector<Move> root_moves = generate_legal_moves(state, white);
+    GameState root = state;
+    root.key = compute_key(root, white);
+    vector<Move> root_moves = generate_legal_moves(root, white);
     if (root_moves.empty()) {
         return make_tuple(Move(), numeric_limits<double>::quiet_NaN());
     }
     
     // Order root moves for better early results
-    order_moves(state.board, root_moves);
+    order_moves(root.board, root_moves);
     
     const int n_moves = root_moves.size();
     const int n_workers = min(max_workers, n_moves);
@@ -730,10 +939,11 @@ tuple<Move, double> engine_search(const GameState& state, bool white, int depth,
     
     auto start_time = chrono::steady_clock::now();
     
+    // One TT for the workers of this search
+    TranspositionTable tt(DEFAULT_HASH_MB);
+    
     // Worker function
     auto worker = [&](int worker_id) {
-        TranspositionTable tt; // Each worker gets its own TT
-        
         while (true) {
             if (stop_flag.load()) break;
             
@@ -749,7 +959,7 @@ tuple<Move, double> engine_search(const GameState& state, bool white, int depth,
                 }
             }
             
-            GameState new_state = apply_move(state, root_moves[idx]);
+            GameState new_state = apply_move(root, root_moves[idx]);
             double score = minimax(new_state, white, !white, depth - 1, 
                                  -numeric_limits<double>::infinity(), 
                                  numeric_limits<double>::infinity(), 
@@ -788,6 +998,167 @@ tuple<Move, double> engine_search(const GameState& state, bool white, int depth,
     return make_tuple(Move(), numeric_limits<double>::quiet_NaN());
 }
 
+// ============================================================================
+// PERSISTENT ENGINE (thread pool and tables kept between searches)
+// ============================================================================
+
+// Fixed set of search threads fed from a job queue; jobs get the index of the thread
+// running them, so each can use that thread's tables.
+class SearchThreadPool {
+public:
+    explicit SearchThreadPool(int n_threads) {
+        for (int i = 0; i < n_threads; ++i) {
+            threads.emplace_back([this, i]() { run(i); });
+        }
+    }
+
+    ~SearchThreadPool() {
+        {
+            lock_guard<mutex> lock(mtx);
+            quitting = true;
+        }
+        job_ready.notify_all();
+        for (auto& t : threads) t.join();
+    }
+
+    int size() const { return static_cast<int>(threads.size()); }
+
+    void submit(function<void(int)> job) {
+        {
+            lock_guard<mutex> lock(mtx);
+            jobs.push(std::move(job));
+            ++pending;
+        }
+        job_ready.notify_one();
+    }
+
+    // Wait until every submitted job is done; false if seconds (>= 0) ran out first
+    bool wait_idle(double seconds = -1.0) {
+        unique_lock<mutex> lock(mtx);
+        auto idle = [this]() { return pending == 0; };
+        if (seconds < 0) {
+            all_done.wait(lock, idle);
+            return true;
+        }
+        return all_done.wait_for(lock, chrono::duration<double>(seconds), idle);
+    }
+
+private:
+    void run(int index) {
+        while (true) {
+            function<void(int)> job;
+            {
+                unique_lock<mutex> lock(mtx);
+                job_ready.wait(lock, [this]() { return quitting || !jobs.empty(); });
+                if (jobs.empty()) return;   // quitting
+                job = std::move(jobs.front());
+                jobs.pop();
+            }
+            job(index);
+            {
+                lock_guard<mutex> lock(mtx);
+                if (--pending == 0) all_done.notify_all();
+            }
+        }
+    }
+
+    vector<thread> threads;
+    queue<function<void(int)>> jobs;
+    mutex mtx;
+    condition_variable job_ready, all_done;
+    int pending = 0;
+    bool quitting = false;
+};
+
+// What engine_create hands out: the thread pool, the transposition table its threads share
+// and one history table per thread, so consecutive searches in a game start with warm tables.
+struct EngineHandle {
+    SearchThreadPool pool;
+    TranspositionTable tt;
+    vector<unique_ptr<HistoryTable>> history;
+    uint64_t searches;          // generation of the last search started (under search_mutex)
+    atomic<uint64_t> running;   // generation of the running search, 0 while idle
+    atomic<uint64_t> stopped;   // generation engine_stop was last aimed at
+    mutex search_mutex;   // one search at a time per handle
+
+    explicit EngineHandle(int n_threads)
+        : pool(n_threads), tt(DEFAULT_HASH_MB), searches(0), running(0), stopped(0) {
+        for (int i = 0; i < n_threads; ++i) {
+            history.emplace_back(new HistoryTable());
+        }
+    }
+
+    void new_game() {
+        tt.clear();
+        for (auto& h : history) h->clear();
+    }
+};
+
+// How often a handle search looks for engine_stop and its time limit (seconds)
+static const double STOP_POLL_INTERVAL = 0.01;
+
+// engine_search on the handle's threads and tables; time_limit (seconds, <= 0 for none)
+// or an engine_stop aimed at this search's generation stops the threads, keeping the root
+// moves that finished
+tuple<Move, double> engine_search(EngineHandle& engine, const GameState& state, bool white, int depth,
+                                   double time_limit = -1.0) {
+    lock_guard<mutex> search_lock(engine.search_mutex);
+
+    GameState root = state;
+    root.key = compute_key(root, white);
+    vector<Move> root_moves = generate_legal_moves(root, white);
+    if (root_moves.empty()) {
+        return make_tuple(Move(), numeric_limits<double>::quiet_NaN());
+    }
+    order_moves(root.board, root_moves, engine.history[0].get());
+    for (auto& h : engine.history) h->age();
+    engine.tt.new_search();
+
+    const int n_moves = root_moves.size();
+    vector<double> scores(n_moves, numeric_limits<double>::quiet_NaN());
+    atomic<bool> stop_flag(false);
+    const uint64_t generation = ++engine.searches;
+    engine.running.store(generation);
+    auto start_time = chrono::steady_clock::now();
+
+    for (int idx = 0; idx < n_moves; ++idx) {
+        engine.pool.submit([&, idx](int worker_id) {
+            if (stop_flag.load()) return;
+            GameState new_state = apply_move(root, root_moves[idx]);
+            double score = minimax(new_state, white, !white, depth - 1,
+                                 -numeric_limits<double>::infinity(),
+                                 numeric_limits<double>::infinity(),
+                                 &stop_flag, &engine.tt,
+                                 engine.history[worker_id].get());
+            if (!stop_flag.load()) scores[idx] = score;
+        });
+    }
+
+    while (!engine.pool.wait_idle(STOP_POLL_INTERVAL)) {
+        double elapsed = chrono::duration<double>(chrono::steady_clock::now() - start_time).count();
+        if (engine.stopped.load() == generation || (time_limit > 0 && elapsed > time_limit)) {
+            stop_flag.store(true);
+            engine.pool.wait_idle();   // the jobs reference this frame: let them all return
+            break;
+        }
+    }
+    engine.running.store(0);
+
+    double best_score = -numeric_limits<double>::infinity();
+    int best_idx = -1;
+    for (int i = 0; i < n_moves; ++i) {
+        if (!isnan(scores[i]) && scores[i] > best_score) {
+            best_score = scores[i];
+            best_idx = i;
+        }
+    }
+    if (best_idx >= 0) {
+        return make_tuple(root_moves[best_idx], best_score);
+    }
+    // stopped before any root move finished: the first ordered move beats none
+    return make_tuple(root_moves[0], numeric_limits<double>::quiet_NaN());
+}
+
 // ============================================================================
 // CONVERSION UTILITIES (for interfacing with old string-based API)
 // ============================================================================
@@ -909,7 +1280,7 @@ std::map<std::string, std::string> parse_board_json(const char* json) {
     return board_map;
 }
 
-extern "C" __declspec(dllexport)
+ENGINE_EXPORT
 void get_best_move_c(const char* board_json, const char* color,
                      int depth, double time_limit, int max_workers,
                      char* move_out, double* score_out) {
@@ -927,3 +1298,206 @@ void get_best_move_c(const char* board_json, const char* color,
     strcpy(move_out, best_move.c_str());
     *score_out = score;
 }
+
+// Parse a FEN string into state (castling rights and en passant included); false if malformed
+bool parse_fen(const std::string& fen, GameState& state, bool& white) {
+    static const std::string LETTERS = "pnbrqk";   // piece_type order 1..6
+    state = GameState();
+    state.castling.rights = 0;
+
+    size_t pos = 0;
+    int rank = 7, file = 0;
+    for (; pos < fen.size() && fen[pos] != ' '; ++pos) {
+        char c = fen[pos];
+        if (c == '/') {
+            if (file != 8) return false;
+            --rank;
+            file = 0;
+        } else if (isdigit(static_cast<unsigned char>(c))) {
+            file += c - '0';
+        } else {
+            size_t type = LETTERS.find(static_cast<char>(tolower(c)));
+            if (type == std::string::npos || rank < 0 || file > 7) return false;
+            int base = isupper(static_cast<unsigned char>(c)) ? W_PAWN : B_PAWN;
+            state.board[make_square(file, rank)] = static_cast<Piece>(base + type);
+            ++file;
+        }
+        if (file > 8) return false;
+    }
+    if (rank != 0 || file != 8) return false;
+
+    // remaining fields: side, castling, en passant (clocks are not used)
+    std::string fields[3] = {"w", "-", "-"};
+    for (int i = 0; i < 3; ++i) {
+        while (pos < fen.size() && fen[pos] == ' ') ++pos;
+        size_t end = fen.find(' ', pos);
+        if (end == std::string::npos) end = fen.size();
+        if (end > pos) fields[i] = fen.substr(pos, end - pos);
+        pos = end;
+    }
+    white = fields[0] != "b";
+    for (char c : fields[1]) {
+        if (c == 'K') state.castling.set(true, true, true);
+        else if (c == 'Q') state.castling.set(true, false, true);
+        else if (c == 'k') state.castling.set(false, true, true);
+        else if (c == 'q') state.castling.set(false, false, true);
+    }
+    if (fields[2] != "-" && fields[2].size() == 2) {
+        state.en_passant = static_cast<int8_t>(make_square(toupper(fields[2][0]) - 'A', fields[2][1] - '1'));
+    }
+    return true;
+}
+
+// Same as get_best_move_c, with the position given as FEN instead of the board JSON
+ENGINE_EXPORT
+void get_best_move_fen_c(const char* fen, int depth, double time_limit, int max_workers,
+                         char* move_out, double* score_out) {
+    GameState state;
+    bool white = true;
+    if (!parse_fen(std::string(fen), state, white)) {
+        move_out[0] = '\0';
+        *score_out = 0.0;
+        return;
+    }
+
+    Move best_move;
+    double score;
+    tie(best_move, score) = engine_search(state, white, depth, time_limit, max_workers);
+
+    std::string best = square_to_string(best_move.from) + square_to_string(best_move.to);
+    strcpy(move_out, best.c_str());
+    *score_out = score;
+}
+
+// ============================================================================
+// BINARY BOARD INPUT (no JSON / FEN parsing)
+// ============================================================================
+
+// squares: 64 Piece codes indexed rank * 8 + file (A1 = 0), exactly Board::squares.
+// flags:   bits 0-3 castling (same bits as CastlingRights), bit 4 black to move,
+//          bits 8-14 en passant square + 1 (0: none).
+// Python passes Position.board (a bytearray with the same piece codes) without copying.
+static const int FLAG_BLACK_TO_MOVE = 16;
+static const int FLAG_EP_SHIFT = 8;
+
+bool parse_board_bytes(const uint8_t* squares, int flags, GameState& state, bool& white) {
+    state = GameState();
+    for (int sq = 0; sq < 64; ++sq) {
+        uint8_t code = squares[sq];
+        if (code != EMPTY && (code < W_PAWN || code > B_KING || (code > W_KING && code < B_PAWN))) return false;
+        state.board[sq] = static_cast<Piece>(code);
+    }
+    state.castling.rights = flags & 0xF;
+    int ep = ((flags >> FLAG_EP_SHIFT) & 0x7F) - 1;
+    if (ep > 63) return false;
+    state.en_passant = static_cast<int8_t>(ep);
+    white = !(flags & FLAG_BLACK_TO_MOVE);
+    return true;
+}
+
+// Same as get_best_move_fen_c, with the position as a binary board
+ENGINE_EXPORT
+void get_best_move_board_c(const uint8_t* squares, int flags, int depth, double time_limit, int max_workers,
+                           char* move_out, double* score_out) {
+    GameState state;
+    bool white = true;
+    if (!parse_board_bytes(squares, flags, state, white)) {
+        move_out[0] = '\0';
+        *score_out = 0.0;
+        return;
+    }
+
+    Move best_move;
+    double score;
+    tie(best_move, score) = engine_search(state, white, depth, time_limit, max_workers);
+
+    std::string best = square_to_string(best_move.from) + square_to_string(best_move.to);
+    strcpy(move_out, best.c_str());
+    *score_out = score;
+}
+
+// ============================================================================
+// PERSISTENT ENGINE HANDLE (load the DLL once, create one engine, search with it every move)
+// ============================================================================
+
+// n_threads <= 0 uses hardware_concurrency
+ENGINE_EXPORT
+void* engine_create(int n_threads) {
+    if (n_threads <= 0) {
+        n_threads = static_cast<int>(thread::hardware_concurrency());
+        if (n_threads <= 0) n_threads = 1;
+    }
+    return new EngineHandle(n_threads);
+}
+
+ENGINE_EXPORT
+void engine_destroy(void* handle) {
+    delete static_cast<EngineHandle*>(handle);
+}
+
+// Forget the tables (a new game; positions of the previous one won't come back)
+ENGINE_EXPORT
+void engine_new_game(void* handle) {
+    EngineHandle* engine = static_cast<EngineHandle*>(handle);
+    lock_guard<mutex> search_lock(engine->search_mutex);
+    engine->new_game();
+}
+
+// Resize the shared transposition table (DEFAULT_HASH_MB after engine_create; 0 disables it).
+// Waits for a running search; the table starts empty.
+ENGINE_EXPORT
+void engine_set_hash(void* handle, int hash_mb) {
+    EngineHandle* engine = static_cast<EngineHandle*>(handle);
+    lock_guard<mutex> search_lock(engine->search_mutex);
+    engine->tt.resize(static_cast<size_t>(max(hash_mb, 0)));
+}
+
+// Ask the running search (from another thread) to return now with what it has; does
+// nothing while the handle is idle, so no later search is affected
+ENGINE_EXPORT
+void engine_stop(void* handle) {
+    EngineHandle* engine = static_cast<EngineHandle*>(handle);
+    engine->stopped.store(engine->running.load());
+}
+
+// get_best_move_fen_c on a handle from engine_create
+ENGINE_EXPORT
+void engine_best_move_fen(void* handle, const char* fen, int depth, double time_limit,
+                          char* move_out, double* score_out) {
+    GameState state;
+    bool white = true;
+    if (!parse_fen(std::string(fen), state, white)) {
+        move_out[0] = '\0';
+        *score_out = 0.0;
+        return;
+    }
+
+    Move best_move;
+    double score;
+    tie(best_move, score) = engine_search(*static_cast<EngineHandle*>(handle), state, white, depth, time_limit);
+
+    std::string best = square_to_string(best_move.from) + square_to_string(best_move.to);
+    strcpy(move_out, best.c_str());
+    *score_out = score;
+}
+
+// get_best_move_board_c on a handle from engine_create
+ENGINE_EXPORT
+void engine_best_move_board(void* handle, const uint8_t* squares, int flags, int depth, double time_limit,
+                            char* move_out, double* score_out) {
+    GameState state;
+    bool white = true;
+    if (!parse_board_bytes(squares, flags, state, white)) {
+        move_out[0] = '\0';
+        *score_out = 0.0;
+        return;
+    }
+
+    Move best_move;
+    double score;
+    tie(best_move, score) = engine_search(*static_cast<EngineHandle*>(handle), state, white, depth, time_limit);
+
+    std::string best = square_to_string(best_move.from) + square_to_string(best_move.to);
+    strcpy(move_out, best.c_str());
+    *score_out = score;
+}
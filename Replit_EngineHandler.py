@@ -1,51 +1,152 @@
 import ctypes
 import json
-import os
 import shared
+from engine import engine_search, from_fen
+from native import board_buffer, load_library, pack_flags, position_from_dict
 
-# Load the DLL
-user = os.getlogin()
-engine = ctypes.CDLL(fr"C:\Users\{user}\AppData\Local\Python\Chess\engine.dll")
+# Load the library: CHESS_REPLIT_ENGINE_LIB, else libreplit_engine.so (replit_engine.dll) next to the package
+# (build it with make), else the old Windows install under %LOCALAPPDATA%. None: GetBestMove
+# falls back to the Python engine.
+engine = load_library("replit", ("get_best_move_c",))
+handle = None
 
-# Define argument types for clarity (optional but safer)
-engine.get_best_move_c.argtypes = [
-    ctypes.c_char_p,  # board_json
-    ctypes.c_char_p,  # color
-    ctypes.c_int,     # depth
-    ctypes.c_double,  # time_limit #c_double
-    ctypes.c_int,     # max_workers
-    ctypes.c_char_p,  # move_out
-    ctypes.POINTER(ctypes.c_double)  # score_out
-]
+if engine is not None:
+    # Define argument types for clarity (optional but safer)
+    engine.get_best_move_c.argtypes = [
+        ctypes.c_char_p,  # board_json
+        ctypes.c_char_p,  # color
+        ctypes.c_int,     # depth
+        ctypes.c_double,  # time_limit #c_double
+        ctypes.c_int,     # max_workers
+        ctypes.c_char_p,  # move_out
+        ctypes.POINTER(ctypes.c_double)  # score_out
+    ]
 
-engine.get_best_move_c.restype = None
+    engine.get_best_move_c.restype = None
+
+    # FEN entry point (castling rights and en passant included); older builds of the DLL lack it
+    if hasattr(engine, "get_best_move_fen_c"):
+        engine.get_best_move_fen_c.argtypes = [
+            ctypes.c_char_p,  # fen
+            ctypes.c_int,     # depth
+            ctypes.c_double,  # time_limit
+            ctypes.c_int,     # max_workers
+            ctypes.c_char_p,  # move_out
+            ctypes.POINTER(ctypes.c_double)  # score_out
+        ]
+        engine.get_best_move_fen_c.restype = None
+
+    # Persistent engine: threads, transposition and history tables created once and reused by
+    # every GetBestMove, so consecutive moves of a game start with warm tables
+    if hasattr(engine, "engine_create"):
+        engine.engine_create.argtypes = [ctypes.c_int]
+        engine.engine_create.restype = ctypes.c_void_p
+        engine.engine_best_move_fen.argtypes = [
+            ctypes.c_void_p,  # handle
+            ctypes.c_char_p,  # fen
+            ctypes.c_int,     # depth
+            ctypes.c_double,  # time_limit
+            ctypes.c_char_p,  # move_out
+            ctypes.POINTER(ctypes.c_double)  # score_out
+        ]
+        engine.engine_best_move_fen.restype = None
+        # binary board: the 64 piece codes and packed castling/side/en-passant flags, no JSON
+        engine.engine_best_move_board.argtypes = [
+            ctypes.c_void_p,  # handle
+            ctypes.POINTER(ctypes.c_ubyte),  # squares (Position.board, not copied)
+            ctypes.c_int,     # flags
+            ctypes.c_int,     # depth
+            ctypes.c_double,  # time_limit
+            ctypes.c_char_p,  # move_out
+            ctypes.POINTER(ctypes.c_double)  # score_out
+        ]
+        engine.engine_best_move_board.restype = None
+        engine.engine_new_game.argtypes = [ctypes.c_void_p]
+        engine.engine_new_game.restype = None
+        if hasattr(engine, "engine_set_hash"):
+            engine.engine_set_hash.argtypes = [ctypes.c_void_p, ctypes.c_int]
+            engine.engine_set_hash.restype = None
+        handle = engine.engine_create(0)  # 0: one thread per core
+
+def NewGame():
+    # the tables of the previous game are no use in the next one
+    if handle is not None:
+        engine.engine_new_game(handle)
+
+def SetHash(hash_mb):
+    # transposition table size in MB, shared by the engine's threads (0 turns it off)
+    if handle is not None and hasattr(engine, "engine_set_hash"):
+        engine.engine_set_hash(handle, hash_mb)
 
 def GetBestMove(board_dict, color, depth=4, time_limit=0.0, max_workers=8):
-    # Convert Python dict to proper JSON string
-    board_json = json.dumps(board_dict)
-    
+    # board_dict may also be a FEN string (which already names the side to move)
     # Prepare output buffer
     move_out = ctypes.create_string_buffer(32)  # adjust size if needed
     score_out = ctypes.c_double()
     
     # Call the DLL
-    engine.get_best_move_c(
-        ctypes.c_char_p(board_json.encode('utf-8')),
-        ctypes.c_char_p(color.encode('utf-8')),
-        ctypes.c_int(depth),
-        ctypes.c_double(time_limit),
-        ctypes.c_int(max_workers),
-        move_out,
-        ctypes.byref(score_out)
-    )
+    if engine is None:
+        # no native library: same move from the Python engine
+        limit = time_limit if time_limit > 0 else None
+        if isinstance(board_dict, str):
+            board, color, rights, ep = from_fen(board_dict)[:4]
+            from_sq, to_sq, score = engine_search(board, color, depth, time_limit=limit, max_workers=max_workers,
+                                                  castling_rights=rights, en_passant_target=ep)
+        else:
+            from_sq, to_sq, score = engine_search(board_dict, color, depth, time_limit=limit, max_workers=max_workers)
+        move_out.value = ((from_sq or "") + (to_sq or "")).encode()
+        score_out.value = score or 0.0
+    elif handle is not None and not isinstance(board_dict, str):
+        pos = position_from_dict(board_dict, color)
+        engine.engine_best_move_board(
+            handle,
+            board_buffer(pos),
+            ctypes.c_int(pack_flags(pos)),
+            ctypes.c_int(depth),
+            ctypes.c_double(time_limit),
+            move_out,
+            ctypes.byref(score_out)
+        )
+    elif handle is not None:
+        engine.engine_best_move_fen(
+            handle,
+            ctypes.c_char_p(board_dict.encode('utf-8')),
+            ctypes.c_int(depth),
+            ctypes.c_double(time_limit),
+            move_out,
+            ctypes.byref(score_out)
+        )
+    elif isinstance(board_dict, str):
+        engine.get_best_move_fen_c(
+            ctypes.c_char_p(board_dict.encode('utf-8')),
+            ctypes.c_int(depth),
+            ctypes.c_double(time_limit),
+            ctypes.c_int(max_workers),
+            move_out,
+            ctypes.byref(score_out)
+        )
+    else:
+        # Convert Python dict to proper JSON string
+        board_json = json.dumps(board_dict)
+        engine.get_best_move_c(
+            ctypes.c_char_p(board_json.encode('utf-8')),
+            ctypes.c_char_p(color.encode('utf-8')),
+            ctypes.c_int(depth),
+            ctypes.c_double(time_limit),
+            ctypes.c_int(max_workers),
+            move_out,
+            ctypes.byref(score_out)
+        )
     
     # Decode the move string (like "E2E4") into from/to squares
     move_str = move_out.value.decode()
     from_sq = move_str[:2]
     to_sq = move_str[2:4]
 
-    piece = shared.current_board_arrangement[from_sq]
-    shared.current_board_arrangement[from_sq] = None
-    shared.current_board_arrangement[to_sq] = piece
+    # a FEN search is independent of the shared board
+    if not isinstance(board_dict, str):
+        piece = shared.current_board_arrangement[from_sq]
+        shared.current_board_arrangement[from_sq] = None
+        shared.current_board_arrangement[to_sq] = piece
     
     return from_sq, to_sq, score_out.value
@@ -0,0 +1,196 @@
+# bench.py
+# Time-to-depth benchmark for the two parallel search modes of engine.py
+# (PARALLEL_SPLIT: one job per root move, PARALLEL_LAZY: lazy SMP with a shared hash table).
+#
+# usage: python bench.py [--depth 4] [--cores 1,2,4,8,16] [--hash 16] [--backend mailbox]
+#        python bench.py --eval [--depth 2] [--plies 100]
+#
+# Every (mode, cores) pair gets a fresh WorkerPool, so tables start cold and the numbers
+# are comparable. Times are wall-clock seconds to finish the given depth on every position.
+#
+# --eval compares the incremental material + piece-square evaluation (Position.evaluate)
+# with the previous material + mobility one (Position.evaluate_mobility): calls per second,
+# then a fixed-depth match between the two from every benchmark position with both colours.
+
+import argparse
+import time
+
+import engine
+from engine import Position, SearchState, WorkerPool, PARALLEL_MODES, move_from_strings
+
+# ---------------------------
+# Benchmark positions: opening lines played from the start position
+# ---------------------------
+
+BENCH_LINES = {
+    "start": [],
+    "open game": ["E2E4", "E7E5", "G1F3", "B8C6", "F1C4", "G8F6"],
+    "queen's gambit": ["D2D4", "D7D5", "C2C4", "E7E6", "B1C3", "G8F6", "C1G5", "F8E7"],
+    "sicilian": ["E2E4", "C7C5", "G1F3", "D7D6", "D2D4", "C5D4", "F3D4", "G8F6", "B1C3", "A7A6"],
+    "middlegame": ["E2E4", "E7E5", "G1F3", "B8C6", "F1B5", "A7A6", "B5A4", "G8F6", "E1G1", "F8E7",
+                   "F1E1", "B7B5", "A4B3", "D7D6", "C2C3", "E8G8"],
+}
+
+
+def start_position():
+    return Position.from_fen(engine.START_FEN)
+
+
+def bench_positions():
+    positions = {}
+    for name, line in BENCH_LINES.items():
+        pos = start_position()
+        for move in line:
+            pos.make_move(move_from_strings(move[:2], move[2:]))
+        positions[name] = pos.copy()
+    return positions
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def time_to_depth(pool, positions, depth, backend=None):
+    """
+    Returns (seconds, nodes, first-move cutoff rate, transposition table hit rate) to search
+    every position to depth on pool.
+    """
+    total_time = 0.0
+    total_nodes = 0
+    cutoffs = first_cutoffs = 0
+    tt_hits = tt_probes = 0
+    for pos in positions.values():
+        start = time.time()
+        engine.engine_search(pos.to_dict(), engine.COLOR_NAMES[pos.side], depth,
+                             castling_rights=pos.castling_rights_dict(),
+                             en_passant_target=pos.en_passant_square(), pool=pool, backend=backend)
+        total_time += time.time() - start
+        total_nodes += pool.nodes
+        cutoffs += pool.cutoffs
+        first_cutoffs += pool.first_cutoffs
+        tt_hits += pool.tt_hits
+        tt_probes += pool.tt_hits + pool.tt_misses
+    return (total_time, total_nodes, first_cutoffs / cutoffs if cutoffs else 0.0,
+            tt_hits / tt_probes if tt_probes else 0.0)
+
+
+# ---------------------------
+# Evaluation comparison
+# ---------------------------
+
+class MobilityPosition(Position):
+    """Position that searches with the previous (material + mobility) evaluation."""
+    __slots__ = ()
+    evaluate = Position.evaluate_mobility
+
+
+class _NeverStop:
+    def is_set(self):
+        return False
+
+
+def eval_speed(positions, seconds=1.0):
+    """Returns {name: evaluations per second} for both evaluations over positions one ply deep."""
+    sample = []
+    for pos in positions.values():
+        for move in pos.legal_moves():
+            pos.make_move(move)
+            sample.append(pos.copy())
+            pos.unmake_move()
+    rates = {}
+    for name, evaluate in (("pst", Position.evaluate), ("mobility", Position.evaluate_mobility)):
+        calls = 0
+        start = time.time()
+        while time.time() - start < seconds:
+            for pos in sample:
+                evaluate(pos, pos.side)
+            calls += len(sample)
+        rates[name] = calls / (time.time() - start)
+    return rates
+
+
+ADJUDICATE_MATERIAL = 300
+
+
+def play_game(start, white_cls, black_cls, depth, max_plies):
+    """
+    Fixed-depth game from start; returns 1 (white wins), 0.5 or 0. Games still running after
+    max_plies go to the side ahead by ADJUDICATE_MATERIAL or more in material, else are drawn.
+    """
+    pos = start.copy()
+    states = {engine.WHITE: SearchState(), engine.BLACK: SearchState()}
+    for _ in range(max_plies):
+        moves = pos.legal_moves()
+        if not moves:
+            if not pos.in_check():
+                return 0.5
+            return 0 if pos.side == engine.WHITE else 1
+        cls = white_cls if pos.side == engine.WHITE else black_cls
+        searcher = cls(pos.board, pos.side, pos.castling, pos.ep)
+        _, line, _ = engine.root_search(searcher, moves, depth, _NeverStop(), state=states[pos.side])
+        pos.make_move(line[0])
+    material = sum(engine.PIECE_VALUES_BY_TYPE[piece & 7] * (1 if piece < engine.BLACK else -1)
+                   for piece in pos.board if piece and piece & 7 != engine.KING)
+    if material >= ADJUDICATE_MATERIAL:
+        return 1
+    if material <= -ADJUDICATE_MATERIAL:
+        return 0
+    return 0.5
+
+
+def eval_match(positions, depth, max_plies):
+    """Returns (wins, draws, losses) of the piece-square evaluation against the mobility one."""
+    wins = draws = losses = 0
+    for pos in positions.values():
+        for new_is_white in (True, False):
+            if new_is_white:
+                result = play_game(pos, Position, MobilityPosition, depth, max_plies)
+            else:
+                result = 1 - play_game(pos, MobilityPosition, Position, depth, max_plies)
+            if result == 1:
+                wins += 1
+            elif result == 0:
+                losses += 1
+            else:
+                draws += 1
+    return wins, draws, losses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-depth benchmark for the parallel search modes")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--cores", default="1,2,4,8,16", help="comma separated worker counts")
+    parser.add_argument("--hash", type=int, default=engine.DEFAULT_HASH_MB, help="hash size in MB")
+    parser.add_argument("--backend", choices=engine.BOARD_BACKENDS, default=engine.BACKEND_MAILBOX)
+    parser.add_argument("--eval", action="store_true", help="compare the evaluation functions instead")
+    parser.add_argument("--plies", type=int, default=100, help="--eval: games longer than this are drawn")
+    args = parser.parse_args()
+
+    positions = bench_positions()
+    if args.eval:
+        rates = eval_speed(positions)
+        print(f"evaluations/s: pst {rates['pst']:.0f}, mobility {rates['mobility']:.0f} "
+              f"({rates['pst'] / rates['mobility']:.1f}x)")
+        wins, draws, losses = eval_match(positions, args.depth, args.plies)
+        print(f"pst vs mobility at depth {args.depth}: +{wins} ={draws} -{losses}")
+        return
+
+    cores = [int(n) for n in args.cores.split(",")]
+    print(f"{len(positions)} positions, depth {args.depth}, hash {args.hash} MB, {args.backend} backend")
+    print(f"{'mode':<6} {'cores':>5} {'time (s)':>9} {'nodes':>10} {'nps':>8} {'speedup':>8} {'1st cut':>8} {'TT hit':>7}")
+    for mode in PARALLEL_MODES:
+        base_time = None
+        for n in cores:
+            pool = WorkerPool(n, args.hash, mode)
+            try:
+                seconds, nodes, first_cut_rate, tt_hit_rate = time_to_depth(pool, positions, args.depth, args.backend)
+            finally:
+                pool.close()
+            if base_time is None:
+                base_time = seconds
+            nps = int(nodes / seconds) if seconds else 0
+            print(f"{mode:<6} {n:>5} {seconds:>9.2f} {nodes:>10} {nps:>8} {base_time / seconds:>7.2f}x {first_cut_rate:>8.1%} {tt_hit_rate:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+# bitboard.py
+# Bitboard backend for engine.py: the same Position interface (make_move/unmake_move,
+# legal_moves, capture_moves, is_square_attacked, evaluate...) computed on Python-int
+# bitboards, so attacks are found set-wise instead of square by square.
+#
+# Select it with engine.BOARD_BACKEND = engine.BACKEND_BITBOARD (dict API and engine_search)
+# or engine_search(..., backend=engine.BACKEND_BITBOARD).
+#
+# usage: python bitboard.py [--depth 3] [--games 20] [--plies 60]
+#        checks perft counts of the bitboard backend against the dict implementation
+#        (engine_new.py) on the benchmark lines and on positions from seeded random games.
+
+import argparse
+import random
+import time
+
+from engine import (Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, NO_SQUARE,
+                    CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ, PROMOTION_ORDER, PIECE_VALUES_BY_TYPE,
+                    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROOK_RAYS, BISHOP_RAYS)
+from perft import perft, perft_dict
+
+# ---------------------------
+# Masks (built once at import)
+# Square sq is bit 1 << sq (A1 = bit 0, H8 = bit 63), the same indices as Position.board.
+# ---------------------------
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+PROMOTION_RANKS = RANK_1 | RANK_8
+
+
+def _mask(squares):
+    bb = 0
+    for sq in squares:
+        bb |= 1 << sq
+    return bb
+
+
+def _line_mask(sq, dc, dr):
+    """Both rays through sq along (dc, dr), sq itself excluded."""
+    bb = 0
+    for sign in (1, -1):
+        col, row = (sq & 7) + sign * dc, (sq >> 3) + sign * dr
+        while 0 <= col <= 7 and 0 <= row <= 7:
+            bb |= 1 << (row * 8 + col)
+            col += sign * dc
+            row += sign * dr
+    return bb
+
+
+KNIGHT_MASKS = [_mask(KNIGHT_ATTACKS[sq]) for sq in range(64)]
+KING_MASKS = [_mask(KING_ATTACKS[sq]) for sq in range(64)]
+PAWN_MASKS = {side: [_mask(PAWN_ATTACKS[side][sq]) for sq in range(64)] for side in (WHITE, BLACK)}
+FILE_MASKS = [_line_mask(sq, 0, 1) for sq in range(64)]
+DIAGONAL_MASKS = [_line_mask(sq, 1, 1) for sq in range(64)]
+ANTI_DIAGONAL_MASKS = [_line_mask(sq, 1, -1) for sq in range(64)]
+ROOK_LINES = [_mask(to for ray in ROOK_RAYS[sq] for to in ray) for sq in range(64)]
+BISHOP_LINES = [_mask(to for ray in BISHOP_RAYS[sq] for to in ray) for sq in range(64)]
+
+# RANK_ATTACKS[col][occupancy of the rank]: attacked squares of the rank, as an 8-bit row
+RANK_ATTACKS = [[0] * 256 for _ in range(8)]
+for _col in range(8):
+    for _occ in range(256):
+        _attacks = 0
+        for _step in (1, -1):
+            _c = _col + _step
+            while 0 <= _c <= 7:
+                _attacks |= 1 << _c
+                if _occ & (1 << _c):
+                    break
+                _c += _step
+        RANK_ATTACKS[_col][_occ] = _attacks
+
+# BETWEEN[a][b]: squares strictly between a and b when they share a line, else 0
+BETWEEN = [[0] * 64 for _ in range(64)]
+for _sq in range(64):
+    for _ray in ROOK_RAYS[_sq] + BISHOP_RAYS[_sq]:
+        _between = 0
+        for _to in _ray:
+            BETWEEN[_sq][_to] = _between
+            _between |= 1 << _to
+
+
+def popcount(bb):
+    return bin(bb).count("1")
+
+
+def squares(bb):
+    """Yields the square indices of the set bits of bb, lowest first."""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+# ---------------------------
+# Sliding attacks: hyperbola quintessence
+# For a line with one square per rank (file, diagonal, anti-diagonal), o - 2*slider sets the
+# bits up to and including the first blocker above the slider; doing the same on the
+# byte-swapped (rank-mirrored) board gives the blocker below. Ranks use RANK_ATTACKS instead.
+# ---------------------------
+
+def _flip(bb):
+    """Mirror the board vertically (byte swap)."""
+    return int.from_bytes(bb.to_bytes(8, "little"), "big")
+
+
+def _line_attacks(occ, mask, sq):
+    o = occ & mask
+    forward = o - (2 << sq)
+    reverse = _flip((_flip(o) - (2 << (sq ^ 56))) & FULL)
+    return (forward ^ reverse) & mask
+
+
+def rook_attacks(sq, occ):
+    shift = sq & 56
+    return (_line_attacks(occ, FILE_MASKS[sq], sq) |
+            (RANK_ATTACKS[sq & 7][(occ >> shift) & 0xFF] << shift))
+
+
+def bishop_attacks(sq, occ):
+    return _line_attacks(occ, DIAGONAL_MASKS[sq], sq) | _line_attacks(occ, ANTI_DIAGONAL_MASKS[sq], sq)
+
+
+def queen_attacks(sq, occ):
+    return rook_attacks(sq, occ) | bishop_attacks(sq, occ)
+
+
+# a pawn's forward step per side
+PAWN_PUSH = {WHITE: 8, BLACK: -8}
+
+
+class BitboardPosition(Position):
+    """
+    Position with bitboards alongside the mailbox board.
+    pieces[code]: bitboard of piece code (WHITE|PAWN .. BLACK|KING); the unused type-0 codes
+    hold the occupancy of each colour, so pieces[WHITE] / pieces[BLACK] are all of a side.
+    make_move/unmake_move update the board, key and score as Position does, then the bitboards.
+    """
+    __slots__ = ("pieces",)
+
+    def __init__(self, board=None, side=WHITE, castling=0, ep=NO_SQUARE):
+        Position.__init__(self, board, side, castling, ep)
+        self.pieces = self.compute_pieces()
+
+    def compute_pieces(self):
+        pieces = [0] * 16
+        for sq, piece in enumerate(self.board):
+            if piece:
+                pieces[piece] |= 1 << sq
+                pieces[piece & BLACK] |= 1 << sq
+        return pieces
+
+    # ---- move application ----
+
+    def _toggle(self, fr, to, piece, placed, captured):
+        """XOR a move in or out of the bitboards (the same call undoes it)."""
+        pieces = self.pieces
+        side = piece & BLACK
+        from_bb = 1 << fr
+        to_bb = 1 << to
+        pieces[piece] ^= from_bb
+        pieces[placed] ^= to_bb
+        pieces[side] ^= from_bb | to_bb
+        if captured:
+            pieces[captured] ^= to_bb
+            pieces[side ^ BLACK] ^= to_bb
+        elif piece & 7 == PAWN and (fr ^ to) & 7:
+            # en passant: the victim sits behind the target square
+            victim = 1 << (to - 8 if side == WHITE else to + 8)
+            pieces[piece ^ BLACK] ^= victim
+            pieces[side ^ BLACK] ^= victim
+        elif piece & 7 == KING and (to - fr == 2 or fr - to == 2):
+            rook_bb = (1 << (to + 1)) | (1 << (to - 1)) if to > fr else (1 << (to - 2)) | (1 << (to + 1))
+            pieces[side | ROOK] ^= rook_bb
+            pieces[side] ^= rook_bb
+
+    def make_move(self, move):
+        board = self.board
+        fr = move & 63
+        to = (move >> 6) & 63
+        piece = board[fr]
+        captured = board[to]
+        Position.make_move(self, move)
+        self._toggle(fr, to, piece, board[to], captured)
+
+    def unmake_move(self):
+        move, captured = self.history[-1][:2]
+        fr = move & 63
+        to = (move >> 6) & 63
+        placed = self.board[to]
+        Position.unmake_move(self)
+        self._toggle(fr, to, self.board[fr], placed, captured)
+        return move
+
+    # ---- attack & check detection ----
+
+    def attackers(self, sq, by_side, occ):
+        """Bitboard of by_side's pieces attacking sq, with occ as the occupancy."""
+        pieces = self.pieces
+        queens = pieces[by_side | QUEEN]
+        return ((PAWN_MASKS[by_side ^ BLACK][sq] & pieces[by_side | PAWN]) |
+                (KNIGHT_MASKS[sq] & pieces[by_side | KNIGHT]) |
+                (KING_MASKS[sq] & pieces[by_side | KING]) |
+                (rook_attacks(sq, occ) & (pieces[by_side | ROOK] | queens)) |
+                (bishop_attacks(sq, occ) & (pieces[by_side | BISHOP] | queens)))
+
+    def is_square_attacked(self, sq, by_side, occ=None):
+        pieces = self.pieces
+        if (PAWN_MASKS[by_side ^ BLACK][sq] & pieces[by_side | PAWN] or
+                KNIGHT_MASKS[sq] & pieces[by_side | KNIGHT] or
+                KING_MASKS[sq] & pieces[by_side | KING]):
+            return True
+        if occ is None:
+            occ = pieces[WHITE] | pieces[BLACK]
+        queens = pieces[by_side | QUEEN]
+        # only run the slider attacks when a slider stands on one of the lines at all
+        rooks = (pieces[by_side | ROOK] | queens) & ROOK_LINES[sq]
+        if rooks and rook_attacks(sq, occ) & rooks:
+            return True
+        bishops = (pieces[by_side | BISHOP] | queens) & BISHOP_LINES[sq]
+        return bool(bishops and bishop_attacks(sq, occ) & bishops)
+
+    def king_square(self, side=None):
+        if side is None:
+            side = self.side
+        return self.pieces[side | KING].bit_length() - 1   # NO_SQUARE (-1) without a king
+
+    # ---- move generation ----
+
+    def _pawn_moves(self, side, pawns, targets, captures, promotions, moves, pinned=0, pin_masks=None):
+        """
+        Set-wise pawn moves: pushes onto targets & empty squares, captures onto targets & captures.
+        promotions: the promotion pieces to generate (PROMOTION_ORDER, or (QUEEN,) for quiescence).
+        Pinned pawns keep to pin_masks[square].
+        """
+        pieces = self.pieces
+        empty = ~(pieces[WHITE] | pieces[BLACK]) & FULL
+        if side == WHITE:
+            single = (pawns << 8) & empty
+            sets = ((single, 8), (((single & RANK_3) << 8) & empty, 16),
+                    (((pawns & ~FILE_A) << 7) & captures, 7), (((pawns & ~FILE_H) << 9) & captures, 9))
+        else:
+            single = (pawns >> 8) & empty
+            sets = ((single, -8), (((single & RANK_6) >> 8) & empty, -16),
+                    (((pawns & ~FILE_A) >> 9) & captures, -9), (((pawns & ~FILE_H) >> 7) & captures, -7))
+        append = moves.append
+        for bb, offset in sets:
+            for to in squares(bb & targets):
+                fr = to - offset
+                if pinned >> fr & 1 and not pin_masks[fr] >> to & 1:
+                    continue
+                if (1 << to) & PROMOTION_RANKS:
+                    for promo in promotions:
+                        append(fr | (to << 6) | (promo << 12))
+                else:
+                    append(fr | (to << 6))
+
+    def _piece_moves(self, side, targets, moves, pinned=0, pin_masks=None):
+        """Knight, bishop, rook and queen moves onto targets (pinned pieces keep to their pin ray)."""
+        pieces = self.pieces
+        occ = pieces[WHITE] | pieces[BLACK]
+        append = moves.append
+        for fr in squares(pieces[side | KNIGHT] & ~pinned):   # a pinned knight never moves
+            for to in squares(KNIGHT_MASKS[fr] & targets):
+                append(fr | (to << 6))
+        for ptype, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, queen_attacks)):
+            for fr in squares(pieces[side | ptype]):
+                dests = attacks(fr, occ) & targets
+                if pinned >> fr & 1:
+                    dests &= pin_masks[fr]
+                for to in squares(dests):
+                    append(fr | (to << 6))
+
+    def _ep_captures(self, side):
+        """Pseudo-legal en-passant captures (origin squares of the pawns that can take)."""
+        if self.ep == NO_SQUARE:
+            return ()
+        pieces = self.pieces
+        enemy = side ^ BLACK
+        if not pieces[enemy | PAWN] >> (self.ep - PAWN_PUSH[side]) & 1:
+            return ()
+        return squares(PAWN_MASKS[enemy][self.ep] & pieces[side | PAWN])
+
+    def _castling_moves(self, side, moves, check_attacks):
+        rights = self.castling
+        if not rights:
+            return
+        pieces = self.pieces
+        occ = pieces[WHITE] | pieces[BLACK]
+        enemy = side ^ BLACK
+        if side == WHITE:
+            king_sq, options = 4, ((CASTLE_WK, 0x60, 6), (CASTLE_WQ, 0x0E, 2))
+        else:
+            king_sq, options = 60, ((CASTLE_BK, 0x60 << 56, 62), (CASTLE_BQ, 0x0E << 56, 58))
+        if not pieces[side | KING] >> king_sq & 1:
+            return
+        for bit, path, to in options:
+            if rights & bit and not occ & path:
+                if check_attacks and (self.is_square_attacked((king_sq + to) >> 1, enemy, occ) or
+                                      self.is_square_attacked(to, enemy, occ)):
+                    continue
+                moves.append(king_sq | (to << 6))
+
+    def pseudo_legal_moves(self, side=None, castling=True):
+        pieces = self.pieces
+        if side is None:
+            side = self.side
+        targets = ~pieces[side] & FULL
+        moves = []
+        self._pawn_moves(side, pieces[side | PAWN], targets, pieces[side ^ BLACK], PROMOTION_ORDER, moves)
+        self._piece_moves(side, targets, moves)
+        for king_sq in squares(pieces[side | KING]):
+            for to in squares(KING_MASKS[king_sq] & targets):
+                moves.append(king_sq | (to << 6))
+        if castling:
+            for fr in self._ep_captures(side):
+                moves.append(fr | (self.ep << 6))
+            self._castling_moves(side, moves, False)
+        return moves
+
+    def capture_moves(self):
+        pieces = self.pieces
+        side = self.side
+        captures = pieces[side ^ BLACK]
+        moves = []
+        # captures, plus pushes onto the promotion rank (queen only)
+        self._pawn_moves(side, pieces[side | PAWN], captures | PROMOTION_RANKS, captures, (QUEEN,), moves)
+        self._piece_moves(side, captures, moves)
+        for king_sq in squares(pieces[side | KING]):
+            for to in squares(KING_MASKS[king_sq] & captures):
+                moves.append(king_sq | (to << 6))
+        for fr in self._ep_captures(side):
+            moves.append(fr | (self.ep << 6))
+        return moves
+
+    def legal_moves(self):
+        """Legal moves from checkers and pins, as Position.legal_moves, but set-wise."""
+        pieces = self.pieces
+        side = self.side
+        enemy = side ^ BLACK
+        king_bb = pieces[side | KING]
+        if not king_bb:
+            return self._legal_moves_by_make()
+        king_sq = king_bb.bit_length() - 1
+        own = pieces[side]
+        occ = own | pieces[enemy]
+        checkers = self.attackers(king_sq, enemy, occ)
+
+        # pins: an enemy slider on a line with the king with exactly one of our pieces between
+        queens = pieces[enemy | QUEEN]
+        snipers = ((ROOK_LINES[king_sq] & (pieces[enemy | ROOK] | queens)) |
+                   (BISHOP_LINES[king_sq] & (pieces[enemy | BISHOP] | queens)))
+        between = BETWEEN[king_sq]
+        pinned = 0
+        pin_masks = {}
+        for sq in squares(snipers):
+            blockers = between[sq] & occ
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pin_masks[blockers.bit_length() - 1] = between[sq] | (1 << sq)
+
+        moves = []
+        # the king: destinations are tested with the king lifted off the board
+        without_king = occ ^ king_bb
+        for to in squares(KING_MASKS[king_sq] & ~own):
+            if not self.is_square_attacked(to, enemy, without_king):
+                moves.append(king_sq | (to << 6))
+        if checkers & (checkers - 1):
+            return moves   # double check: only the king can move
+        if checkers:
+            # capture the checker or block its ray
+            targets = between[checkers.bit_length() - 1] | checkers
+        else:
+            targets = ~own & FULL
+            self._castling_moves(side, moves, True)
+        self._pawn_moves(side, pieces[side | PAWN], targets, pieces[enemy], PROMOTION_ORDER, moves, pinned, pin_masks)
+        self._piece_moves(side, targets, moves, pinned, pin_masks)
+        # en passant can expose the king along the rank: test it by playing it
+        for fr in self._ep_captures(side):
+            move = fr | (self.ep << 6)
+            if self._is_legal_by_make(move):
+                moves.append(move)
+        return moves
+
+    # ---- evaluation ----
+
+    def mobility(self, side):
+        """
+        Number of pseudo-legal moves of side without castling and en passant, counted set-wise
+        (equal to len(pseudo_legal_moves(side, castling=False))).
+        """
+        pieces = self.pieces
+        occ = pieces[WHITE] | pieces[BLACK]
+        targets = ~pieces[side] & FULL
+        enemy_occ = pieces[side ^ BLACK]
+        empty = ~occ & FULL
+        pawns = pieces[side | PAWN]
+        if side == WHITE:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            captures = ((pawns & ~FILE_A) << 7) & enemy_occ, ((pawns & ~FILE_H) << 9) & enemy_occ
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            captures = ((pawns & ~FILE_A) >> 9) & enemy_occ, ((pawns & ~FILE_H) >> 7) & enemy_occ
+        count = popcount(double)
+        for bb in (single,) + captures:
+            # every promotion square counts once per promotion piece
+            count += popcount(bb) + 3 * popcount(bb & PROMOTION_RANKS)
+        for fr in squares(pieces[side | KNIGHT]):
+            count += popcount(KNIGHT_MASKS[fr] & targets)
+        for ptype, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, queen_attacks)):
+            for fr in squares(pieces[side | ptype]):
+                count += popcount(attacks(fr, occ) & targets)
+        for fr in squares(pieces[side | KING]):
+            count += popcount(KING_MASKS[fr] & targets)
+        return count
+
+    def evaluate_mobility(self, perspective_side):
+        """The material + mobility evaluation of Position, with popcounts instead of move lists."""
+        pieces = self.pieces
+        enemy = perspective_side ^ BLACK
+        score = 0
+        for ptype in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            score += PIECE_VALUES_BY_TYPE[ptype] * (popcount(pieces[perspective_side | ptype]) -
+                                                    popcount(pieces[enemy | ptype]))
+        return score + 2 * (self.mobility(perspective_side) - self.mobility(enemy))
+
+
+# ---------------------------
+# Perft harness: bitboard backend against the dict implementation
+# ---------------------------
+
+def validation_positions(games, plies, seed=1):
+    """The benchmark lines plus positions along seeded random games from the start position."""
+    import bench
+    positions = list(bench.bench_positions().values())
+    rng = random.Random(seed)
+    for _ in range(games):
+        pos = bench.start_position()
+        for _ in range(rng.randrange(plies)):
+            moves = pos.legal_moves()
+            if not moves:
+                break
+            pos.make_move(rng.choice(moves))
+        positions.append(pos.copy())
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the bitboard backend against the dict move generator")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--games", type=int, default=20, help="random games to take positions from")
+    parser.add_argument("--plies", type=int, default=60, help="random games are up to this long")
+    args = parser.parse_args()
+
+    failures = 0
+    times = {"mailbox": 0.0, "bitboard": 0.0, "dict": 0.0}
+    for pos in validation_positions(args.games, args.plies):
+        counts = {}
+        for name, cls in (("mailbox", Position), ("bitboard", BitboardPosition)):
+            start = time.time()
+            counts[name] = perft(cls(pos.board, pos.side, pos.castling, pos.ep), args.depth)
+            times[name] += time.time() - start
+        start = time.time()
+        counts["dict"] = perft_dict(pos.to_dict(), pos.color, pos.castling_rights_dict(),
+                                    pos.en_passant_square(), args.depth)
+        times["dict"] += time.time() - start
+        if len(set(counts.values())) != 1:
+            failures += 1
+            print("MISMATCH", counts, pos.to_dict(), pos.color, pos.castling, pos.ep)
+    print(f"depth {args.depth}: {failures} mismatches; " +
+          ", ".join(f"{name} {seconds:.2f}s" for name, seconds in times.items()))
+
+
+if __name__ == "__main__":
+    main()
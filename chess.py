@@ -2,11 +2,12 @@
 import os
 import re
 import math
-import json
-import ctypes
 # import shared
 import pygame
 import threading
+import native
+from native import position_from_dict
+from engine import Position, engine_search
 # from CppEngineHandler import GetBestMove
 
 red = "\033[91m"
@@ -595,6 +596,20 @@ class chessboard():
 
         return neighbors
 
+    engine = None          # the C++ library (native.open_engine), None: the Python engine plays
+    engine_handle = None   # its persistent search threads, when it exports engine_create
+    engine_missing = False
+
+    @classmethod
+    def load_engine(cls):
+        """Load the C++ engine and its handle once (native.open_engine)."""
+        if cls.engine is None and not cls.engine_missing:
+            cls.engine, cls.engine_handle = native.open_engine()
+            cls.engine_missing = cls.engine is None
+            if cls.engine_missing:
+                print(f"{yellow}No C++ engine library found (run make, or set CHESS_ENGINE_LIB): using the Python engine{reset}")
+        return cls.engine
+
     @classmethod
     def interactive_board(cls):
         # current_color = frontend.current_turn
@@ -602,40 +617,21 @@ class chessboard():
         last_move = None
         status_message = None
         frontend.engine_busy = True
-        # CppEngineHandler.py
-        path = os.getcwd()
-        
-        engine = ctypes.CDLL(os.path.join(path, "engine.dll"))
-
-        engine.get_best_move.argtypes = [
-            ctypes.c_char_p,
-            ctypes.c_char_p,
-            ctypes.c_int,
-            ctypes.c_char_p,
-            ctypes.c_char_p,
-            ctypes.POINTER(ctypes.c_double)
-        ]
-
-        engine.get_best_move.restype = None
+        engine = cls.load_engine()
 
         def GetBestMove(board, color, depth=4):
-            board_json = json.dumps(board).encode()
-
-            from_buf = ctypes.create_string_buffer(10)
-            to_buf = ctypes.create_string_buffer(10)
-            score = ctypes.c_double()
-
-            engine.get_best_move(
-                board_json,
-                color.encode(),
-                depth,
-                from_buf,
-                to_buf,
-                ctypes.byref(score)
-            )
-
-            from_sq = from_buf.value.decode()
-            to_sq = to_buf.value.decode()
+            # board: the square dict, or a FEN string (which already names the side to move)
+            pos = Position.from_fen(board) if isinstance(board, str) else position_from_dict(board, color)
+
+            if engine is None:
+                # no native library: same move from the Python engine
+                from_sq, to_sq, score = engine_search(pos.to_dict(), pos.color, depth,
+                                                      castling_rights=pos.castling_rights_dict(),
+                                                      en_passant_target=pos.en_passant_square())
+                from_sq, to_sq, score = from_sq or "", to_sq or "", score or 0.0
+            else:
+                name, score = native.best_move(engine, pos, depth, cls.engine_handle)
+                from_sq, to_sq = (name or "")[:2], (name or "")[2:4]
 
             # --- update shared.py board ---
             # print(from_sq)
@@ -644,7 +640,7 @@ class chessboard():
             chessboard.current_board_arrangement[to_sq] = piece
             chessboard.current_board_arrangement[from_sq] = "empty"
             # frontend.current_turn = 'black' if current_color == 'white' else 'white'
-            frontend.player_advantage = score.value
+            frontend.player_advantage = score
 
             return from_sq, to_sq, frontend.player_advantage
         
@@ -14,10 +14,23 @@
 #include <exception>
 #include <any>
 #include <queue>
+#include <sstream>
+#include <functional>
+#include <condition_variable>
+#include <memory>
+#include <cstdint>
 // #include </.h>      // If using Cpp
 #include <cstring>          // <- FIX for strcpy
 
 
+// Exported C entry points (loaded with ctypes, see native.py): dllexport on Windows, default
+// visibility elsewhere, so the Makefile's -fvisibility=hidden keeps everything else private.
+#if defined(_WIN32)
+#define ENGINE_EXPORT extern "C" __declspec(dllexport)
+#else
+#define ENGINE_EXPORT extern "C" __attribute__((visibility("default")))
+#endif
+
 using namespace std;
 using BoardMap = map<string, string>;
 
@@ -61,6 +74,77 @@ public:
     }
 };
 
+// ----------------------
+// Persistent thread pool (kept by an engine handle, see engine_create)
+// Jobs get the index of the thread running them.
+// ----------------------
+
+class SearchThreadPool {
+public:
+    explicit SearchThreadPool(int n_threads) {
+        for (int i = 0; i < n_threads; ++i) {
+            threads.emplace_back([this, i]() { run(i); });
+        }
+    }
+
+    ~SearchThreadPool() {
+        {
+            lock_guard<mutex> lock(mtx);
+            quitting = true;
+        }
+        job_ready.notify_all();
+        for (auto &t : threads) t.join();
+    }
+
+    int size() const { return static_cast<int>(threads.size()); }
+
+    void submit(function<void(int)> job) {
+        {
+            lock_guard<mutex> lock(mtx);
+            jobs.push(std::move(job));
+            ++pending;
+        }
+        job_ready.notify_one();
+    }
+
+    // wait until every submitted job is done; false if seconds (>= 0) ran out first
+    bool wait_idle(double seconds = -1.0) {
+        unique_lock<mutex> lock(mtx);
+        auto idle = [this]() { return pending == 0; };
+        if (seconds < 0) {
+            all_done.wait(lock, idle);
+            return true;
+        }
+        return all_done.wait_for(lock, chrono::duration<double>(seconds), idle);
+    }
+
+private:
+    void run(int index) {
+        while (true) {
+            function<void(int)> job;
+            {
+                unique_lock<mutex> lock(mtx);
+                job_ready.wait(lock, [this]() { return quitting || !jobs.empty(); });
+                if (jobs.empty()) return;   // quitting
+                job = std::move(jobs.front());
+                jobs.pop();
+            }
+            job(index);
+            {
+                lock_guard<mutex> lock(mtx);
+                if (--pending == 0) all_done.notify_all();
+            }
+        }
+    }
+
+    vector<thread> threads;
+    queue<function<void(int)>> jobs;
+    mutex mtx;
+    condition_variable job_ready, all_done;
+    int pending = 0;
+    bool quitting = false;
+};
+
 
 // # ---------------------------
 // # Utilities: board helpers
@@ -1100,7 +1184,9 @@ tuple<string, string, double> engine_search(
     double time_limit = -1.0,                             // seconds, negative means none
     int max_workers = 0,                                  // 0 means auto (hardware_concurrency)
     const map<string, map<string,bool>> *castling_rights = nullptr,
-    const string *en_passant_target = nullptr
+    const string *en_passant_target = nullptr,
+    SearchThreadPool *pool = nullptr,                     // persistent threads (engine handle) instead of one thread per root
+    const atomic<bool> *stop_request = nullptr            // set from outside to end the search early (engine_stop)
 ) {
     // Manager/return_dict replacement:
     // We use a threadsafe return_dict (map protected by mutex)
@@ -1157,9 +1243,9 @@ tuple<string, string, double> engine_search(
         worker_events[move_key] = worker_stop_event;
         worker_running[move_key] = true;
 
-        // Launch a thread that performs worker work inline (equivalent to worker_task)
+        // Launch a thread (or a pool job) that performs worker work inline (equivalent to worker_task)
         // It will write into return_dict under return_dict_mutex.
-        processes.emplace_back([=, &return_dict, &return_dict_mutex, &worker_running, &proc_map, &master_stop_event]() mutable {
+        auto run_root = [=, &return_dict, &return_dict_mutex, &worker_running, &proc_map, &master_stop_event]() mutable {
             // register thread id
             proc_map[move_key] = this_thread::get_id();
             try {
@@ -1205,7 +1291,12 @@ tuple<string, string, double> engine_search(
             }
             worker_running[move_key] = false;
             delete worker_stop_event;
-        });
+        };
+        if (pool != nullptr) {
+            pool->submit([run_root](int) mutable { run_root(); });
+        } else {
+            processes.emplace_back(run_root);
+        }
 
         // If number of launched threads equals max_workers, we might want to wait/Throttle - original started all processes.
         // We follow original behaviour and start all threads (but we limited max_workers to hardware concurrency only as guidance).
@@ -1257,6 +1348,11 @@ tuple<string, string, double> engine_search(
                 }
             }
 
+            if (stop_request != nullptr && stop_request->load()) {
+                master_stop_event.store(true);
+                break;
+            }
+
             // time limit
             if (time_limit >= 0.0) {
                 auto elapsed = chrono::duration<double>(chrono::steady_clock::now() - start_time).count();
@@ -1273,6 +1369,9 @@ tuple<string, string, double> engine_search(
     }
 
     // finally: ensure threads terminate
+    if (pool != nullptr) {
+        pool->wait_idle();   // pool jobs reference this frame
+    }
     for (auto &th : processes) {
         if (th.joinable()) {
             // give small time slice to allow thread to finish
@@ -1490,6 +1589,741 @@ void engine_process_main(
     } // while true
 }
 
+// # ---------------------------
+// # Array board: the Piece / Board / GameState / Move types of Replit_ChessEngine.cpp
+// # The search below is the string-map search above on 64 piece codes: the same move rules,
+// # evaluation and root threading, so the same moves and scores, but a node copies a
+// # ~70 byte GameState instead of a map<string,string> and compares bytes instead of strings.
+// # Every export searches with it; the string-map search stays as the reference it is
+// # checked against (get_best_move_fen_legacy, see parity.py).
+// # ---------------------------
+
+enum Piece : uint8_t {
+    EMPTY = 0,
+    W_PAWN = 1, W_KNIGHT = 2, W_BISHOP = 3, W_ROOK = 4, W_QUEEN = 5, W_KING = 6,
+    B_PAWN = 9, B_KNIGHT = 10, B_BISHOP = 11, B_ROOK = 12, B_QUEEN = 13, B_KING = 14
+};
+
+// piece types (the low 3 bits of a Piece)
+const int PAWN = 1, KNIGHT = 2, BISHOP = 3, ROOK = 4, QUEEN = 5, KING = 6;
+
+struct Board {
+    Piece squares[64];   // row * 8 + col, A1 = 0, H8 = 63
+
+    inline Piece& operator[](int sq) { return squares[sq]; }
+    inline Piece operator[](int sq) const { return squares[sq]; }
+
+    Board() { memset(squares, 0, 64); }
+};
+
+// bits: WK=1 WQ=2 BK=4 BQ=8 (the binary board flags)
+struct CastlingRights {
+    uint8_t rights;
+
+    inline bool get(bool is_white, bool kingside) const {
+        int bit = (is_white ? 0 : 2) + (kingside ? 0 : 1);
+        return (rights >> bit) & 1;
+    }
+
+    inline void set(bool is_white, bool kingside, bool value) {
+        int bit = (is_white ? 0 : 2) + (kingside ? 0 : 1);
+        if (value) rights |= (1 << bit);
+        else rights &= ~(1 << bit);
+    }
+
+    CastlingRights() : rights(0) {}
+};
+
+struct Move {
+    uint8_t from;    // 0-63
+    uint8_t to;      // 0-63
+    uint8_t promo;   // piece type promoted to, 0 for none
+
+    Move(int f = 0, int t = 0, int p = 0) : from(f), to(t), promo(p) {}
+};
+
+struct GameState {
+    Board board;
+    CastlingRights castling;
+    int8_t en_passant;   // -1 or 0-63
+    uint64_t key;        // Zobrist key, side to move included (compute_key, then apply_move)
+
+    GameState() : en_passant(-1), key(0) {}
+};
+
+inline bool is_white(Piece p) { return p >= W_PAWN && p <= W_KING; }
+inline bool is_black(Piece p) { return p >= B_PAWN && p <= B_KING; }
+inline bool is_color(Piece p, bool white) { return white ? is_white(p) : is_black(p); }
+inline int piece_type(Piece p) { return p & 7; }
+inline Piece make_piece(bool white, int type) { return static_cast<Piece>(white ? type : type | 8); }
+inline bool in_bounds(int col, int row) { return col >= 0 && col <= 7 && row >= 0 && row <= 7; }
+
+// same values as PIECE_VALUES
+inline int piece_value(Piece p) {
+    static const int VALUES[7] = {0, 100, 320, 330, 500, 900, 20000};
+    return VALUES[piece_type(p)];
+}
+
+// "E2E4", "E7E8Q": the keys of the string-map search (square names, promotion letter)
+string move_name(const Move &move) {
+    static const char PROMO_LETTERS[] = "??NBRQ";
+    string name = coords_to_square(move.from & 7, move.from >> 3) + coords_to_square(move.to & 7, move.to >> 3);
+    if (move.promo) name += PROMO_LETTERS[move.promo];
+    return name;
+}
+
+// a Move in 16 bits (the transposition table's best move); 0 is no move
+inline int pack_move(const Move &move) { return move.from | move.to << 6 | move.promo << 12; }
+
+// # ---------------------------
+// # Array board: Zobrist keys
+// # One random 64-bit number per (piece code, square), castling rights set and en passant
+// # square, and one for black to move; a position's key is the XOR of those that apply.
+// # apply_move updates GameState::key by XORing out what a move takes away and in what it
+// # adds, so no node hashes the whole board.
+// # ---------------------------
+
+struct ZobristKeys {
+    uint64_t pieces[16][64];
+    uint64_t castling[16];
+    uint64_t en_passant[64];
+    uint64_t black_to_move;
+
+    ZobristKeys() {
+        uint64_t seed = 0;   // fixed seed: the same keys in every run (splitmix64)
+        auto next = [&seed]() {
+            uint64_t z = (seed += 0x9E3779B97F4A7C15ULL);
+            z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+            z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+            return z ^ (z >> 31);
+        };
+        for (auto &square_keys : pieces)
+            for (auto &key : square_keys) key = next();
+        for (auto &key : castling) key = next();
+        for (auto &key : en_passant) key = next();
+        black_to_move = next();
+    }
+};
+
+const ZobristKeys ZOBRIST;
+
+// The full key of state with white (or black) to move; apply_move keeps it up to date from there
+uint64_t compute_key(const GameState &state, bool white) {
+    uint64_t key = ZOBRIST.castling[state.castling.rights & 15];
+    for (int sq = 0; sq < 64; ++sq) {
+        if (state.board[sq] != EMPTY) key ^= ZOBRIST.pieces[state.board[sq]][sq];
+    }
+    if (state.en_passant >= 0) key ^= ZOBRIST.en_passant[state.en_passant];
+    if (!white) key ^= ZOBRIST.black_to_move;
+    return key;
+}
+
+// # ---------------------------
+// # Array board: transposition table, shared by the search threads of an engine handle
+// # Buckets of four 16-byte entries, so one bucket is one 64-byte cache line, as many
+// # buckets as fit the megabyte budget given at runtime. Entries hold score, depth, bound,
+// # age and best move. The replacement policy evicts entries of older searches first and
+// # shallower ones second. There are no locks: an entry is two words,
+// # key ^ data and data, so an entry torn by two threads writing at once no longer matches
+// # its key and reads as a miss.
+// # ---------------------------
+
+const int TT_EXACT = 1, TT_LOWER = 2, TT_UPPER = 3;   // 0 = empty slot
+const int DEFAULT_HASH_MB = 16;
+const int TT_INFINITE_SCORE = 1 << 30;              // a mate (+-infinity) as a stored score
+
+struct TTEntry {
+    int score;   // from the view of the side to move
+    int depth;
+    int bound;
+    int move;    // pack_move, 0 for none
+};
+
+class TranspositionTable {
+public:
+    explicit TranspositionTable(size_t size_mb = DEFAULT_HASH_MB) { resize(size_mb); }
+
+    // size_mb 0 disables the table; not while a search runs
+    void resize(size_t size_mb) {
+        size_t fit = size_mb * 1024 * 1024 / sizeof(Bucket);
+        n_buckets = 0;
+        if (fit > 0) {
+            n_buckets = 1;   // a power of two, so the index is key & (n_buckets - 1)
+            while (n_buckets * 2 <= fit) n_buckets *= 2;
+        }
+        buckets.reset(n_buckets ? new Bucket[n_buckets]() : nullptr);
+        age = 0;
+    }
+
+    void clear() {
+        for (size_t i = 0; i < n_buckets; ++i) {
+            for (Slot &slot : buckets[i].slots) {
+                slot.check.store(0, memory_order_relaxed);
+                slot.data.store(0, memory_order_relaxed);
+            }
+        }
+        age = 0;
+    }
+
+    // entries of earlier searches are replaced first
+    void new_search() { age = (age + 1) & AGE_MASK; }
+
+    bool probe(uint64_t key, TTEntry &entry) const {
+        if (n_buckets == 0) return false;
+        const Bucket &bucket = buckets[key & (n_buckets - 1)];
+        for (const Slot &slot : bucket.slots) {
+            uint64_t data = slot.data.load(memory_order_relaxed);
+            if (data != 0 && (slot.check.load(memory_order_relaxed) ^ data) == key) {
+                entry.score = static_cast<int32_t>(data & 0xFFFFFFFF);
+                entry.move = static_cast<int>((data >> 32) & 0xFFFF);
+                entry.depth = static_cast<int>((data >> 48) & 0xFF);
+                entry.bound = static_cast<int>((data >> 56) & 3);
+                return true;
+            }
+        }
+        return false;
+    }
+
+    void store(uint64_t key, int depth, int bound, int score, int move) {
+        if (n_buckets == 0) return;
+        Bucket &bucket = buckets[key & (n_buckets - 1)];
+        Slot *victim = nullptr;
+        int victim_worth = 0;
+        for (Slot &slot : bucket.slots) {
+            uint64_t data = slot.data.load(memory_order_relaxed);
+            if (data == 0 || (slot.check.load(memory_order_relaxed) ^ data) == key) {
+                if (data != 0 && move == 0) move = static_cast<int>((data >> 32) & 0xFFFF);   // keep the old best move
+                victim = &slot;
+                break;
+            }
+            // stale entries are worth less than any entry from the current search
+            int worth = static_cast<int>((data >> 48) & 0xFF) - (((data >> 58) & AGE_MASK) != age ? 256 : 0);
+            if (victim == nullptr || worth < victim_worth) {
+                victim = &slot;
+                victim_worth = worth;
+            }
+        }
+        uint64_t data = static_cast<uint32_t>(score)
+                      | static_cast<uint64_t>(move & 0xFFFF) << 32
+                      | static_cast<uint64_t>(min(max(depth, 0), 0xFF)) << 48
+                      | static_cast<uint64_t>(bound) << 56
+                      | static_cast<uint64_t>(age) << 58;
+        victim->check.store(key ^ data, memory_order_relaxed);
+        victim->data.store(data, memory_order_relaxed);
+    }
+
+private:
+    static const uint32_t AGE_MASK = 0x3F;
+
+    struct Slot {
+        atomic<uint64_t> check;   // key ^ data
+        atomic<uint64_t> data;    // score (32) | move (16) | depth (8) | bound (2) | age (6)
+    };
+    struct alignas(64) Bucket {
+        Slot slots[4];
+    };
+
+    unique_ptr<Bucket[]> buckets;
+    size_t n_buckets = 0;
+    uint32_t age = 0;
+};
+
+inline int to_tt_score(double score) {
+    if (isinf(score)) return score > 0 ? TT_INFINITE_SCORE : -TT_INFINITE_SCORE;
+    return static_cast<int>(score);
+}
+
+inline double from_tt_score(int score) {
+    if (score >= TT_INFINITE_SCORE) return numeric_limits<double>::infinity();
+    if (score <= -TT_INFINITE_SCORE) return -numeric_limits<double>::infinity();
+    return score;
+}
+
+
+// # ---------------------------
+// # Array board: move generation (mirrors the string-map generator)
+// # ---------------------------
+
+const int KNIGHT_OFFSETS[8][2] = {{2,1},{1,2},{-1,2},{-2,1},{-2,-1},{-1,-2},{1,-2},{2,-1}};
+const int KING_OFFSETS[8][2] = {{0,1},{0,-1},{1,0},{-1,0},{1,1},{1,-1},{-1,1},{-1,-1}};
+const int ROOK_DIRS[4][2] = {{0,1},{0,-1},{-1,0},{1,0}};
+const int BISHOP_DIRS[4][2] = {{1,1},{-1,1},{-1,-1},{1,-1}};
+
+void add_pawn_move(vector<Move> &moves, int from, int to) {
+    int row = to >> 3;
+    if (row == 0 || row == 7) {
+        for (int promo : {QUEEN, ROOK, BISHOP, KNIGHT}) moves.emplace_back(from, to, promo);
+    } else {
+        moves.emplace_back(from, to);
+    }
+}
+
+void generate_sliding_moves(const Board &board, int from, const int dirs[][2], bool white, vector<Move> &moves) {
+    for (int d = 0; d < 4; ++d) {
+        int c = (from & 7) + dirs[d][0];
+        int r = (from >> 3) + dirs[d][1];
+        while (in_bounds(c, r)) {
+            int to = r * 8 + c;
+            if (board[to] == EMPTY) {
+                moves.emplace_back(from, to);
+            } else {
+                if (!is_color(board[to], white)) moves.emplace_back(from, to);
+                break;
+            }
+            c += dirs[d][0];
+            r += dirs[d][1];
+        }
+    }
+}
+
+void generate_step_moves(const Board &board, int from, const int offsets[8][2], bool white, vector<Move> &moves) {
+    for (int i = 0; i < 8; ++i) {
+        int c = (from & 7) + offsets[i][0];
+        int r = (from >> 3) + offsets[i][1];
+        if (!in_bounds(c, r)) continue;
+        int to = r * 8 + c;
+        if (board[to] == EMPTY || !is_color(board[to], white)) moves.emplace_back(from, to);
+    }
+}
+
+void generate_pawn_moves(const Board &board, int from, bool white, vector<Move> &moves, int en_passant) {
+    int col = from & 7, row = from >> 3;
+    int dir = white ? 1 : -1;
+    int r = row + dir;
+    if (r < 0 || r > 7) return;
+
+    int forward = r * 8 + col;
+    if (board[forward] == EMPTY) {
+        add_pawn_move(moves, from, forward);
+        int start_row = white ? 1 : 6;
+        int double_sq = forward + dir * 8;
+        if (row == start_row && board[double_sq] == EMPTY) moves.emplace_back(from, double_sq);
+    }
+    for (int dc : {-1, 1}) {
+        int c = col + dc;
+        if (!in_bounds(c, r)) continue;
+        int to = r * 8 + c;
+        if (board[to] != EMPTY && !is_color(board[to], white)) add_pawn_move(moves, from, to);
+        // en passant: the pawn that just double-stepped sits beside us
+        if (to == en_passant && board[row * 8 + c] == make_piece(!white, PAWN)) moves.emplace_back(from, to);
+    }
+}
+
+// Moves of white's (or black's) pieces, ignoring checks. Castling only with castling rights
+// and en passant only with a target square (the evaluation counts mobility without both,
+// like the string-map evaluate_board).
+void generate_pseudo_legal_moves(const Board &board, bool white, vector<Move> &moves,
+                                 const CastlingRights *castling = nullptr, int en_passant = -1) {
+    for (int sq = 0; sq < 64; ++sq) {
+        Piece piece = board[sq];
+        if (!is_color(piece, white)) continue;
+        switch (piece_type(piece)) {
+            case PAWN: generate_pawn_moves(board, sq, white, moves, en_passant); break;
+            case KNIGHT: generate_step_moves(board, sq, KNIGHT_OFFSETS, white, moves); break;
+            case BISHOP: generate_sliding_moves(board, sq, BISHOP_DIRS, white, moves); break;
+            case ROOK: generate_sliding_moves(board, sq, ROOK_DIRS, white, moves); break;
+            case QUEEN:
+                generate_sliding_moves(board, sq, ROOK_DIRS, white, moves);
+                generate_sliding_moves(board, sq, BISHOP_DIRS, white, moves);
+                break;
+            case KING: generate_step_moves(board, sq, KING_OFFSETS, white, moves); break;
+        }
+    }
+    if (castling == nullptr) return;
+    int home = white ? 4 : 60;
+    if (board[home] != make_piece(white, KING)) return;
+    if (castling->get(white, true) && board[home + 1] == EMPTY && board[home + 2] == EMPTY)
+        moves.emplace_back(home, home + 2);
+    if (castling->get(white, false) && board[home - 1] == EMPTY && board[home - 2] == EMPTY && board[home - 3] == EMPTY)
+        moves.emplace_back(home, home - 2);
+}
+
+bool is_square_attacked(const Board &board, int square, bool by_white) {
+    int col = square & 7, row = square >> 3;
+
+    int pawn_row = row - (by_white ? 1 : -1);
+    for (int dc : {-1, 1}) {
+        if (in_bounds(col + dc, pawn_row) && board[pawn_row * 8 + col + dc] == make_piece(by_white, PAWN)) return true;
+    }
+    for (int i = 0; i < 8; ++i) {
+        int c = col + KNIGHT_OFFSETS[i][0], r = row + KNIGHT_OFFSETS[i][1];
+        if (in_bounds(c, r) && board[r * 8 + c] == make_piece(by_white, KNIGHT)) return true;
+        c = col + KING_OFFSETS[i][0];
+        r = row + KING_OFFSETS[i][1];
+        if (in_bounds(c, r) && board[r * 8 + c] == make_piece(by_white, KING)) return true;
+    }
+    Piece queen = make_piece(by_white, QUEEN);
+    for (int line = 0; line < 2; ++line) {
+        const int (*dirs)[2] = line == 0 ? ROOK_DIRS : BISHOP_DIRS;
+        Piece slider = make_piece(by_white, line == 0 ? ROOK : BISHOP);
+        for (int d = 0; d < 4; ++d) {
+            int c = col + dirs[d][0], r = row + dirs[d][1];
+            while (in_bounds(c, r)) {
+                Piece p = board[r * 8 + c];
+                if (p != EMPTY) {
+                    if (p == slider || p == queen) return true;
+                    break;
+                }
+                c += dirs[d][0];
+                r += dirs[d][1];
+            }
+        }
+    }
+    return false;
+}
+
+bool is_in_check(const Board &board, bool white) {
+    Piece king = make_piece(white, KING);
+    for (int sq = 0; sq < 64; ++sq) {
+        if (board[sq] == king) return is_square_attacked(board, sq, !white);
+    }
+    return false;   // no king: not in check, as find_king_square
+}
+
+GameState apply_move(const GameState &state, const Move &move) {
+    GameState next = state;
+    Board &board = next.board;
+    Piece piece = board[move.from];
+    Piece captured = board[move.to];
+    bool white = is_white(piece);
+    int type = piece_type(piece);
+
+    // every square change goes through here to keep the Zobrist key in step
+    auto set_square = [&next](int sq, Piece p) {
+        if (next.board[sq] != EMPTY) next.key ^= ZOBRIST.pieces[next.board[sq]][sq];
+        next.board[sq] = p;
+        if (p != EMPTY) next.key ^= ZOBRIST.pieces[p][sq];
+    };
+
+    set_square(move.to, move.promo ? make_piece(white, move.promo) : piece);
+    set_square(move.from, EMPTY);
+    next.en_passant = -1;
+
+    if (type == PAWN) {
+        if (move.to == state.en_passant && captured == EMPTY) {
+            int victim = move.to - (white ? 8 : -8);
+            if (board[victim] == make_piece(!white, PAWN)) set_square(victim, EMPTY);
+        }
+        if (abs(move.to - move.from) == 16) next.en_passant = (move.from + move.to) / 2;
+    } else if (type == KING) {
+        int home = white ? 4 : 60;
+        if (move.from == home && move.to == home + 2) {
+            set_square(home + 3, EMPTY);
+            set_square(home + 1, make_piece(white, ROOK));
+        } else if (move.from == home && move.to == home - 2) {
+            set_square(home - 4, EMPTY);
+            set_square(home - 1, make_piece(white, ROOK));
+        }
+        next.castling.set(white, true, false);
+        next.castling.set(white, false, false);
+    } else if (type == ROOK) {
+        if (move.from == (white ? 7 : 63)) next.castling.set(white, true, false);
+        else if (move.from == (white ? 0 : 56)) next.castling.set(white, false, false);
+    }
+    if (piece_type(captured) == ROOK) {
+        bool captured_white = is_white(captured);
+        if (move.to == (captured_white ? 7 : 63)) next.castling.set(captured_white, true, false);
+        else if (move.to == (captured_white ? 0 : 56)) next.castling.set(captured_white, false, false);
+    }
+
+    next.key ^= ZOBRIST.castling[state.castling.rights & 15] ^ ZOBRIST.castling[next.castling.rights & 15];
+    if (state.en_passant >= 0) next.key ^= ZOBRIST.en_passant[state.en_passant];
+    if (next.en_passant >= 0) next.key ^= ZOBRIST.en_passant[next.en_passant];
+    next.key ^= ZOBRIST.black_to_move;
+    return next;
+}
+
+void generate_legal_moves(const GameState &state, bool white, vector<Move> &legal) {
+    vector<Move> pseudo;
+    pseudo.reserve(48);
+    generate_pseudo_legal_moves(state.board, white, pseudo, &state.castling, state.en_passant);
+    for (const Move &move : pseudo) {
+        // castling: the king may not start on, pass or land on an attacked square
+        if (piece_type(state.board[move.from]) == KING && abs(move.to - move.from) == 2) {
+            int step = move.to > move.from ? 1 : -1;
+            if (is_square_attacked(state.board, move.from, !white) ||
+                is_square_attacked(state.board, move.from + step, !white) ||
+                is_square_attacked(state.board, move.to, !white)) continue;
+        }
+        if (!is_in_check(apply_move(state, move).board, white)) legal.push_back(move);
+    }
+}
+
+// # ---------------------------
+// # Array board: evaluation and search
+// # ---------------------------
+
+// pseudo-legal moves of one side without castling / en passant (the mobility term)
+int count_mobility(const Board &board, bool white) {
+    thread_local vector<Move> scratch;
+    scratch.clear();
+    generate_pseudo_legal_moves(board, white, scratch);
+    return static_cast<int>(scratch.size());
+}
+
+// evaluate_board on the array board: material + 2 per move of mobility, from white's (or black's) view
+int evaluate_board(const Board &board, bool white) {
+    int score = 0;
+    for (int sq = 0; sq < 64; ++sq) {
+        Piece p = board[sq];
+        if (p == EMPTY) continue;
+        score += is_color(p, white) ? piece_value(p) : -piece_value(p);
+    }
+    return score + 2 * (count_mobility(board, white) - count_mobility(board, !white));
+}
+
+// Captures first, most valuable victim / least valuable attacker (the order only changes
+// how much is pruned, never a score)
+void order_moves(const Board &board, vector<Move> &moves) {
+    auto key = [&board](const Move &m) {
+        if (board[m.to] == EMPTY) return 0;
+        return 10 * piece_value(board[m.to]) - piece_value(board[m.from]) + 1;
+    };
+    stable_sort(moves.begin(), moves.end(), [&key](const Move &a, const Move &b) { return key(a) > key(b); });
+}
+
+// A bound from one side's view as seen from the other: lower and upper swap
+inline int flip_bound(int bound) {
+    if (bound == TT_LOWER) return TT_UPPER;
+    if (bound == TT_UPPER) return TT_LOWER;
+    return bound;
+}
+
+// tt (optional): the handle's transposition table. Its scores and bounds are kept from the
+// side to move's view (the evaluation is symmetric), so one table serves searches for
+// either colour.
+double minimax(
+    const GameState &state,
+    bool maximizing_white,
+    bool current_white,
+    int depth,
+    double alpha,
+    double beta,
+    const atomic<bool> *stop_event,
+    TranspositionTable *tt = nullptr
+) {
+    if (stop_event != nullptr && stop_event->load()) return 0.0;
+
+    if (depth == 0) {
+        return static_cast<double>(evaluate_board(state.board, maximizing_white));
+    }
+
+    bool maximizing = current_white == maximizing_white;
+    int hash_move = 0;
+    if (tt != nullptr) {
+        TTEntry entry;
+        if (tt->probe(state.key, entry)) {
+            hash_move = entry.move;
+            if (entry.depth >= depth) {
+                double score = from_tt_score(entry.score);
+                int bound = entry.bound;
+                if (!maximizing) {
+                    score = -score;
+                    bound = flip_bound(bound);
+                }
+                if (bound == TT_EXACT || (bound == TT_LOWER && score >= beta) || (bound == TT_UPPER && score <= alpha)) {
+                    return score;
+                }
+            }
+        }
+    }
+
+    vector<Move> legal_moves;
+    legal_moves.reserve(48);
+    generate_legal_moves(state, current_white, legal_moves);
+    double inf = numeric_limits<double>::infinity();
+    if (legal_moves.empty()) {
+        if (is_in_check(state.board, current_white)) {
+            return (current_white == maximizing_white) ? -inf : inf;
+        }
+        return 0.0;   // stalemate
+    }
+    order_moves(state.board, legal_moves);
+    if (hash_move != 0) {
+        // the best move of an earlier search of this position goes first
+        auto it = find_if(legal_moves.begin(), legal_moves.end(),
+                          [hash_move](const Move &m) { return pack_move(m) == hash_move; });
+        if (it != legal_moves.end()) rotate(legal_moves.begin(), it, it + 1);
+    }
+
+    const double alpha_orig = alpha, beta_orig = beta;
+    double value = maximizing ? -inf : inf;
+    Move best_move = legal_moves[0];
+    for (const Move &move : legal_moves) {
+        if (stop_event != nullptr && stop_event->load()) return 0.0;
+
+        double score = minimax(apply_move(state, move), maximizing_white, !current_white,
+                               depth - 1, alpha, beta, stop_event, tt);
+        if (maximizing ? score > value : score < value) {
+            value = score;
+            best_move = move;
+        }
+        if (maximizing) alpha = max(alpha, value);
+        else beta = min(beta, value);
+        if (alpha >= beta) break;
+    }
+
+    // nothing from an interrupted search: its scores are not real
+    if (tt != nullptr && !(stop_event != nullptr && stop_event->load())) {
+        int bound = value <= alpha_orig ? TT_UPPER : (value >= beta_orig ? TT_LOWER : TT_EXACT);
+        double score = value;
+        if (!maximizing) {
+            score = -score;
+            bound = flip_bound(bound);
+        }
+        tt->store(state.key, depth, bound, to_tt_score(score), pack_move(best_move));
+    }
+    return value;
+}
+
+// engine_stop's request as one search sees it: the handle records the generation engine_stop
+// was aimed at, and only the search of that generation stops
+struct SearchStop {
+    const atomic<uint64_t> *stopped;
+    uint64_t generation;
+
+    bool requested() const { return stopped->load() == generation; }
+};
+
+// engine_search on the array board. Every root move is one job on pool (the engine handle's
+// threads) or, without one, on max_workers threads started for this search; the rest is the
+// string-map engine_search: user_move_queue, time_limit and stop_request end it early, and
+// the best finished root move wins (ties to the first move name, as there).
+// tt (optional, the handle's): shared by all the jobs. Without it the scores are exactly
+// those of the string-map search (parity.py); with it they can come from deeper searches
+// of the same positions.
+tuple<string, string, double> engine_search(
+    const GameState &state,
+    bool white,
+    int depth,
+    ThreadSafeQueue<string> *user_move_queue = nullptr,
+    double time_limit = -1.0,
+    int max_workers = 0,
+    SearchThreadPool *pool = nullptr,
+    const SearchStop *stop_request = nullptr,
+    TranspositionTable *tt = nullptr
+) {
+    double nan = numeric_limits<double>::quiet_NaN();
+    GameState root = state;
+    root.key = compute_key(root, white);
+    vector<Move> roots;
+    generate_legal_moves(root, white, roots);
+    if (roots.empty()) return make_tuple(string(""), string(""), nan);
+
+    unique_ptr<SearchThreadPool> local_pool;
+    if (pool == nullptr) {
+        if (max_workers <= 0) max_workers = static_cast<int>(thread::hardware_concurrency());
+        max_workers = max(1, min(max_workers, static_cast<int>(roots.size())));
+        local_pool.reset(new SearchThreadPool(max_workers));
+        pool = local_pool.get();
+    }
+
+    map<string, double> return_dict;
+    mutex return_dict_mutex;
+    atomic<bool> master_stop_event(false);
+    map<string, size_t> root_index;
+    unique_ptr<atomic<bool>[]> worker_stop(new atomic<bool>[roots.size()]);
+    double inf = numeric_limits<double>::infinity();
+
+    for (size_t i = 0; i < roots.size(); ++i) {
+        worker_stop[i].store(false);
+        root_index[move_name(roots[i])] = i;
+        pool->submit([&, i](int) {
+            if (worker_stop[i].load() || master_stop_event.load()) return;
+            double score = minimax(apply_move(root, roots[i]), white, !white, depth - 1, -inf, inf,
+                                   &master_stop_event, tt);
+            if (!worker_stop[i].load() && !master_stop_event.load()) {
+                lock_guard<mutex> lg(return_dict_mutex);
+                return_dict[move_name(roots[i])] = score;
+            }
+        });
+    }
+
+    auto start_time = chrono::steady_clock::now();
+    while (!pool->wait_idle(0.01)) {
+        string user_move;
+        if (user_move_queue != nullptr && user_move_queue->try_pop(user_move) && !user_move.empty()) {
+            transform(user_move.begin(), user_move.end(), user_move.begin(), ::toupper);
+            auto first = user_move.find_first_not_of(" \t\n\r");
+            auto last = user_move.find_last_not_of(" \t\n\r");
+            if (first != string::npos) user_move = user_move.substr(first, last - first + 1);
+            // the user's move is a root move: only its search goes on, else all stop
+            auto it = root_index.find(user_move);
+            if (it != root_index.end()) {
+                for (size_t i = 0; i < roots.size(); ++i) {
+                    if (i != it->second) worker_stop[i].store(true);
+                }
+            } else {
+                master_stop_event.store(true);
+            }
+        }
+        if (stop_request != nullptr && stop_request->requested()) master_stop_event.store(true);
+        if (time_limit >= 0.0 &&
+            chrono::duration<double>(chrono::steady_clock::now() - start_time).count() > time_limit) {
+            master_stop_event.store(true);
+        }
+    }
+
+    // return_dict is ordered by move name, so ties go to the first name
+    string best_key;
+    double best_score = -inf;
+    for (const auto &kv : return_dict) {
+        if (best_key.empty() || kv.second > best_score) {
+            best_key = kv.first;
+            best_score = kv.second;
+        }
+    }
+    if (best_key.empty()) return make_tuple(string(""), string(""), nan);
+    return make_tuple(best_key.substr(0, 2), best_key.substr(2), best_score);
+}
+
+// perft on the array board
+long long perft(const GameState &state, bool white, int depth) {
+    if (depth == 0) return 1;
+    vector<Move> legal;
+    generate_legal_moves(state, white, legal);
+    if (depth == 1) return static_cast<long long>(legal.size());
+    long long nodes = 0;
+    for (const Move &move : legal) nodes += perft(apply_move(state, move), !white, depth - 1);
+    return nodes;
+}
+
+// # ---------------------------
+// # Array board from the string-map inputs (JSON, FEN)
+// # ---------------------------
+
+GameState state_from_map(const BoardMap &board, const map<string, map<string,bool>> *castling_rights,
+                         const string *en_passant_target) {
+    static const map<string, int> TYPES = {
+        {"pawn", PAWN}, {"knight", KNIGHT}, {"bishop", BISHOP}, {"rook", ROOK}, {"queen", QUEEN}, {"king", KING}
+    };
+    GameState state;
+    for (const auto &kv : board) {
+        size_t sep = kv.second.find('_');
+        if (sep == string::npos || kv.first.size() != 2) continue;
+        auto it = TYPES.find(kv.second.substr(sep + 1));
+        if (it == TYPES.end()) continue;
+        auto [col, row] = square_to_coords(kv.first);
+        if (!in_bounds(col, row)) continue;
+        state.board[row * 8 + col] = make_piece(kv.second.compare(0, sep, "white") == 0, it->second);
+    }
+    map<string, map<string,bool>> inferred;
+    if (castling_rights == nullptr) {
+        inferred = infer_castling_rights_from_board(board);
+        castling_rights = &inferred;
+    }
+    for (bool is_white_side : {true, false}) {
+        const auto &side = castling_rights->at(is_white_side ? "white" : "black");
+        state.castling.set(is_white_side, true, side.count("K") && side.at("K"));
+        state.castling.set(is_white_side, false, side.count("Q") && side.at("Q"));
+    }
+    if (en_passant_target != nullptr && en_passant_target->size() == 2) {
+        auto [col, row] = square_to_coords(*en_passant_target);
+        if (in_bounds(col, row)) state.en_passant = static_cast<int8_t>(row * 8 + col);
+    }
+    return state;
+}
+
 // --------------
 BoardMap parseBoard(const std::string &json_str) {
     BoardMap board;
@@ -1531,7 +2365,7 @@ BoardMap parseBoard(const std::string &json_str) {
     return board;
 }
 
-extern "C" __declspec(dllexport)
+ENGINE_EXPORT
 void get_best_move(
     const char* board_json,
     const char* color,
@@ -1540,21 +2374,339 @@ void get_best_move(
     char* out_to,
     double* out_score
 ) {
-    // parse board json
+    // parse board json (castling rights inferred from the board, no en passant)
     BoardMap board = parseBoard(std::string(board_json));
+    GameState state = state_from_map(board, nullptr, nullptr);
+
+    auto [from_sq, to_sq, score] = engine_search(state, std::string(color) == "white", depth);
+
+    strcpy(out_from, from_sq.c_str());
+    strcpy(out_to, to_sq.c_str());
+    *out_score = score;
+}
+
+// # ---------------------------
+// # FEN input (same fields as from_fen in engine.py)
+// # ---------------------------
+
+bool parseFen(const string &fen, BoardMap &board, string &color,
+              map<string, map<string,bool>> &castling_rights, string &en_passant_target) {
+    static const map<char, string> FEN_PIECES = {
+        {'p', "pawn"}, {'n', "knight"}, {'b', "bishop"}, {'r', "rook"}, {'q', "queen"}, {'k', "king"}
+    };
+    istringstream fields(fen);
+    string placement, side = "w", castling = "-", ep = "-";
+    fields >> placement >> side >> castling >> ep;
+
+    for (int row = 0; row < 8; ++row)
+        for (int col = 0; col < 8; ++col)
+            board[coords_to_square(col, row)] = "empty";
+    int row = 7, col = 0;
+    for (char c : placement) {
+        if (c == '/') {
+            if (col != 8) return false;
+            --row;
+            col = 0;
+        } else if (isdigit(static_cast<unsigned char>(c))) {
+            col += c - '0';
+        } else {
+            auto it = FEN_PIECES.find(static_cast<char>(tolower(c)));
+            if (it == FEN_PIECES.end() || row < 0 || col > 7) return false;
+            board[coords_to_square(col, row)] = string(isupper(static_cast<unsigned char>(c)) ? "white_" : "black_") + it->second;
+            ++col;
+        }
+        if (col > 8) return false;
+    }
+    if (row != 0 || col != 8) return false;
+
+    color = (side == "b") ? "black" : "white";
+    castling_rights["white"]["K"] = castling.find('K') != string::npos;
+    castling_rights["white"]["Q"] = castling.find('Q') != string::npos;
+    castling_rights["black"]["K"] = castling.find('k') != string::npos;
+    castling_rights["black"]["Q"] = castling.find('q') != string::npos;
+    en_passant_target = "";
+    if (ep != "-") {
+        for (char c : ep) en_passant_target += static_cast<char>(toupper(c));
+    }
+    return true;
+}
+
+// Same as get_best_move, but the position (with castling rights and en passant) comes as FEN.
+// A malformed FEN returns empty squares and a zero score.
+ENGINE_EXPORT
+void get_best_move_fen(
+    const char* fen,
+    int depth,
+    char* out_from,
+    char* out_to,
+    double* out_score
+) {
+    BoardMap board;
+    string color, en_passant_target;
+    map<string, map<string,bool>> castling_rights;
+    if (!parseFen(string(fen), board, color, castling_rights, en_passant_target)) {
+        out_from[0] = '\0';
+        out_to[0] = '\0';
+        *out_score = 0.0;
+        return;
+    }
+
+    GameState state = state_from_map(board, &castling_rights, &en_passant_target);
+    auto [from_sq, to_sq, score] = engine_search(state, color == "white", depth);
+
+    strcpy(out_from, from_sq.c_str());
+    strcpy(out_to, to_sq.c_str());
+    *out_score = score;
+}
+
+// get_best_move_fen with the string-map search: the reference the array search must agree
+// with move for move and score for score (parity.py)
+ENGINE_EXPORT
+void get_best_move_fen_legacy(
+    const char* fen,
+    int depth,
+    char* out_from,
+    char* out_to,
+    double* out_score
+) {
+    BoardMap board;
+    string color, en_passant_target;
+    map<string, map<string,bool>> castling_rights;
+    if (!parseFen(string(fen), board, color, castling_rights, en_passant_target)) {
+        out_from[0] = '\0';
+        out_to[0] = '\0';
+        *out_score = 0.0;
+        return;
+    }
 
     auto [from_sq, to_sq, score] = engine_search(
         board,
-        std::string(color),
+        color,
         depth,
         nullptr,
         -1.0,
         0,
-        nullptr,
-        nullptr
+        &castling_rights,
+        en_passant_target.empty() ? nullptr : &en_passant_target
     );
 
     strcpy(out_from, from_sq.c_str());
     strcpy(out_to, to_sq.c_str());
     *out_score = score;
 }
+
+// # ---------------------------
+// # Binary board input (no JSON): 64 piece codes indexed row * 8 + col (A1 = 0, H8 = 63),
+// # the codes of engine.py / Replit_ChessEngine.cpp (white 1..6, black 9..14 for
+// # pawn, knight, bishop, rook, queen, king; 0 empty), plus one int of packed flags:
+// #   bits 0-3  castling rights  WK=1 WQ=2 BK=4 BQ=8
+// #   bit  4    black to move
+// #   bits 8-14 en passant square + 1 (0: none)
+// # Python passes Position.board (a bytearray) without copying, see native.py.
+// # ---------------------------
+
+const int FLAG_CASTLE_WK = 1, FLAG_CASTLE_WQ = 2, FLAG_CASTLE_BK = 4, FLAG_CASTLE_BQ = 8;
+const int FLAG_BLACK_TO_MOVE = 16;
+const int FLAG_EP_SHIFT = 8;
+
+bool stateFromBytes(const unsigned char *squares, int flags, GameState &state, bool &white) {
+    for (int sq = 0; sq < 64; ++sq) {
+        int code = squares[sq];
+        if (code != EMPTY && !is_white(static_cast<Piece>(code)) && !is_black(static_cast<Piece>(code))) return false;
+        state.board[sq] = static_cast<Piece>(code);
+    }
+    white = (flags & FLAG_BLACK_TO_MOVE) == 0;
+    state.castling.rights = flags & (FLAG_CASTLE_WK | FLAG_CASTLE_WQ | FLAG_CASTLE_BK | FLAG_CASTLE_BQ);
+    int ep = ((flags >> FLAG_EP_SHIFT) & 0x7F) - 1;
+    if (ep > 63) return false;
+    state.en_passant = static_cast<int8_t>(ep);
+    return true;
+}
+
+// Same as get_best_move_fen, with the position as the binary board above.
+// Invalid piece codes return empty squares and a zero score.
+ENGINE_EXPORT
+void get_best_move_board(
+    const unsigned char* squares,
+    int flags,
+    int depth,
+    char* out_from,
+    char* out_to,
+    double* out_score
+) {
+    GameState state;
+    bool white;
+    if (!stateFromBytes(squares, flags, state, white)) {
+        out_from[0] = '\0';
+        out_to[0] = '\0';
+        *out_score = 0.0;
+        return;
+    }
+
+    auto [from_sq, to_sq, score] = engine_search(state, white, depth);
+
+    strcpy(out_from, from_sq.c_str());
+    strcpy(out_to, to_sq.c_str());
+    *out_score = score;
+}
+
+// # ---------------------------
+// # Perft: leaf node count of the legal move tree (move generator check, see perft.py)
+// # ---------------------------
+
+// castling: FEN-style rights such as "KQkq" or "-"; en_passant: target square such as "E3" or ""
+ENGINE_EXPORT
+long long perft_count(
+    const char* board_json,
+    const char* color,
+    const char* castling,
+    const char* en_passant,
+    int depth
+) {
+    BoardMap board = parseBoard(std::string(board_json));
+    string rights_str(castling);
+    map<string, map<string,bool>> rights;
+    rights["white"]["K"] = rights_str.find('K') != string::npos;
+    rights["white"]["Q"] = rights_str.find('Q') != string::npos;
+    rights["black"]["K"] = rights_str.find('k') != string::npos;
+    rights["black"]["Q"] = rights_str.find('q') != string::npos;
+    string en_passant_target(en_passant);
+    GameState state = state_from_map(board, &rights, &en_passant_target);
+    return perft(state, string(color) == "white", depth);
+}
+
+// # ---------------------------
+// # Persistent engine handle
+// # engine_create starts the search threads once; every engine_best_move_fen call reuses
+// # them instead of spawning one thread per root move. Python loads the DLL and creates the
+// # handle once per game (see CppEngineHandler.py).
+// # ---------------------------
+
+struct EngineHandle {
+    SearchThreadPool pool;
+    TranspositionTable tt;   // shared by the pool's threads, kept between searches
+    uint64_t searches;                 // generation of the last search started (under search_mutex)
+    atomic<uint64_t> running;          // generation of the running search, 0 while idle
+    atomic<uint64_t> stopped;          // generation engine_stop was last aimed at
+    mutex search_mutex;   // one search at a time per handle
+
+    explicit EngineHandle(int n_threads)
+        : pool(n_threads), tt(DEFAULT_HASH_MB), searches(0), running(0), stopped(0) {}
+};
+
+// n_threads <= 0 uses hardware_concurrency
+ENGINE_EXPORT
+void* engine_create(int n_threads) {
+    if (n_threads <= 0) {
+        n_threads = static_cast<int>(thread::hardware_concurrency());
+        if (n_threads <= 0) n_threads = 1;
+    }
+    return new EngineHandle(n_threads);
+}
+
+ENGINE_EXPORT
+void engine_destroy(void* handle) {
+    delete static_cast<EngineHandle*>(handle);
+}
+
+// Ask the running search (from another thread) to return now with what it has; does
+// nothing while the handle is idle, so no later search is affected
+ENGINE_EXPORT
+void engine_stop(void* handle) {
+    EngineHandle* engine = static_cast<EngineHandle*>(handle);
+    engine->stopped.store(engine->running.load());
+}
+
+// Resize the transposition table (DEFAULT_HASH_MB after engine_create; 0 disables it).
+// Waits for a running search; the table starts empty.
+ENGINE_EXPORT
+void engine_set_hash(void* handle, int hash_mb) {
+    EngineHandle* engine = static_cast<EngineHandle*>(handle);
+    lock_guard<mutex> search_lock(engine->search_mutex);
+    engine->tt.resize(static_cast<size_t>(max(hash_mb, 0)));
+}
+
+// Forget the table (a new game; positions of the previous one won't come back)
+ENGINE_EXPORT
+void engine_new_game(void* handle) {
+    EngineHandle* engine = static_cast<EngineHandle*>(handle);
+    lock_guard<mutex> search_lock(engine->search_mutex);
+    engine->tt.clear();
+}
+
+// Search on the handle's threads; time_limit in seconds, < 0 for none
+tuple<string, string, double> handle_search(
+    EngineHandle *engine,
+    const GameState &state,
+    bool white,
+    int depth,
+    double time_limit
+) {
+    lock_guard<mutex> search_lock(engine->search_mutex);
+    engine->tt.new_search();
+    SearchStop stop = {&engine->stopped, ++engine->searches};
+    engine->running.store(stop.generation);
+    auto result = engine_search(state, white, depth, nullptr, time_limit, engine->pool.size(),
+                                &engine->pool, &stop, &engine->tt);
+    engine->running.store(0);
+    return result;
+}
+
+// get_best_move_fen on a handle from engine_create
+ENGINE_EXPORT
+void engine_best_move_fen(
+    void* handle,
+    const char* fen,
+    int depth,
+    double time_limit,
+    char* out_from,
+    char* out_to,
+    double* out_score
+) {
+    BoardMap board;
+    string color, en_passant_target;
+    map<string, map<string,bool>> castling_rights;
+    if (!parseFen(string(fen), board, color, castling_rights, en_passant_target)) {
+        out_from[0] = '\0';
+        out_to[0] = '\0';
+        *out_score = 0.0;
+        return;
+    }
+
+    GameState state = state_from_map(board, &castling_rights, &en_passant_target);
+    auto [from_sq, to_sq, score] = handle_search(static_cast<EngineHandle*>(handle), state, color == "white",
+                                                 depth, time_limit);
+
+    strcpy(out_from, from_sq.c_str());
+    strcpy(out_to, to_sq.c_str());
+    *out_score = score;
+}
+
+// get_best_move_board on a handle from engine_create
+ENGINE_EXPORT
+void engine_best_move_board(
+    void* handle,
+    const unsigned char* squares,
+    int flags,
+    int depth,
+    double time_limit,
+    char* out_from,
+    char* out_to,
+    double* out_score
+) {
+    GameState state;
+    bool white;
+    if (!stateFromBytes(squares, flags, state, white)) {
+        out_from[0] = '\0';
+        out_to[0] = '\0';
+        *out_score = 0.0;
+        return;
+    }
+
+    auto [from_sq, to_sq, score] = handle_search(static_cast<EngineHandle*>(handle), state, white,
+                                                 depth, time_limit);
+
+    strcpy(out_from, from_sq.c_str());
+    strcpy(out_to, to_sq.c_str());
+    *out_score = score;
+}
@@ -1,12 +1,17 @@
 # engine.py
 import multiprocessing as mp
+from multiprocessing import connection
+import ctypes
+import threading
+import random
 import time
-import math
+import traceback
 
 # ---------------------------
 # Utilities: board helpers
 # Board format: dict mapping 'A1'..'H8' -> piece names used in your main file
 # e.g. 'A2': 'white_pawn', 'E8': 'black_king', 'C3': 'empty'
+# The dict format is only used at the API boundary; the search runs on Position (below).
 # ---------------------------
 
 FILES = "ABCDEFGH"
@@ -56,361 +61,851 @@ def infer_castling_rights_from_board(board):
 
 
 # ---------------------------
-# Moves & simulation
+# FEN
+# from_fen / to_fen convert between a FEN string and the dict format plus the state the
+# dict cannot hold: castling rights, en-passant target, side to move and the move clocks.
 # ---------------------------
 
-PROMO_MAP = {'Q': 'queen', 'R': 'rook', 'B': 'bishop', 'N': 'knight'}
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_PIECES = {"p": "pawn", "n": "knight", "b": "bishop", "r": "rook", "q": "queen", "k": "king"}
+FEN_LETTERS = {name: letter for letter, name in FEN_PIECES.items()}
+FEN_CASTLING = (("white", "K", "K"), ("white", "Q", "Q"), ("black", "K", "k"), ("black", "Q", "q"))
 
 
-def simulate_move(board, from_sq, to_sq, castling_rights=None, en_passant_target=None):
+def from_fen(fen):
     """
-    Apply move and return (new_board, new_castling_rights, new_en_passant_target).
-    Handles castling rook moves and updates castling rights when king/rook moves.
-    Handles en-passant captures and sets en_passant target after double-step pawn moves.
-    NOTE: board is not modified in-place.
-
-    to_sq may include a promotion suffix, e.g. "E8Q" where 'Q' is promotion piece.
+    FEN -> (board, color, castling_rights, en_passant_target, halfmove_clock, fullmove_number).
+    Missing trailing fields default to "w - - 0 1". Raises ValueError on a malformed placement.
     """
-    newb = board.copy()
-    piece = newb[from_sq]
-
-    # If to_sq carries a promotion letter (e.g. 'E8Q'), separate it
-    promo = None
-    real_to = to_sq
-    if len(to_sq) > 2 and to_sq[2] in PROMO_MAP:
-        real_to = to_sq[:2]
-        promo = to_sq[2]
-
-    # default rights copy
-    new_rights = None
-    if castling_rights is None:
-        new_rights = infer_castling_rights_from_board(board)
-    else:
-        # shallow copy of nested dict
-        new_rights = {s: dict(castling_rights.get(s, {})) for s in ("white", "black")}
-
-    # Prepare new en-passant target: reset unless set by a double pawn move below
-    new_en_passant = None
-
-    # Move piece (handle promotion)
-    # clear origin
-    newb[from_sq] = "empty"
-    if promo and piece.endswith("pawn"):
-        color_label = piece.split("_", 1)[0]
-        promoted_type = PROMO_MAP[promo]
-        newb[real_to] = f"{color_label}_{promoted_type}"
-    else:
-        newb[real_to] = piece
-
-    # handle en-passant capture:
-    # If a pawn moves to the en_passant_target square (which is empty on the board),
-    # then remove the captured pawn which sits behind that square.
-    if piece.endswith("pawn") and en_passant_target is not None:
-        # Compare real_to with provided en_passant_target (must match exactly)
-        if real_to == en_passant_target and board.get(real_to) == "empty":
-            # determine which pawn is captured
-            tcol, trow = square_to_coords(real_to)
-            if piece.startswith("white"):
-                # white captures downward removed pawn at row -1 from target
-                captured_row = trow - 1
-                captured_sq = coords_to_square(tcol, captured_row)
-                # verify and remove
-                if in_bounds_colrow(tcol, captured_row) and board.get(captured_sq) == "black_pawn":
-                    newb[captured_sq] = "empty"
+    fields = fen.split()
+    fields += ["w", "-", "-", "0", "1"][len(fields) - 1:]
+    placement, side, castling, ep, halfmove, fullmove = fields[:6]
+    ranks = placement.split("/")
+    if len(ranks) != 8:
+        raise ValueError("FEN placement needs 8 ranks: %r" % (placement,))
+    board = {}
+    for index, rank in enumerate(ranks):
+        row = 7 - index
+        col = 0
+        for ch in rank:
+            if ch.isdigit():
+                for _ in range(int(ch)):
+                    if col < 8:
+                        board[coords_to_square(col, row)] = "empty"
+                    col += 1
+            elif ch.lower() in FEN_PIECES and col < 8:
+                color = "white" if ch.isupper() else "black"
+                board[coords_to_square(col, row)] = color + "_" + FEN_PIECES[ch.lower()]
+                col += 1
             else:
-                # black captures upward removed pawn at row +1 from target
-                captured_row = trow + 1
-                captured_sq = coords_to_square(tcol, captured_row)
-                if in_bounds_colrow(tcol, captured_row) and board.get(captured_sq) == "white_pawn":
-                    newb[captured_sq] = "empty"
-
-    # handle castling rook relocation (use original to_sq semantics for castling detection)
-    if piece.endswith("king"):
-        # white
-        if piece == "white_king":
-            # king-side
-            if from_sq == "E1" and real_to == "G1":
-                # move rook H1 -> F1
-                newb["H1"] = "empty"
-                newb["F1"] = "white_rook"
-            # queen-side
-            elif from_sq == "E1" and real_to == "C1":
-                newb["A1"] = "empty"
-                newb["D1"] = "white_rook"
-            # moving king revokes both rights
-            new_rights["white"]["K"] = False
-            new_rights["white"]["Q"] = False
-        # black
-        elif piece == "black_king":
-            if from_sq == "E8" and real_to == "G8":
-                newb["H8"] = "empty"
-                newb["F8"] = "black_rook"
-            elif from_sq == "E8" and real_to == "C8":
-                newb["A8"] = "empty"
-                newb["D8"] = "black_rook"
-            new_rights["black"]["K"] = False
-            new_rights["black"]["Q"] = False
-
-    # if a rook moved (or was captured), revoke corresponding rook-side rights
-    if piece.endswith("rook"):
-        if piece == "white_rook":
-            if from_sq == "H1":
-                new_rights["white"]["K"] = False
-            elif from_sq == "A1":
-                new_rights["white"]["Q"] = False
-        elif piece == "black_rook":
-            if from_sq == "H8":
-                new_rights["black"]["K"] = False
-            elif from_sq == "A8":
-                new_rights["black"]["Q"] = False
-
-    # If a rook was captured on its original square, clear that right too
-    # (to cover capture-by-en-passant or other subtleties - conservative)
-    # Check destination square: look at original board (before move) using real_to
-    orig_target = board.get(real_to)
-    if orig_target == "white_rook":
-        if real_to == "H1":
-            new_rights["white"]["K"] = False
-        elif real_to == "A1":
-            new_rights["white"]["Q"] = False
-    elif orig_target == "black_rook":
-        if real_to == "H8":
-            new_rights["black"]["K"] = False
-        elif real_to == "A8":
-            new_rights["black"]["Q"] = False
-
-    # handle en-passant target creation: if the moved piece is a pawn and it moved two squares,
-    # set the en-passant target to the square it jumped over; otherwise None.
-    if piece.endswith("pawn"):
-        fcol, frow = square_to_coords(from_sq)
-        tcol, trow = square_to_coords(real_to)
-        if abs(trow - frow) == 2:
-            # square passed over
-            mid_row = (frow + trow) // 2
-            new_en_passant = coords_to_square(tcol, mid_row)
-        else:
-            new_en_passant = None
-    else:
-        new_en_passant = None
+                raise ValueError("bad FEN rank: %r" % (rank,))
+        if col != 8:
+            raise ValueError("FEN rank does not have 8 squares: %r" % (rank,))
+    castling_rights = {"white": {"K": False, "Q": False}, "black": {"K": False, "Q": False}}
+    for color_label, side_label, letter in FEN_CASTLING:
+        castling_rights[color_label][side_label] = letter in castling
+    color = "black" if side == "b" else "white"
+    en_passant_target = None if ep == "-" else ep.upper()
+    return board, color, castling_rights, en_passant_target, int(halfmove), int(fullmove)
+
+
+def to_fen(board, color, castling_rights=None, en_passant_target=None, halfmove_clock=0, fullmove_number=1):
+    """Dict position -> FEN. castling_rights None infers them from the board like the search does."""
+    if castling_rights is None:
+        castling_rights = infer_castling_rights_from_board(board)
+    ranks = []
+    for row in range(7, -1, -1):
+        rank = ""
+        empty = 0
+        for col in range(8):
+            piece = board.get(coords_to_square(col, row)) or "empty"
+            if piece == "empty":
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            color_label, name = piece.split("_", 1)
+            letter = FEN_LETTERS[name]
+            rank += letter.upper() if color_label == "white" else letter
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    castling = "".join(letter for color_label, side_label, letter in FEN_CASTLING
+                       if castling_rights.get(color_label, {}).get(side_label))
+    return " ".join(("/".join(ranks), "w" if color == "white" else "b", castling or "-",
+                     en_passant_target.lower() if en_passant_target else "-",
+                     str(halfmove_clock), str(fullmove_number)))
 
-    return newb, new_rights, new_en_passant
 
+# ---------------------------
+# Compact position representation
+# Squares are indexed 0..63 as row * 8 + col, so A1 = 0, H1 = 7, A8 = 56, H8 = 63.
+# Pieces are small ints: the low 3 bits hold the piece type and bit 3 the colour
+# (same layout as the Piece enum in Replit_ChessEngine.cpp, 0 = empty square).
+# ---------------------------
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE, BLACK = 0, 8
+
+COLOR_NAMES = {WHITE: "white", BLACK: "black"}
+COLOR_SIDES = {"white": WHITE, "black": BLACK}
+PIECE_TYPE_NAMES = {PAWN: "pawn", KNIGHT: "knight", BISHOP: "bishop", ROOK: "rook", QUEEN: "queen", KING: "king"}
+
+# 'white_pawn' -> 1, 'black_king' -> 14, 'empty' -> 0 (and back)
+PIECE_CODES = {"empty": EMPTY}
+for _side, _color_name in COLOR_NAMES.items():
+    for _ptype, _type_name in PIECE_TYPE_NAMES.items():
+        PIECE_CODES[f"{_color_name}_{_type_name}"] = _side | _ptype
+PIECE_NAMES = {code: name for name, code in PIECE_CODES.items()}
+
+SQUARE_NAMES = [coords_to_square(sq & 7, sq >> 3) for sq in range(64)]
+SQUARE_INDEX = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+NO_SQUARE = -1
+
+# castling rights as 4 bits (same order as CastlingRights in Replit_ChessEngine.cpp)
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLE_BITS = {("white", "K"): CASTLE_WK, ("white", "Q"): CASTLE_WQ,
+               ("black", "K"): CASTLE_BK, ("black", "Q"): CASTLE_BQ}
+
+# rights that survive a move touching a square (king/rook leaving or a rook being captured)
+CASTLE_MASK = [0xF] * 64
+CASTLE_MASK[SQUARE_INDEX["E1"]] &= ~(CASTLE_WK | CASTLE_WQ)
+CASTLE_MASK[SQUARE_INDEX["H1"]] &= ~CASTLE_WK
+CASTLE_MASK[SQUARE_INDEX["A1"]] &= ~CASTLE_WQ
+CASTLE_MASK[SQUARE_INDEX["E8"]] &= ~(CASTLE_BK | CASTLE_BQ)
+CASTLE_MASK[SQUARE_INDEX["H8"]] &= ~CASTLE_BK
+CASTLE_MASK[SQUARE_INDEX["A8"]] &= ~CASTLE_BQ
+
+KNIGHT_OFFSETS = ((2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1))
+KING_OFFSETS = ((0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1))
+ROOK_DIRECTIONS = ((0, 1), (0, -1), (-1, 0), (1, 0))
+BISHOP_DIRECTIONS = ((1, 1), (-1, 1), (-1, -1), (1, -1))
 
 # ---------------------------
-# Generate pseudo-legal moves (ignores checks)
+# Precomputed attack tables (built once at import)
+# KNIGHT_ATTACKS[sq] / KING_ATTACKS[sq]: squares a knight / king on sq attacks.
+# PAWN_ATTACKS[side][sq]: squares a pawn of side on sq attacks. Read the other way round,
+# PAWN_ATTACKS[side ^ BLACK][sq] are the squares an attacking pawn of side would stand on.
+# ROOK_RAYS[sq] / BISHOP_RAYS[sq]: the non-empty rays from sq, each ordered outward.
 # ---------------------------
 
-def rook_moves_from(square, board, color):
-    col, row = square_to_coords(square)
-    directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
-    moves = []
-    for dc, dr in directions:
-        c, r = col, row
-        while True:
-            c += dc; r += dr
-            if not in_bounds_colrow(c, r):
-                break
-            sq = coords_to_square(c, r)
-            target = board[sq]
-            if target == "empty":
-                moves.append(sq)
-            elif target.startswith(color):
-                break
-            else:
-                moves.append(sq)
-                break
-    return moves
+def _step_targets(sq, offsets):
+    col, row = sq & 7, sq >> 3
+    return tuple((row + dr) * 8 + col + dc for dc, dr in offsets
+                 if 0 <= col + dc <= 7 and 0 <= row + dr <= 7)
 
 
-def bishop_moves_from(square, board, color):
-    col, row = square_to_coords(square)
-    directions = [(1, 1), (-1, 1), (-1, -1), (1, -1)]
-    moves = []
+def _rays(sq, directions):
+    rays = []
     for dc, dr in directions:
-        c, r = col, row
-        while True:
-            c += dc; r += dr
-            if not in_bounds_colrow(c, r):
-                break
-            sq = coords_to_square(c, r)
-            target = board[sq]
-            if target == "empty":
-                moves.append(sq)
-            elif target.startswith(color):
-                break
-            else:
-                moves.append(sq)
-                break
-    return moves
-
-
-def queen_moves_from(square, board, color):
-    return rook_moves_from(square, board, color) + bishop_moves_from(square, board, color)
-
-
-def knight_moves_from(square, board, color):
-    col, row = square_to_coords(square)
-    offsets = [(2,1),(1,2),(-1,2),(-2,1),(-2,-1),(-1,-2),(1,-2),(2,-1)]
-    moves = []
-    for dc, dr in offsets:
-        c, r = col+dc, row+dr
-        if not in_bounds_colrow(c, r): continue
-        sq = coords_to_square(c, r)
-        target = board[sq]
-        if target == "empty" or not target.startswith(color):
-            moves.append(sq)
-    return moves
-
-
-def king_moves_from(square, board, color, castling_rights=None):
-    col, row = square_to_coords(square)
-    offsets = [(0,1),(0,-1),(1,0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
-    moves = []
-    for dc, dr in offsets:
-        c, r = col+dc, row+dr
-        if not in_bounds_colrow(c, r): continue
-        sq = coords_to_square(c, r)
-        target = board[sq]
-        if target == "empty" or not target.startswith(color):
-            moves.append(sq)
-
-    # Castling: only include if castling_rights provided (so attack checks can be applied elsewhere)
-    if castling_rights is not None:
-        opponent = "black" if color == "white" else "white"
-        # white
-        if color == "white":
-            # king-side
-            if castling_rights.get("white", {}).get("K"):
-                if board.get("F1") == "empty" and board.get("G1") == "empty":
-                    # NOTE: attack checks (E1,F1,G1) must be performed by caller before declaring legal
-                    moves.append("G1")
-            # queen-side
-            if castling_rights.get("white", {}).get("Q"):
-                if board.get("B1") == "empty" and board.get("C1") == "empty" and board.get("D1") == "empty":
-                    moves.append("C1")
-        else:
-            # black
-            if castling_rights.get("black", {}).get("K"):
-                if board.get("F8") == "empty" and board.get("G8") == "empty":
-                    moves.append("G8")
-            if castling_rights.get("black", {}).get("Q"):
-                if board.get("B8") == "empty" and board.get("C8") == "empty" and board.get("D8") == "empty":
-                    moves.append("C8")
+        ray = []
+        col, row = (sq & 7) + dc, (sq >> 3) + dr
+        while 0 <= col <= 7 and 0 <= row <= 7:
+            ray.append(row * 8 + col)
+            col += dc
+            row += dr
+        if ray:
+            rays.append(tuple(ray))
+    return tuple(rays)
+
+
+KNIGHT_ATTACKS = tuple(_step_targets(sq, KNIGHT_OFFSETS) for sq in range(64))
+KING_ATTACKS = tuple(_step_targets(sq, KING_OFFSETS) for sq in range(64))
+PAWN_ATTACKS = {
+    WHITE: tuple(_step_targets(sq, ((-1, 1), (1, 1))) for sq in range(64)),
+    BLACK: tuple(_step_targets(sq, ((-1, -1), (1, -1))) for sq in range(64)),
+}
+ROOK_RAYS = tuple(_rays(sq, ROOK_DIRECTIONS) for sq in range(64))
+BISHOP_RAYS = tuple(_rays(sq, BISHOP_DIRECTIONS) for sq in range(64))
+QUEEN_RAYS = tuple(ROOK_RAYS[sq] + BISHOP_RAYS[sq] for sq in range(64))
+
+# ---------------------------
+# Zobrist keys
+# 64-bit random keys for piece-square, side to move, castling rights and en-passant file.
+# Fixed seed so every process (and every run) agrees on the same position keys.
+# ---------------------------
+
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECES = [[_zobrist_rng.getrandbits(64) if code & 7 else 0 for _ in range(64)] for code in range(16)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+_zobrist_castle_bits = {bit: _zobrist_rng.getrandbits(64) for bit in (CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ)}
+# one key per 4-bit castling state, so a rights change is a single xor pair
+ZOBRIST_CASTLING = [0] * 16
+for _rights in range(16):
+    for _bit, _bit_key in _zobrist_castle_bits.items():
+        if _rights & _bit:
+            ZOBRIST_CASTLING[_rights] ^= _bit_key
+ZOBRIST_EP_FILE = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+
+# ---------------------------
+# Moves & simulation
+# A move is a single int: from | to << 6 | promotion piece type << 12
+# ---------------------------
+
+PROMO_MAP = {'Q': 'queen', 'R': 'rook', 'B': 'bishop', 'N': 'knight'}
+PROMO_TYPES = {'Q': QUEEN, 'R': ROOK, 'B': BISHOP, 'N': KNIGHT}
+PROMO_LETTERS = {ptype: letter for letter, ptype in PROMO_TYPES.items()}
+PROMOTION_ORDER = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+def encode_move(from_idx, to_idx, promo=0):
+    return from_idx | (to_idx << 6) | (promo << 12)
+
+
+def move_from_strings(from_sq, to_sq):
+    """'E7', 'E8Q' -> encoded move int."""
+    promo = 0
+    if len(to_sq) > 2 and to_sq[2].upper() in PROMO_TYPES:
+        promo = PROMO_TYPES[to_sq[2].upper()]
+    return encode_move(SQUARE_INDEX[from_sq.upper()], SQUARE_INDEX[to_sq[:2].upper()], promo)
 
-    return moves
 
+def move_to_strings(move):
+    """encoded move int -> ('E7', 'E8Q'), the square-name format used by the dict API."""
+    to_sq = SQUARE_NAMES[(move >> 6) & 63]
+    promo = move >> 12
+    if promo:
+        to_sq += PROMO_LETTERS[promo]
+    return SQUARE_NAMES[move & 63], to_sq
 
-def pawn_moves_from(square, board, color, en_passant_target=None):
+
+def move_name(move):
+    """encoded move int -> 'E2E4' / 'E7E8Q' (the key format used by engine_search)."""
+    from_sq, to_sq = move_to_strings(move)
+    return from_sq + to_sq
+
+
+class Position:
     """
-    Pawn moves including en-passant pseudo-moves.
-    en_passant_target: square like "E3" where a capturing pawn would land (standard FEN-style).
+    Array-backed chess position.
+    board: bytearray(64) of piece codes, side: WHITE/BLACK to move,
+    castling: CASTLE_* bits, ep: en-passant target square index or NO_SQUARE.
+    Search walks the tree with make_move/unmake_move instead of copying per node.
+    key: 64-bit Zobrist key, kept up to date incrementally by make_move/unmake_move.
+    score: material + piece-square score from white's point of view, also kept incrementally.
+    nodes: search nodes visited from this position (counted by negamax).
     """
-    col, row = square_to_coords(square)
-    moves = []
-    # helper to append promotion variants when target is last rank
-    def append_promotions(target_sq):
-        for p in ("Q","R","B","N"):
-            moves.append(target_sq + p)
-
-    if color == "white":
+    __slots__ = ("board", "side", "castling", "ep", "history", "key", "score", "nodes")
+
+    def __init__(self, board=None, side=WHITE, castling=0, ep=NO_SQUARE):
+        self.board = bytearray(64) if board is None else bytearray(board)
+        self.side = side
+        self.castling = castling
+        self.ep = ep
+        self.history = []   # undo stack for make_move/unmake_move
+        self.key = self.compute_key()
+        self.score = self.compute_score()
+        self.nodes = 0
+
+    def compute_key(self):
+        """Zobrist key from scratch (make_move keeps self.key updated without calling this)."""
+        key = 0
+        for sq, piece in enumerate(self.board):
+            if piece:
+                key ^= ZOBRIST_PIECES[piece][sq]
+        if self.side == BLACK:
+            key ^= ZOBRIST_SIDE
+        key ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep != NO_SQUARE:
+            key ^= ZOBRIST_EP_FILE[self.ep & 7]
+        return key
+
+    def compute_score(self):
+        """Material + piece-square score from scratch (white's point of view)."""
+        return sum(PIECE_SQUARE_SCORES[piece][sq] for sq, piece in enumerate(self.board) if piece)
+
+    # ---- converters to/from the dict format ----
+
+    @classmethod
+    def from_dict(cls, board, color="white", castling_rights=None, en_passant_target=None):
+        """
+        Build a Position from the square-name dict.
+        castling_rights uses the {"white": {"K": bool, "Q": bool}, "black": {...}} structure;
+        None means no castling rights (call infer_castling_rights_from_board first if wanted).
+        """
+        squares = bytearray(64)
+        for sq, piece in board.items():
+            code = PIECE_CODES.get(piece or "empty", EMPTY)
+            if code:
+                squares[SQUARE_INDEX[sq.upper()]] = code
+        castling = 0
+        if castling_rights:
+            for (color_label, side_label), bit in CASTLE_BITS.items():
+                if castling_rights.get(color_label, {}).get(side_label):
+                    castling |= bit
+        ep = SQUARE_INDEX[en_passant_target.upper()] if en_passant_target else NO_SQUARE
+        return cls(squares, COLOR_SIDES[color], castling, ep)
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Build a Position from a FEN string (the move clocks are not kept)."""
+        return cls.from_dict(*from_fen(fen)[:4])
+
+    def to_fen(self, halfmove_clock=0, fullmove_number=1):
+        return to_fen(self.to_dict(), self.color, self.castling_rights_dict(), self.en_passant_square(),
+                      halfmove_clock, fullmove_number)
+
+    def to_dict(self):
+        board = self.board
+        return {SQUARE_NAMES[sq]: PIECE_NAMES[board[sq]] for sq in range(64)}
+
+    def castling_rights_dict(self):
+        rights = {"white": {"K": False, "Q": False}, "black": {"K": False, "Q": False}}
+        for (color_label, side_label), bit in CASTLE_BITS.items():
+            rights[color_label][side_label] = bool(self.castling & bit)
+        return rights
+
+    def en_passant_square(self):
+        return SQUARE_NAMES[self.ep] if self.ep != NO_SQUARE else None
+
+    @property
+    def color(self):
+        return COLOR_NAMES[self.side]
+
+    def copy(self):
+        # the copy starts with an empty undo stack
+        return type(self)(self.board, self.side, self.castling, self.ep)
+
+    # ---- move application (in place, undone from the undo stack) ----
+
+    def make_move(self, move):
+        """
+        Apply move in place (castling rook hop, en-passant capture, promotion, rights, ep target).
+        Pushes an undo record (move, captured piece, old castling bits, old ep square, old key,
+        old score) onto self.history; unmake_move pops it to restore the position exactly.
+        The Zobrist key and the evaluation score are updated incrementally alongside the board.
+        """
+        board = self.board
+        fr = move & 63
+        to = (move >> 6) & 63
+        promo = move >> 12
+        piece = board[fr]
+        ptype = piece & 7
+        captured = board[to]
+        old_ep = self.ep
+        old_castling = self.castling
+        old_key = key = self.key
+        old_score = score = self.score
+
+        placed = (piece & BLACK) | promo if promo else piece
+        board[fr] = EMPTY
+        board[to] = placed
+        key ^= ZOBRIST_PIECES[piece][fr] ^ ZOBRIST_PIECES[placed][to]
+        score += PIECE_SQUARE_SCORES[placed][to] - PIECE_SQUARE_SCORES[piece][fr]
+        if captured:
+            key ^= ZOBRIST_PIECES[captured][to]
+            score -= PIECE_SQUARE_SCORES[captured][to]
+
+        new_ep = NO_SQUARE
+        if ptype == PAWN:
+            if to == old_ep:
+                # captured pawn sits behind the target square
+                victim_sq = to - 8 if piece < BLACK else to + 8
+                key ^= ZOBRIST_PIECES[board[victim_sq]][victim_sq]
+                score -= PIECE_SQUARE_SCORES[board[victim_sq]][victim_sq]
+                board[victim_sq] = EMPTY
+            elif to - fr == 16 or fr - to == 16:
+                new_ep = (fr + to) >> 1
+                key ^= ZOBRIST_EP_FILE[new_ep & 7]
+        elif ptype == KING and (to - fr == 2 or fr - to == 2):
+            # castling: hop the rook over the king
+            if to > fr:
+                rook_from, rook_to = to + 1, to - 1
+            else:
+                rook_from, rook_to = to - 2, to + 1
+            rook = board[rook_from]
+            board[rook_to] = rook
+            board[rook_from] = EMPTY
+            key ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+            score += PIECE_SQUARE_SCORES[rook][rook_to] - PIECE_SQUARE_SCORES[rook][rook_from]
+
+        if old_ep != NO_SQUARE:
+            key ^= ZOBRIST_EP_FILE[old_ep & 7]
+        castling = old_castling & CASTLE_MASK[fr] & CASTLE_MASK[to]
+        if castling != old_castling:
+            key ^= ZOBRIST_CASTLING[old_castling] ^ ZOBRIST_CASTLING[castling]
+
+        self.history.append((move, captured, old_castling, old_ep, old_key, old_score))
+        self.score = score
+        self.castling = castling
+        self.ep = new_ep
+        self.side ^= BLACK
+        self.key = key ^ ZOBRIST_SIDE
+
+    def unmake_move(self):
+        """Take back the last make_move. Returns the move that was undone."""
+        move, captured, self.castling, self.ep, self.key, self.score = self.history.pop()
+        self.side ^= BLACK
+        board = self.board
+        fr = move & 63
+        to = (move >> 6) & 63
+        piece = board[to]
+        if move >> 12:
+            piece = (piece & BLACK) | PAWN
+        ptype = piece & 7
+
+        board[fr] = piece
+        board[to] = captured
+        if ptype == PAWN:
+            if to == self.ep:
+                # put the en-passant victim back behind the target square
+                board[to - 8 if piece < BLACK else to + 8] = (piece ^ BLACK)
+        elif ptype == KING and (to - fr == 2 or fr - to == 2):
+            if to > fr:
+                board[to + 1] = board[to - 1]
+                board[to - 1] = EMPTY
+            else:
+                board[to - 2] = board[to + 1]
+                board[to + 1] = EMPTY
+        return move
+
+    # ---- move generation ----
+
+    def pseudo_legal_moves(self, side=None, castling=True):
+        """
+        Pseudo-legal moves (ignores checks) for side (default: side to move) as encoded ints.
+        castling=False also skips en-passant, matching the old mobility count.
+        """
+        board = self.board
+        if side is None:
+            side = self.side
+        moves = []
+        append = moves.append
+        for sq in range(64):
+            piece = board[sq]
+            if not piece or piece & BLACK != side:
+                continue
+            ptype = piece & 7
+            if ptype == PAWN:
+                self._pawn_moves(sq, side, castling, moves)
+            elif ptype == KNIGHT or ptype == KING:
+                for to in (KNIGHT_ATTACKS[sq] if ptype == KNIGHT else KING_ATTACKS[sq]):
+                    target = board[to]
+                    if not target or target & BLACK != side:
+                        append(sq | (to << 6))
+            else:
+                if ptype == ROOK:
+                    rays = ROOK_RAYS[sq]
+                elif ptype == BISHOP:
+                    rays = BISHOP_RAYS[sq]
+                else:
+                    rays = QUEEN_RAYS[sq]
+                for ray in rays:
+                    for to in ray:
+                        target = board[to]
+                        if target:
+                            if target & BLACK != side:
+                                append(sq | (to << 6))
+                            break
+                        append(sq | (to << 6))
+
+        # Castling: only the empty-squares part; attack checks are done by legal_moves
+        if castling and self.castling:
+            rights = self.castling
+            if side == WHITE:
+                if board[4] == WHITE | KING:
+                    if rights & CASTLE_WK and not board[5] and not board[6]:
+                        append(4 | (6 << 6))
+                    if rights & CASTLE_WQ and not board[1] and not board[2] and not board[3]:
+                        append(4 | (2 << 6))
+            elif board[60] == BLACK | KING:
+                if rights & CASTLE_BK and not board[61] and not board[62]:
+                    append(60 | (62 << 6))
+                if rights & CASTLE_BQ and not board[57] and not board[58] and not board[59]:
+                    append(60 | (58 << 6))
+        return moves
+
+    def _pawn_moves(self, sq, side, with_ep, moves):
+        board = self.board
+        append = moves.append
+        row = sq >> 3
+        if side == WHITE:
+            step, start_row, last_row = 8, 1, 7
+        else:
+            step, start_row, last_row = -8, 6, 0
+        forward = sq + step
+        promoting = (forward >> 3) == last_row
         # forward
-        if row < 7:
-            forward = coords_to_square(col, row+1)
-            if board[forward] == "empty":
-                # promotion?
-                if row + 1 == 7:
-                    append_promotions(forward)
+        if not board[forward]:
+            if promoting:
+                for promo in PROMOTION_ORDER:
+                    append(sq | (forward << 6) | (promo << 12))
+            else:
+                append(sq | (forward << 6))
+                # double-step
+                if row == start_row and not board[forward + step]:
+                    append(sq | ((forward + step) << 6))
+        # captures (including en-passant onto the target square)
+        for to in PAWN_ATTACKS[side][sq]:
+            target = board[to]
+            if target and target & BLACK != side:
+                if promoting:
+                    for promo in PROMOTION_ORDER:
+                        append(sq | (to << 6) | (promo << 12))
                 else:
-                    moves.append(forward)
-                    # double-step
-                    if row == 1:
-                        double = coords_to_square(col, row+2)
-                        if board[double] == "empty":
-                            moves.append(double)
-        # captures
-        for dc in (-1, 1):
-            c = col + dc
-            r = row + 1
-            if in_bounds_colrow(c, r):
-                sq = coords_to_square(c, r)
-                if board[sq] != "empty" and board[sq].startswith("black"):
-                    if r == 7:
-                        append_promotions(sq)
-                    else:
-                        moves.append(sq)
-        # en-passant captures
-        if en_passant_target:
-            # en_passant_target is where capturing pawn would land (e.g. 'd6')
-            # check if it's diagonally adjacent
-            for dc in (-1, 1):
-                c = col + dc
-                r = row + 1
-                if in_bounds_colrow(c, r):
-                    target_sq = coords_to_square(c, r)
-                    if target_sq == en_passant_target:
-                        # ensure there's an opponent pawn on the square behind the target (the pawn that moved two)
-                        tcol, trow = square_to_coords(en_passant_target)
-                        captured_row = trow - 1  # black pawn sits one row below the target for white capture
-                        if in_bounds_colrow(tcol, captured_row):
-                            captured_sq = coords_to_square(tcol, captured_row)
-                            if board.get(captured_sq) == "black_pawn":
-                                moves.append(en_passant_target)
-    else:
-        # black pawns
-        if row > 0:
-            forward = coords_to_square(col, row-1)
-            if board[forward] == "empty":
-                if row - 1 == 0:
-                    append_promotions(forward)
+                    append(sq | (to << 6))
+            elif with_ep and to == self.ep and board[to - step] == (side ^ BLACK) | PAWN:
+                append(sq | (to << 6))
+
+    def capture_moves(self):
+        """
+        Pseudo-legal captures (en passant included) and queen promotions for the side to move,
+        for quiescence search: quiet moves are never generated. Captures that promote only
+        promote to a queen.
+        """
+        board = self.board
+        side = self.side
+        enemy = side ^ BLACK
+        moves = []
+        append = moves.append
+        for sq in range(64):
+            piece = board[sq]
+            if not piece or piece & BLACK != side:
+                continue
+            ptype = piece & 7
+            if ptype == PAWN:
+                forward = sq + 8 if side == WHITE else sq - 8
+                promo = QUEEN << 12 if (forward >> 3) in (0, 7) else 0
+                if promo and not board[forward]:
+                    append(sq | (forward << 6) | promo)
+                for to in PAWN_ATTACKS[side][sq]:
+                    target = board[to]
+                    if target and target & BLACK == enemy:
+                        append(sq | (to << 6) | promo)
+                    elif to == self.ep and board[to + sq - forward] == enemy | PAWN:
+                        append(sq | (to << 6))
+            elif ptype == KNIGHT or ptype == KING:
+                for to in (KNIGHT_ATTACKS[sq] if ptype == KNIGHT else KING_ATTACKS[sq]):
+                    target = board[to]
+                    if target and target & BLACK == enemy:
+                        append(sq | (to << 6))
+            else:
+                if ptype == ROOK:
+                    rays = ROOK_RAYS[sq]
+                elif ptype == BISHOP:
+                    rays = BISHOP_RAYS[sq]
                 else:
-                    moves.append(forward)
-                    if row == 6:
-                        double = coords_to_square(col, row-2)
-                        if board[double] == "empty":
-                            moves.append(double)
-        for dc in (-1, 1):
-            c = col + dc
-            r = row - 1
-            if in_bounds_colrow(c, r):
-                sq = coords_to_square(c, r)
-                if board[sq] != "empty" and board[sq].startswith("white"):
-                    if r == 0:
-                        append_promotions(sq)
-                    else:
-                        moves.append(sq)
-        # en-passant captures for black
-        if en_passant_target:
-            for dc in (-1, 1):
-                c = col + dc
-                r = row - 1
-                if in_bounds_colrow(c, r):
-                    target_sq = coords_to_square(c, r)
-                    if target_sq == en_passant_target:
-                        tcol, trow = square_to_coords(en_passant_target)
-                        captured_row = trow + 1  # white pawn sits one row above the target for black capture
-                        if in_bounds_colrow(tcol, captured_row):
-                            captured_sq = coords_to_square(tcol, captured_row)
-                            if board.get(captured_sq) == "white_pawn":
-                                moves.append(en_passant_target)
-    return moves
-
-
-def pawn_attacks_from(square, board, color):
-    # used for attack detection (separate from pawn_moves_from)
-    col, row = square_to_coords(square)
-    attacks = []
-    if color == "white":
-        for dc in (-1, 1):
-            c = col + dc; r = row + 1
-            if in_bounds_colrow(c, r):
-                attacks.append(coords_to_square(c,r))
-    else:
-        for dc in (-1, 1):
-            c = col + dc; r = row - 1
-            if in_bounds_colrow(c, r):
-                attacks.append(coords_to_square(c,r))
-    return attacks
+                    rays = QUEEN_RAYS[sq]
+                for ray in rays:
+                    for to in ray:
+                        target = board[to]
+                        if target:
+                            if target & BLACK == enemy:
+                                append(sq | (to << 6))
+                            break
+        return moves
+
+    # ---- attack & check detection ----
+
+    def is_square_attacked(self, sq, by_side):
+        """Is square index sq attacked by by_side? Looks outward from the square using the attack tables."""
+        board = self.board
+
+        # Pawns: the squares a by_side pawn would attack sq from
+        pawn = by_side | PAWN
+        for from_sq in PAWN_ATTACKS[by_side ^ BLACK][sq]:
+            if board[from_sq] == pawn:
+                return True
 
+        # Knights and king
+        knight = by_side | KNIGHT
+        for from_sq in KNIGHT_ATTACKS[sq]:
+            if board[from_sq] == knight:
+                return True
+        king = by_side | KING
+        for from_sq in KING_ATTACKS[sq]:
+            if board[from_sq] == king:
+                return True
+
+        # Sliding: rook/queen orthogonal, bishop/queen diagonal; the first piece on a ray decides
+        queen = by_side | QUEEN
+        for rays, slider in ((ROOK_RAYS[sq], by_side | ROOK), (BISHOP_RAYS[sq], by_side | BISHOP)):
+            for ray in rays:
+                for from_sq in ray:
+                    piece = board[from_sq]
+                    if piece:
+                        if piece == slider or piece == queen:
+                            return True
+                        break
+        return False
+
+    def king_square(self, side=None):
+        if side is None:
+            side = self.side
+        try:
+            return self.board.index(side | KING)
+        except ValueError:
+            return NO_SQUARE
+
+    def in_check(self, side=None):
+        if side is None:
+            side = self.side
+        king_sq = self.king_square(side)
+        if king_sq == NO_SQUARE:
+            # no king? treat as not in check (or could be invalid)
+            return False
+        return self.is_square_attacked(king_sq, side ^ BLACK)
+
+    # ---- legal moves ----
+    # Checkers and pins are found once per node by looking outward from the king, so almost
+    # every move is known to be legal without playing it:
+    #   - in double check only king moves are generated
+    #   - in single check: king moves, plus captures of the checker and blocks of its ray by
+    #     pieces that are not pinned (found backwards from the target squares)
+    #   - otherwise pinned pieces stay on their pin ray and the king avoids attacked squares
+    # En-passant captures (which can expose the king along the rank) and king-less positions
+    # fall back to make-and-test.
+
+    def checks_and_pins(self, side=None):
+        """
+        Returns (king_sq, checkers, evasions, pins) for side (default: side to move):
+        checkers: squares of the pieces giving check
+        evasions: squares where a non-king move deals with a single check (checker + blocking squares)
+        pins: {pinned square: squares it may still move to (its ray up to and including the pinner)}
+        """
+        board = self.board
+        if side is None:
+            side = self.side
+        enemy = side ^ BLACK
+        king_sq = self.king_square(side)
+        checkers = []
+        evasions = set()
+        pins = {}
+
+        pawn = enemy | PAWN
+        for sq in PAWN_ATTACKS[side][king_sq]:
+            if board[sq] == pawn:
+                checkers.append(sq)
+                evasions.add(sq)
+        knight = enemy | KNIGHT
+        for sq in KNIGHT_ATTACKS[king_sq]:
+            if board[sq] == knight:
+                checkers.append(sq)
+                evasions.add(sq)
+
+        queen = enemy | QUEEN
+        for rays, slider in ((ROOK_RAYS[king_sq], enemy | ROOK), (BISHOP_RAYS[king_sq], enemy | BISHOP)):
+            for ray in rays:
+                pinned = NO_SQUARE
+                for index, sq in enumerate(ray):
+                    piece = board[sq]
+                    if not piece:
+                        continue
+                    if piece & BLACK == side:
+                        if pinned != NO_SQUARE:
+                            break          # two of our pieces: nothing pinned on this ray
+                        pinned = sq
+                        continue
+                    if piece == slider or piece == queen:
+                        if pinned == NO_SQUARE:
+                            checkers.append(sq)
+                            evasions.update(ray[:index + 1])
+                        else:
+                            pins[pinned] = ray[:index + 1]
+                    break
+        return king_sq, checkers, evasions, pins
+
+    def legal_moves(self):
+        side = self.side
+        enemy = side ^ BLACK
+        if self.king_square(side) == NO_SQUARE:
+            return self._legal_moves_by_make()
+        king_sq, checkers, evasions, pins = self.checks_and_pins(side)
+        if checkers:
+            return self._evasions(king_sq, checkers, evasions, pins)
+
+        board = self.board
+        ep = self.ep
+        legal = []
+        for move in self.pseudo_legal_moves():
+            fr = move & 63
+            to = (move >> 6) & 63
+            if fr == king_sq:
+                if to - fr == 2 or fr - to == 2:
+                    # castling (we are not in check): the passed and landing squares must be safe
+                    if self.is_square_attacked((fr + to) >> 1, enemy) or self.is_square_attacked(to, enemy):
+                        continue
+                elif self.is_square_attacked(to, enemy):
+                    continue
+            elif fr in pins:
+                if to not in pins[fr]:
+                    continue
+            elif to == ep and board[fr] & 7 == PAWN and not self._is_legal_by_make(move):
+                continue
+            legal.append(move)
+        return legal
+
+    def _evasions(self, king_sq, checkers, evasions, pins):
+        """Legal moves when in check (see the section comment)."""
+        board = self.board
+        side = self.side
+        enemy = side ^ BLACK
+        moves = []
+        append = moves.append
+
+        # the king steps out of check; it is lifted off the board so sliders see through its square
+        board[king_sq] = EMPTY
+        for to in KING_ATTACKS[king_sq]:
+            target = board[to]
+            if (not target or target & BLACK == enemy) and not self.is_square_attacked(to, enemy):
+                append(king_sq | (to << 6))
+        board[king_sq] = side | KING
+        if len(checkers) > 1:
+            return moves   # double check: only the king can move
+
+        # capture the checker or block its ray; a pinned piece can never do either
+        pawn, knight, queen = side | PAWN, side | KNIGHT, side | QUEEN
+        step = 8 if side == WHITE else -8
+        double_row = 3 if side == WHITE else 4
+        last_row = 7 if side == WHITE else 0
+        for to in evasions:
+            pawn_froms = []
+            if board[to]:
+                for fr in PAWN_ATTACKS[enemy][to]:
+                    if board[fr] == pawn:
+                        pawn_froms.append(fr)
+            elif 0 <= to - step < 64:
+                fr = to - step
+                if board[fr] == pawn:
+                    pawn_froms.append(fr)
+                elif not board[fr] and to >> 3 == double_row and board[fr - step] == pawn:
+                    pawn_froms.append(fr - step)
+            for fr in pawn_froms:
+                if fr in pins:
+                    continue
+                if to >> 3 == last_row:
+                    for promo in PROMOTION_ORDER:
+                        append(fr | (to << 6) | (promo << 12))
+                else:
+                    append(fr | (to << 6))
+            for fr in KNIGHT_ATTACKS[to]:
+                if board[fr] == knight and fr not in pins:
+                    append(fr | (to << 6))
+            for rays, slider in ((ROOK_RAYS[to], side | ROOK), (BISHOP_RAYS[to], side | BISHOP)):
+                for ray in rays:
+                    for fr in ray:
+                        piece = board[fr]
+                        if piece:
+                            if (piece == slider or piece == queen) and fr not in pins:
+                                append(fr | (to << 6))
+                            break
+
+        # en passant may capture a checking pawn (or, rarely, block): test it by playing it
+        ep = self.ep
+        if ep != NO_SQUARE:
+            for fr in PAWN_ATTACKS[enemy][ep]:
+                if board[fr] == pawn:
+                    move = fr | (ep << 6)
+                    if self._is_legal_by_make(move):
+                        append(move)
+        return moves
+
+    def _is_legal_by_make(self, move):
+        """Fallback legality test: play the move and look for a check on our king."""
+        side = self.side
+        self.make_move(move)
+        legal = not self.in_check(side)
+        self.unmake_move()
+        return legal
+
+    def _legal_moves_by_make(self):
+        """Make-and-test every pseudo-legal move (fallback, e.g. for positions without a king)."""
+        enemy = self.side ^ BLACK
+        legal = []
+        for move in self.pseudo_legal_moves():
+            fr = move & 63
+            to = (move >> 6) & 63
+            # castling: the king may not start on, pass through or land on an attacked square
+            if self.board[fr] & 7 == KING and (to - fr == 2 or fr - to == 2):
+                if (self.is_square_attacked(fr, enemy) or
+                        self.is_square_attacked((fr + to) >> 1, enemy)):
+                    continue
+            if self._is_legal_by_make(move):
+                legal.append(move)
+        return legal
+
+    # ---- evaluation ----
+
+    def evaluate(self, perspective_side):
+        """
+        Static evaluation from perspective_side: material + piece-square tables.
+        Positive means good for perspective_side. O(1): self.score is kept up to date by
+        make_move/unmake_move.
+        """
+        return self.score if perspective_side == WHITE else -self.score
+
+    def evaluate_mobility(self, perspective_side):
+        """
+        The previous evaluation (material + 2 per pseudo-legal move of difference), kept so the
+        two can be compared (bench.py --eval). Generates both sides' moves on every call.
+        """
+        score = 0
+        for piece in self.board:
+            if piece:
+                pval = PIECE_VALUES_BY_TYPE[piece & 7]
+                score += pval if piece & BLACK == perspective_side else -pval
+        # small mobility bonus (optional)
+        own_moves = len(self.pseudo_legal_moves(perspective_side, castling=False))
+        opp_moves = len(self.pseudo_legal_moves(perspective_side ^ BLACK, castling=False))
+        score += 2 * (own_moves - opp_moves)
+        return score
+
+
+# ---------------------------
+# Board backends
+# BACKEND_MAILBOX: Position above. BACKEND_BITBOARD: bitboard.BitboardPosition, the same
+# interface on Python-int bitboards. BOARD_BACKEND is used by the dict API below and is the
+# default for engine_search.
+# ---------------------------
+
+BACKEND_MAILBOX = "mailbox"
+BACKEND_BITBOARD = "bitboard"
+BOARD_BACKENDS = (BACKEND_MAILBOX, BACKEND_BITBOARD)
+BOARD_BACKEND = BACKEND_MAILBOX
+
+
+def position_class(backend=None):
+    """Position class of backend (default: BOARD_BACKEND)."""
+    if (backend or BOARD_BACKEND) == BACKEND_BITBOARD:
+        from bitboard import BitboardPosition   # imported here: bitboard.py builds on this module
+        return BitboardPosition
+    return Position
+
+
+def _moves_to_dict(moves):
+    """[encoded moves] -> {from_square: [to_square, ...]} as returned by the dict API."""
+    result = {}
+    for move in moves:
+        from_sq, to_sq = move_to_strings(move)
+        result.setdefault(from_sq, []).append(to_sq)
+    return result
+
+
+def simulate_move(board, from_sq, to_sq, castling_rights=None, en_passant_target=None):
+    """
+    Apply move and return (new_board, new_castling_rights, new_en_passant_target).
+    Handles castling rook moves and updates castling rights when king/rook moves.
+    Handles en-passant captures and sets en_passant target after double-step pawn moves.
+    NOTE: board is not modified in-place.
+
+    to_sq may include a promotion suffix, e.g. "E8Q" where 'Q' is promotion piece.
+    """
+    if castling_rights is None:
+        castling_rights = infer_castling_rights_from_board(board)
+    color = board[from_sq].split("_", 1)[0]
+    pos = position_class().from_dict(board, color, castling_rights, en_passant_target)
+    move = move_from_strings(from_sq, to_sq)
+    if (move >> 12) and pos.board[move & 63] & 7 != PAWN:
+        move &= 0xFFF  # promotion suffix only applies to pawns
+    pos.make_move(move)
+    return pos.to_dict(), pos.castling_rights_dict(), pos.en_passant_square()
+
+
+# ---------------------------
+# Generate pseudo-legal moves (ignores checks)
+# ---------------------------
 
 def generate_pseudo_legal_moves(board, color, castling_rights=None, en_passant_target=None):
     """
@@ -418,27 +913,8 @@ def generate_pseudo_legal_moves(board, color, castling_rights=None, en_passant_t
     Includes en-passant pseudo-moves when en_passant_target is provided.
     Castling pseudo-moves are included when castling_rights is provided; callers must still filter by attack squares to make them legal.
     """
-    moves = {}
-    for sq, piece in board.items():
-        if piece == "empty" or not piece.startswith(color):
-            continue
-        if piece.endswith("rook"):
-            to_list = rook_moves_from(sq, board, color)
-        elif piece.endswith("knight"):
-            to_list = knight_moves_from(sq, board, color)
-        elif piece.endswith("bishop"):
-            to_list = bishop_moves_from(sq, board, color)
-        elif piece.endswith("queen"):
-            to_list = queen_moves_from(sq, board, color)
-        elif piece.endswith("king"):
-            to_list = king_moves_from(sq, board, color, castling_rights)
-        elif piece.endswith("pawn"):
-            to_list = pawn_moves_from(sq, board, color, en_passant_target=en_passant_target)
-        else:
-            to_list = []
-        if to_list:
-            moves[sq] = to_list
-    return moves
+    pos = position_class().from_dict(board, color, castling_rights, en_passant_target)
+    return _moves_to_dict(pos.pseudo_legal_moves())
 
 
 # ---------------------------
@@ -449,55 +925,8 @@ def is_square_attacked(board, square, by_color):
     """
     Is `square` attacked by side `by_color` ('white'/'black')?
     """
-    # Pawns
-    for attacker_sq, piece in board.items():
-        if piece == "empty" or not piece.startswith(by_color):
-            continue
-        if piece.endswith("pawn"):
-            attacks = pawn_attacks_from(attacker_sq, board, by_color)
-            if square in attacks:
-                return True
-
-    # Knights
-    for attacker_sq, piece in board.items():
-        if piece == "empty" or not piece.startswith(by_color): continue
-        if piece.endswith("knight"):
-            if square in knight_moves_from(attacker_sq, board, by_color):
-                return True
-
-    # King (adjacent) -- use king_moves_from without castling rights so castling squares aren't considered
-    for attacker_sq, piece in board.items():
-        if piece == "empty" or not piece.startswith(by_color): continue
-        if piece.endswith("king"):
-            if square in king_moves_from(attacker_sq, board, by_color):
-                return True
-
-    # Sliding: rook/queen orthogonal
-    col0, row0 = square_to_coords(square)
-    for dc, dr, attackers in ((0,1,("rook","queen")),(0,-1,("rook","queen")),(-1,0,("rook","queen")),(1,0,("rook","queen"))):
-        c, r = col0+dc, row0+dr
-        while in_bounds_colrow(c, r):
-            sq = coords_to_square(c, r)
-            piece = board[sq]
-            if piece != "empty":
-                if piece.startswith(by_color) and (piece.endswith(attackers[0]) or piece.endswith(attackers[1])):
-                    return True
-                break
-            c += dc; r += dr
-
-    # Sliding: bishop/queen diagonal
-    for dc, dr in ((1,1),(1,-1),(-1,1),(-1,-1)):
-        c, r = col0+dc, row0+dr
-        while in_bounds_colrow(c,r):
-            sq = coords_to_square(c,r)
-            piece = board[sq]
-            if piece != "empty":
-                if piece.startswith(by_color) and (piece.endswith("bishop") or piece.endswith("queen")):
-                    return True
-                break
-            c += dc; r += dr
-
-    return False
+    pos = position_class().from_dict(board)
+    return pos.is_square_attacked(SQUARE_INDEX[square.upper()], COLOR_SIDES[by_color])
 
 
 def find_king_square(board, color):
@@ -509,12 +938,7 @@ def find_king_square(board, color):
 
 
 def is_in_check(board, color):
-    king_sq = find_king_square(board, color)
-    if not king_sq:
-        # no king? treat as not in check (or could be invalid)
-        return False
-    opponent = "black" if color == "white" else "white"
-    return is_square_attacked(board, king_sq, opponent)
+    return position_class().from_dict(board, color).in_check()
 
 
 # ---------------------------
@@ -522,36 +946,8 @@ def is_in_check(board, color):
 # ---------------------------
 
 def generate_legal_moves(board, color, castling_rights=None, en_passant_target=None):
-    pseudo = generate_pseudo_legal_moves(board, color, castling_rights, en_passant_target=en_passant_target)
-    legal = {}
-    for fr, to_list in pseudo.items():
-        legal_targets = []
-        for to in to_list:
-            # simulate using current en_passant_target so en-passant capture is correctly handled
-            nb, new_rights, new_en_passant = simulate_move(board, fr, to, castling_rights, en_passant_target)
-            # when castling pseudo-move was included we must ensure the king doesn't pass through or land on attacked squares
-            if board.get(fr) and board[fr].endswith("king") and castling_rights is not None:
-                # Only need to check castling-specific squares if move is castling
-                # white
-                if fr == "E1" and to == "G1":
-                    if is_square_attacked(board, "E1", "black") or is_square_attacked(board, "F1", "black") or is_square_attacked(board, "G1", "black"):
-                        continue
-                if fr == "E1" and to == "C1":
-                    if is_square_attacked(board, "E1", "black") or is_square_attacked(board, "D1", "black") or is_square_attacked(board, "C1", "black"):
-                        continue
-                # black
-                if fr == "E8" and to == "G8":
-                    if is_square_attacked(board, "E8", "white") or is_square_attacked(board, "F8", "white") or is_square_attacked(board, "G8", "white"):
-                        continue
-                if fr == "E8" and to == "C8":
-                    if is_square_attacked(board, "E8", "white") or is_square_attacked(board, "D8", "white") or is_square_attacked(board, "C8", "white"):
-                        continue
-
-            if not is_in_check(nb, color):
-                legal_targets.append(to)
-        if legal_targets:
-            legal[fr] = legal_targets
-    return legal
+    pos = position_class().from_dict(board, color, castling_rights, en_passant_target)
+    return _moves_to_dict(pos.legal_moves())
 
 
 # ---------------------------
@@ -560,209 +956,1082 @@ def generate_legal_moves(board, color, castling_rights=None, en_passant_target=N
 PIECE_VALUES = {
     'pawn': 100, 'knight': 320, 'bishop': 330, 'rook': 500, 'queen': 900, 'king': 20000
 }
+PIECE_VALUES_BY_TYPE = [0] * 8
+for _ptype, _type_name in PIECE_TYPE_NAMES.items():
+    PIECE_VALUES_BY_TYPE[_ptype] = PIECE_VALUES[_type_name]
+
+# Piece-square tables (simplified evaluation function values), from white's point of view and
+# laid out as seen from white's side: the first row is rank 8, the last row rank 1.
+PIECE_SQUARE_TABLES = {
+    PAWN: (
+          0,   0,   0,   0,   0,   0,   0,   0,
+         50,  50,  50,  50,  50,  50,  50,  50,
+         10,  10,  20,  30,  30,  20,  10,  10,
+          5,   5,  10,  25,  25,  10,   5,   5,
+          0,   0,   0,  20,  20,   0,   0,   0,
+          5,  -5, -10,   0,   0, -10,  -5,   5,
+          5,  10,  10, -20, -20,  10,  10,   5,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ),
+    KNIGHT: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ),
+    BISHOP: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ),
+    ROOK: (
+          0,   0,   0,   0,   0,   0,   0,   0,
+          5,  10,  10,  10,  10,  10,  10,   5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+          0,   0,   0,   5,   5,   0,   0,   0,
+    ),
+    QUEEN: (
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+         -5,   0,   5,   5,   5,   5,   0,  -5,
+          0,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+    ),
+    KING: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+         20,  20,   0,   0,   0,   0,  20,  20,
+         20,  30,  10,   0,   0,  10,  30,  20,
+    ),
+}
+
+# PIECE_SQUARE_SCORES[piece code][square]: material + table value, positive for white pieces
+# and negative for black ones, so a position's score is just the sum over its pieces.
+PIECE_SQUARE_SCORES = [[0] * 64 for _ in range(16)]
+for _ptype, _table in PIECE_SQUARE_TABLES.items():
+    for _sq in range(64):
+        _row, _col = _sq >> 3, _sq & 7
+        PIECE_SQUARE_SCORES[WHITE | _ptype][_sq] = PIECE_VALUES_BY_TYPE[_ptype] + _table[(7 - _row) * 8 + _col]
+        PIECE_SQUARE_SCORES[BLACK | _ptype][_sq] = -(PIECE_VALUES_BY_TYPE[_ptype] + _table[_row * 8 + _col])
 
 
 def evaluate_board(board, perspective_color):
     """
-    Basic static evaluation from perspective_color side.
+    Static evaluation (material + piece-square tables) from perspective_color side.
     Positive means good for perspective_color.
     """
-    score = 0
-    for sq, piece in board.items():
-        if piece == "empty": continue
-        parts = piece.split("_", 1)
-        if len(parts) != 2: continue
-        color_label, ptype = parts
-        pval = PIECE_VALUES.get(ptype, 0)
-        if color_label == perspective_color:
-            score += pval
+    return position_class().from_dict(board).evaluate(COLOR_SIDES[perspective_color])
+
+
+# ---------------------------
+# Transposition table
+# Fixed-size table keyed by Position.key. Entries live in one flat buffer (so the size is a
+# real memory budget) viewed as three typed arrays: keys, scores and packed info words.
+# Buckets hold two entries; the replacement policy prefers to evict stale (older search)
+# entries first and shallower entries second.
+# The buffer may be shared between processes (lazy SMP). There are no locks: the key word
+# is stored XORed with the score and info words, so an entry torn by two concurrent writers
+# no longer matches its key and simply reads as a miss.
+# ---------------------------
+
+TT_EXACT, TT_LOWER, TT_UPPER = 1, 2, 3   # 0 = empty slot
+DEFAULT_HASH_MB = 16
+WORD_MASK = (1 << 64) - 1
+
+
+class TranspositionTable:
+    ENTRY_BYTES = 24        # key (8) + score (8) + info (8)
+    BUCKET_SIZE = 2
+
+    @classmethod
+    def buffer_size(cls, size_mb):
+        entries = max(cls.BUCKET_SIZE, int(size_mb * 1024 * 1024) // cls.ENTRY_BYTES)
+        return entries // cls.BUCKET_SIZE * cls.BUCKET_SIZE * cls.ENTRY_BYTES
+
+    def __init__(self, size_mb=DEFAULT_HASH_MB, buffer=None):
+        """buffer (optional): writable buffer of buffer_size(size_mb) bytes, e.g. a shared mp.RawArray."""
+        nbytes = self.buffer_size(size_mb)
+        self.entries = n = nbytes // self.ENTRY_BYTES
+        self.buckets = n // self.BUCKET_SIZE
+        if buffer is None:
+            buffer = bytearray(nbytes)
+        self._buffer = buffer
+        self._view = view = memoryview(buffer).cast("B")[:nbytes]
+        self.keys = view[:8 * n].cast("Q")      # key ^ score ^ info
+        self.scores = view[8 * n:16 * n].cast("q")
+        # info word: move (16 bits) | depth (8 bits) << 16 | bound (2 bits) << 24 | age (8 bits) << 26
+        self.infos = view[16 * n:].cast("q")
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self, age=None):
+        """
+        Bump the age so entries from earlier searches are replaced first.
+        age (optional): set it explicitly instead; every user of a shared table must agree on it.
+        """
+        self.age = (self.age + 1 if age is None else age) & 0xFF
+
+    def probe(self, key):
+        """Returns (depth, score, bound, move) for key, or None."""
+        index = (key % self.buckets) * self.BUCKET_SIZE
+        keys = self.keys
+        occupied = False
+        for slot in range(index, index + self.BUCKET_SIZE):
+            info = self.infos[slot]
+            if not info:
+                continue
+            score = self.scores[slot]
+            if keys[slot] ^ (score & WORD_MASK) ^ info == key:
+                self.hits += 1
+                return (info >> 16) & 0xFF, score, (info >> 24) & 3, info & 0xFFFF
+            occupied = True
+        self.misses += 1
+        if occupied:
+            # bucket is full of other positions (index collision)
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move=0):
+        index = (key % self.buckets) * self.BUCKET_SIZE
+        keys = self.keys
+        infos = self.infos
+        age = self.age
+        victim = -1
+        victim_worth = None
+        scores = self.scores
+        for slot in range(index, index + self.BUCKET_SIZE):
+            info = infos[slot]
+            if not info or keys[slot] ^ (scores[slot] & WORD_MASK) ^ info == key:
+                victim = slot
+                if info and not move:
+                    move = info & 0xFFFF   # keep the old best move when we have none
+                break
+            # stale entries are worth less than any entry from the current search
+            worth = (info >> 16) & 0xFF
+            if (info >> 26) & 0xFF != age:
+                worth -= 256
+            if victim_worth is None or worth < victim_worth:
+                victim, victim_worth = slot, worth
         else:
-            score -= pval
-    # small mobility bonus (optional)
-    own_moves = sum(len(v) for v in generate_pseudo_legal_moves(board, perspective_color).values())
-    opp = "black" if perspective_color == "white" else "white"
-    opp_moves = sum(len(v) for v in generate_pseudo_legal_moves(board, opp).values())
-    score += 2 * (own_moves - opp_moves)
-    return score
+            self.overwrites += 1
+        self.stores += 1
+        info = move | (min(depth, 0xFF) << 16) | (bound << 24) | (age << 26)
+        scores[victim] = score
+        infos[victim] = info
+        keys[victim] = key ^ (score & WORD_MASK) ^ info
+
+    def clear(self):
+        self._view[:] = bytes(len(self._view))
+        self.hits = self.misses = self.collisions = self.stores = self.overwrites = 0
+
+    def hashfull(self):
+        """Per-mille of slots in use (sampled over the first 1000 slots, like UCI's hashfull)."""
+        sample = min(1000, self.entries)
+        used = sum(1 for slot in range(sample) if self.infos[slot])
+        return used * 1000 // sample
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "collisions": self.collisions,
+            "stores": self.stores, "overwrites": self.overwrites,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
+
+
+# ---------------------------
+# Move ordering
+# SearchState holds the per-worker ordering tables. Moves are searched in this order:
+#   1. hash move (best move stored in the transposition table)
+#   2. captures and promotions, most valuable victim / least valuable attacker first
+#   3. killer moves: quiet moves that caused a cutoff at the same ply
+#   4. other quiet moves by history score (depth^2 added on every cutoff they cause)
+# cutoffs / first_cutoffs count beta cutoffs and how many of them came from the first move
+# searched, the usual measure of ordering quality.
+# ---------------------------
+
+MAX_PLY = 128
+ORDER_HASH = 1 << 30
+ORDER_CAPTURE = 1 << 20
+ORDER_KILLER = 1 << 19
+HISTORY_LIMIT = ORDER_KILLER - 1      # history scores are halved before reaching the killers
+
+
+class SearchState:
+    """Killer moves, history table and cutoff counters of one search worker."""
+
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 4096)      # [side][from | to << 6]
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+
+    def new_search(self):
+        """Killers belong to a position; history is only aged so it keeps most of its ordering."""
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.history = [h >> 1 for h in self.history]
+
+    def order(self, pos, moves, hash_move, ply):
+        """Returns moves sorted best-first (see the section comment for the order)."""
+        board = pos.board
+        ep = pos.ep
+        killer1, killer2 = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        history = self.history
+        base = (pos.side >> 3) << 12
+        scored = []
+        for move in moves:
+            if move == hash_move:
+                scored.append((ORDER_HASH, move))
+                continue
+            to = (move >> 6) & 63
+            victim = board[to] & 7
+            promo = move >> 12
+            attacker = board[move & 63] & 7
+            if not victim and attacker == PAWN and to == ep:
+                victim = PAWN
+            if victim or promo:
+                scored.append((ORDER_CAPTURE + ((victim + promo) << 4) - attacker, move))
+            elif move == killer1:
+                scored.append((ORDER_KILLER + 1, move))
+            elif move == killer2:
+                scored.append((ORDER_KILLER, move))
+            else:
+                scored.append((history[base + (move & 4095)], move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def cutoff(self, pos, move, depth, ply, index):
+        """Record a beta cutoff by move, the index-th move searched at this node (pos is unmade)."""
+        self.cutoffs += 1
+        if index == 0:
+            self.first_cutoffs += 1
+        to = (move >> 6) & 63
+        if pos.board[to] or move >> 12 or (to == pos.ep and pos.board[move & 63] & 7 == PAWN):
+            return   # captures and promotions are ordered by MVV-LVA already
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        index = ((pos.side >> 3) << 12) + (move & 4095)
+        score = self.history[index] + depth * depth
+        self.history[index] = score
+        if score > HISTORY_LIMIT:
+            self.history = [h >> 1 for h in self.history]
+
+    def stats(self):
+        return {
+            "cutoffs": self.cutoffs, "first_cutoffs": self.first_cutoffs,
+            "first_cutoff_rate": self.first_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+        }
 
 
 # ---------------------------
-# Minimax with alpha-beta
+# Quiescence search
+# Run at the horizon instead of a plain static evaluation: only captures and promotions are
+# searched (from Position.capture_moves, quiet moves are never generated) until the position
+# is quiet. The side to move may always "stand pat" on the static evaluation; captures that
+# can't lift it to alpha even with DELTA_MARGIN to spare are skipped (delta pruning).
+# In check there is no standing pat: every evasion is searched.
 # ---------------------------
 
-def minimax(board, maximizing_color, current_color, depth, alpha, beta, stop_event, castling_rights=None, en_passant_target=None):
+DELTA_MARGIN = 200
+
+
+def quiescence(pos, alpha, beta, stop_event, ply=0, state=None):
+    """Fail-soft capture search; returns the score of pos for the side to move."""
+    if stop_event.is_set():
+        return 0
+
+    pos.nodes += 1
+    if state is None:
+        state = SearchState()
+    side = pos.side
+    if pos.in_check(side):
+        moves = pos.legal_moves()
+        if not moves:
+            return -(MATE_SCORE - ply)   # checkmated
+        if ply >= MAX_PLY:
+            return pos.evaluate(side)
+        best = -INF_SCORE
+        stand_pat = None
+    else:
+        stand_pat = best = pos.evaluate(side)
+        if best >= beta or ply >= MAX_PLY:
+            return best
+        if best > alpha:
+            alpha = best
+        moves = pos.capture_moves()
+
+    board = pos.board
+    for move in state.order(pos, moves, 0, ply):
+        if stand_pat is not None:
+            victim = board[(move >> 6) & 63]
+            promo = move >> 12
+            if victim:
+                gain = PIECE_VALUES_BY_TYPE[victim & 7]
+            elif promo:
+                gain = 0                                # promotion push
+            else:
+                gain = PIECE_VALUES_BY_TYPE[PAWN]       # en passant
+            if promo:
+                gain += PIECE_VALUES_BY_TYPE[promo] - PIECE_VALUES_BY_TYPE[PAWN]
+            if stand_pat + gain + DELTA_MARGIN <= alpha:
+                continue
+        pos.make_move(move)
+        if stand_pat is not None and pos.in_check(side):
+            pos.unmake_move()   # pseudo-legal capture that leaves our king in check
+            continue
+        score = -quiescence(pos, -beta, -alpha, stop_event, ply + 1, state)
+        pos.unmake_move()
+        if score > best:
+            best = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best
+
+
+# ---------------------------
+# Negamax principal variation search
+# Scores are from the side to move's point of view. The first move of a node is searched
+# with the full window, the rest with a null window around alpha and re-searched only if
+# they beat it. Mates are finite: MATE_SCORE - plies to mate, so shorter mates score higher.
+# ---------------------------
+
+MATE_SCORE = 1000000
+MATE_BOUND = MATE_SCORE - 1000      # anything beyond this is a mate score
+INF_SCORE = MATE_SCORE + 1
+
+
+def _score_to_tt(score, ply):
+    # mate scores are stored relative to the node, not the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def negamax(pos, depth, alpha, beta, stop_event, tt=None, ply=0, state=None):
     """
-    Returns evaluation score from perspective of maximizing_color.
-    current_color is side to move in this node.
-    castling_rights is the rights for the current board state and will be updated when moves are simulated.
-    en_passant_target is the current en-passant target square (or None).
+    Returns the fail-soft score of pos for the side to move (pos.side).
+    Castling rights and the en-passant target travel inside the Position. Children are
+    visited with make_move/unmake_move, so pos is back in its original state when this returns.
+    tt (optional): TranspositionTable; scores are side-to-move relative, so one table can be
+    shared by any searches.
+    ply: distance from the root (used to score mates and index killers).
+    state (optional): SearchState with the move-ordering tables (a fresh one if None).
     """
     if stop_event.is_set():
         # aborted by main thread/user
         return 0
 
-    if depth == 0:
-        return evaluate_board(board, maximizing_color)
+    if depth <= 0:
+        return quiescence(pos, alpha, beta, stop_event, ply, state)
+
+    pos.nodes += 1
+    hash_move = 0
+    if tt is not None:
+        entry = tt.probe(pos.key)
+        if entry is not None:
+            tt_depth, tt_score, tt_bound, hash_move = entry
+            if tt_depth >= depth:
+                tt_score = _score_from_tt(tt_score, ply)
+                if tt_bound == TT_EXACT:
+                    return tt_score
+                if tt_bound == TT_LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score
 
-    legal_moves = generate_legal_moves(board, current_color, castling_rights, en_passant_target=en_passant_target)
+    legal_moves = pos.legal_moves()
     if not legal_moves:
         # no legal moves: checkmate or stalemate
-        if is_in_check(board, current_color):
-            # current_color is checkmated -> very bad for current_color
-            return -math.inf if current_color == maximizing_color else math.inf
+        if pos.in_check():
+            return -(MATE_SCORE - ply)   # side to move is checkmated
+        return 0  # stalemate -> draw
+
+    if state is None:
+        state = SearchState()
+    legal_moves = state.order(pos, legal_moves, hash_move, ply)
+
+    alpha_orig = alpha
+    best = -INF_SCORE
+    best_move = 0
+    for index, move in enumerate(legal_moves):
+        if stop_event.is_set():
+            return 0
+        pos.make_move(move)
+        if not best_move:
+            score = -negamax(pos, depth - 1, -beta, -alpha, stop_event, tt, ply + 1, state)
         else:
-            return 0  # stalemate -> draw
-
-    next_color = "black" if current_color == "white" else "white"
-
-    if current_color == maximizing_color:
-        value = -math.inf
-        for fr, tos in legal_moves.items():
-            for to in tos:
-                if stop_event.is_set():
-                    return 0
-                nb, new_rights, new_en_passant = simulate_move(board, fr, to, castling_rights, en_passant_target)
-                score = minimax(nb, maximizing_color, next_color, depth-1, alpha, beta,
-                                stop_event=stop_event, castling_rights=new_rights, en_passant_target=new_en_passant)
-                value = max(value, score)
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    return value
-        return value
-    else:
-        value = math.inf
-        for fr, tos in legal_moves.items():
-            for to in tos:
-                if stop_event.is_set():
-                    return 0
-                nb, new_rights, new_en_passant = simulate_move(board, fr, to, castling_rights, en_passant_target)
-                score = minimax(nb, maximizing_color, next_color, depth-1, alpha, beta,
-                                stop_event=stop_event, castling_rights=new_rights, en_passant_target=new_en_passant)
-                value = min(value, score)
-                beta = min(beta, value)
+            # null window: only prove the move is no better than alpha
+            score = -negamax(pos, depth - 1, -alpha - 1, -alpha, stop_event, tt, ply + 1, state)
+            if alpha < score < beta:
+                score = -negamax(pos, depth - 1, -beta, -alpha, stop_event, tt, ply + 1, state)
+        pos.unmake_move()
+        if score > best or not best_move:
+            best, best_move = score, move
+            if score > alpha:
+                alpha = score
                 if alpha >= beta:
-                    return value
-        return value
+                    state.cutoff(pos, move, depth, ply, index)
+                    break
+
+    if tt is not None and not stop_event.is_set():
+        if best <= alpha_orig:
+            bound = TT_UPPER
+        elif best >= beta:
+            bound = TT_LOWER
+        else:
+            bound = TT_EXACT
+        tt.store(pos.key, depth, _score_to_tt(best, ply), bound, best_move)
+    return best
+
+
+# ---------------------------
+# Principal variation helpers
+# ---------------------------
+
+def extract_pv(pos, tt, max_length):
+    """Follow best moves stored in tt from pos; returns the line as a list of moves."""
+    pv = []
+    seen = set()
+    while len(pv) < max_length and pos.key not in seen:
+        entry = tt.probe(pos.key)
+        if entry is None or not entry[3] or entry[3] not in pos.legal_moves():
+            break
+        seen.add(pos.key)
+        pos.make_move(entry[3])
+        pv.append(entry[3])
+    for _ in pv:
+        pos.unmake_move()
+    return pv
+
+
+def seed_pv(pos, tt, pv):
+    """
+    Store the moves of a previous principal variation as hash moves so they are searched
+    first. Existing entries keep their data; new ones are depth-0 upper bounds of INF_SCORE,
+    which never cause a cutoff.
+    """
+    for move in pv:
+        entry = tt.probe(pos.key)
+        if entry is None:
+            tt.store(pos.key, 0, INF_SCORE, TT_UPPER, move)
+        elif entry[3] != move:
+            tt.store(pos.key, entry[0], entry[1], entry[2], move)
+        pos.make_move(move)
+    for _ in pv:
+        pos.unmake_move()
+
+
+def root_search(pos, moves, depth, stop_event, tt=None, pv=(), alpha=-INF_SCORE, beta=INF_SCORE, root_bound=None,
+                state=None):
+    """
+    Principal variation search over the given root moves for the side to move (pos is
+    restored afterwards).
+    stop_event: anything with is_set(); set when this job is no longer wanted.
+    tt (optional): transposition table to use.
+    pv (optional): previous principal variation starting with a root move; it is searched first.
+    alpha, beta: aspiration window. A fail high is re-searched here with beta opened up;
+    a fail low is reported as an upper bound (the caller decides whether to re-search).
+    root_bound (optional): shared value holding the best exact root score any worker has
+    found for this batch; it raises alpha and is raised by this search.
+    state (optional): the worker's SearchState (move-ordering tables), kept between jobs.
+    Returns (score, pv_line, bound) of the best move, or None if stopped.
+    """
+    # quick abort checks
+    if stop_event.is_set():
+        return None
+    if state is None:
+        state = SearchState()
+    best_score, best_line, best_bound = None, None, TT_UPPER
+    for move in moves:
+        a = alpha if best_score is None else max(alpha, best_score)
+        if root_bound is not None:
+            a = max(a, root_bound.value)
+        pos.make_move(move)
+        # after root move, it's opponent's turn
+        if tt is not None and pv and pv[0] == move:
+            seed_pv(pos, tt, pv[1:])
+        if best_score is None:
+            score = -negamax(pos, depth - 1, -beta, -a, stop_event, tt, 1, state)
+        else:
+            score = -negamax(pos, depth - 1, -a - 1, -a, stop_event, tt, 1, state)
+            if a < score < beta:
+                score = -negamax(pos, depth - 1, -beta, -a, stop_event, tt, 1, state)
+        if score >= beta and beta < INF_SCORE:
+            # aspiration fail high: this move is better than we hoped, get its real score
+            beta = INF_SCORE
+            score = -negamax(pos, depth - 1, -beta, -a, stop_event, tt, 1, state)
+        if best_score is None or score > best_score:
+            best_score, best_line = score, [move]
+            best_bound = TT_EXACT if score > a else TT_UPPER
+            if tt is not None:
+                best_line += extract_pv(pos, tt, depth - 1)
+        pos.unmake_move()
+        # stop_event might have been set while negamax was running; ensure not reporting stale results
+        if stop_event.is_set():
+            return None
+        if root_bound is not None and best_bound == TT_EXACT and best_score > root_bound.value:
+            root_bound.value = best_score
+    return best_score, best_line, best_bound
 
 
 # worker_task (selective-stop version)
-def worker_task(from_sq, to_sq, board, maximizing_color, root_depth, return_dict, worker_stop_event, master_stop_event, castling_rights=None, en_passant_target=None):
+def worker_task(pos, move, root_depth, stop_event, tt=None, pv=()):
     """
-    Apply the root move, then run minimax for depth-1.
-    Worker listens to two events:
-      - worker_stop_event: this worker-only event (set by engine_search when user chooses a different move)
-      - master_stop_event: global (time limit / full abort)
+    Apply the root move, then search it for depth-1 with the full window (pos is restored afterwards).
+    stop_event: anything with is_set(); set when this job is no longer wanted (time limit,
+    full abort, or the user chose a different move).
+    tt (optional): the calling worker's transposition table.
+    pv (optional): previous iteration's line after this root move, searched first.
+    Returns (score, pv_line) where pv_line starts with the root move, or None if stopped.
     """
+    result = root_search(pos, [move], root_depth, stop_event, tt, [move] + list(pv))
+    return None if result is None else result[:2]
+
+
+# ---------------------------
+# Persistent worker pool
+# Worker processes are started once and take search jobs from a queue. Two parallel modes:
+#   - PARALLEL_SPLIT: one job per root move, full window each; every worker keeps its own
+#     transposition table warm across jobs and across searches.
+#   - PARALLEL_LAZY: lazy SMP; every worker searches the whole root (odd helpers one ply
+#     deeper, helpers with rotated move order) and all of them share one transposition
+#     table in shared memory. The first job to finish ends the iteration.
+# Every batch of jobs gets a job id from the pool's generation counter; bumping the counter
+# cancels all running jobs (they compare it with their own id at every node).
+# Results come back through shared memory: one _ResultSlot per job, which the worker
+# fills in and the master reads directly (no manager process, no pickling).
+# The master never polls: it blocks in connection.wait() on the workers' notification pipes,
+# their process sentinels and the user-move pipe, with the hard deadline as timeout.
+# ---------------------------
+
+PARALLEL_SPLIT = "split"
+PARALLEL_LAZY = "lazy"
+PARALLEL_MODES = (PARALLEL_SPLIT, PARALLEL_LAZY)
+
+MAX_ROOT_MOVES = 256     # more than the most legal moves any position has (218)
+MAX_PV_LENGTH = 32
+
+
+class _ResultSlot(ctypes.Structure):
+    """
+    Shared result record of one job.
+    The master sets job_id/move/stop before queuing the job; the worker writes
+    score/depth/nodes/pv and then done = job_id last, so a slot whose done matches the
+    current job id is complete.
+    """
+    _fields_ = [
+        ("job_id", ctypes.c_int64),      # batch this slot belongs to
+        ("done", ctypes.c_int64),        # job id of the finished job (written last)
+        ("stop", ctypes.c_int32),        # master -> worker: stop this job
+        ("move", ctypes.c_int32),        # root move of a split job (0 for lazy jobs)
+        ("has_score", ctypes.c_int32),   # 0 if the job was stopped before it finished
+        ("pv_length", ctypes.c_int32),
+        ("depth", ctypes.c_int32),
+        ("bound", ctypes.c_int32),       # TT_EXACT, or TT_UPPER if the job failed low
+        ("score", ctypes.c_double),
+        ("nodes", ctypes.c_int64),
+        ("cutoffs", ctypes.c_int64),
+        ("first_cutoffs", ctypes.c_int64),
+        ("tt_hits", ctypes.c_int64),         # transposition table probes of this job
+        ("tt_misses", ctypes.c_int64),
+        ("tt_collisions", ctypes.c_int64),
+        ("pv", ctypes.c_int32 * MAX_PV_LENGTH),
+    ]
+
+
+class _JobStop:
+    """stop_event for pool jobs (checked at every node, so only cheap shared-memory reads)."""
+    __slots__ = ("generation", "job_id", "slot")
+
+    def __init__(self, generation, job_id, slot):
+        self.generation = generation
+        self.job_id = job_id
+        self.slot = slot
+
+    def is_set(self):
+        return self.generation.value != self.job_id or self.slot.stop != 0
+
+
+def _pool_worker_main(worker_index, job_queue, slots, generation, root_best, worker_nodes, hash_mb, shared_tt, notify):
+    if shared_tt is not None:
+        tt = TranspositionTable(hash_mb, shared_tt)
+    else:
+        tt = TranspositionTable(hash_mb) if hash_mb else None
+    state = SearchState()
+    search_seq = None
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id, seq, index, pos, moves, depth, pv, alpha, beta, share_bound = job
+        if generation.value != job_id:
+            continue   # left over from a cancelled batch
+        if seq != search_seq:
+            state.new_search()
+            if tt is not None:
+                tt.new_search(seq)
+        search_seq = seq
+        slot = slots[index]
+        pos.nodes = 0
+        cutoffs, first_cutoffs = state.cutoffs, state.first_cutoffs
+        tt_counts = (tt.hits, tt.misses, tt.collisions) if tt is not None else (0, 0, 0)
+        try:
+            result = root_search(pos, moves, depth, _JobStop(generation, job_id, slot), tt, pv,
+                                 alpha, beta, root_best if share_bound else None, state)
+        except Exception:
+            # a bug in the search: show it, and leave the slot without a score (the master
+            # skips it like a stopped job) instead of inventing one or losing the worker
+            traceback.print_exc()
+            result = None
+        worker_nodes[worker_index] += pos.nodes
+        if generation.value != job_id or slot.job_id != job_id:
+            continue   # the batch is over and the slot may already be reused
+        slot.nodes = pos.nodes
+        slot.cutoffs = state.cutoffs - cutoffs
+        slot.first_cutoffs = state.first_cutoffs - first_cutoffs
+        if tt is not None:
+            slot.tt_hits = tt.hits - tt_counts[0]
+            slot.tt_misses = tt.misses - tt_counts[1]
+            slot.tt_collisions = tt.collisions - tt_counts[2]
+        else:
+            slot.tt_hits = slot.tt_misses = slot.tt_collisions = 0
+        if result is None:
+            slot.has_score = 0
+        else:
+            score, line, bound = result
+            line = line[:MAX_PV_LENGTH]
+            slot.score = score
+            slot.depth = depth
+            slot.bound = bound
+            slot.pv_length = len(line)
+            slot.pv[:len(line)] = line
+            slot.has_score = 1
+        # stopped jobs are still marked done so the master can count finished jobs
+        slot.done = job_id
+        notify.send(index)
+
+
+def _drain(reader):
+    """Discard pending worker notifications (they only say "look at the slots again")."""
     try:
-        # quick abort checks
-        if worker_stop_event.is_set() or master_stop_event.is_set():
+        while reader.poll():
+            reader.recv()
+    except (EOFError, OSError):
+        pass   # the worker is gone; its sentinel reports that
+
+
+def _forward_user_moves(user_move_queue, conn):
+    """Thread body: move user moves from an mp.Queue onto a pipe the monitor can wait on."""
+    while True:
+        try:
+            conn.send(user_move_queue.get())
+        except Exception:
+            return   # queue or pool closed (engine shutting down)
+
+
+def _slot_result(slot):
+    """(score, pv_line, bound) stored in a finished slot."""
+    return int(slot.score), list(slot.pv[:slot.pv_length]), slot.bound
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of long-lived search processes (max_workers, default cpu_count).
+    hash_mb is the transposition table budget of each worker (PARALLEL_SPLIT) or the size of
+    the one shared table (PARALLEL_LAZY).
+    nodes: nodes searched by the workers since the last new_search().
+    cutoffs, first_cutoffs: beta cutoffs (and those made by the first move searched) of the
+    jobs that finished since the last new_search().
+    tt_hits, tt_misses, tt_collisions: the workers' transposition table counters
+    (TranspositionTable.stats) for the same jobs; see tt_stats().
+    """
+
+    def __init__(self, max_workers=None, hash_mb=DEFAULT_HASH_MB, parallel=PARALLEL_SPLIT):
+        if parallel not in PARALLEL_MODES:
+            raise ValueError("unknown parallel mode: %r" % (parallel,))
+        self.size = max_workers or mp.cpu_count()
+        self.hash_mb = hash_mb
+        self.parallel = parallel
+        self.slots = mp.RawArray(_ResultSlot, max(MAX_ROOT_MOVES, self.size))
+        self.job_queue = mp.Queue()
+        self.generation = mp.RawValue("q", 0)
+        self.root_best = mp.RawValue("q", -INF_SCORE)   # best exact root score of the batch (split mode)
+        self.worker_nodes = mp.RawArray("q", self.size)
+        self.shared_tt = None
+        self._shared_tt_buffer = None
+        if parallel == PARALLEL_LAZY and hash_mb:
+            self._shared_tt_buffer = mp.RawArray(ctypes.c_ubyte, TranspositionTable.buffer_size(hash_mb))
+            self.shared_tt = TranspositionTable(hash_mb, self._shared_tt_buffer)
+        self.search_seq = 0
+        self.nodes = 0
+        self._nodes_base = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.tt_hits = self.tt_misses = self.tt_collisions = 0
+        self.processes = [None] * self.size     # [(process, notification reader)]
+        self.user_move_reader, self._user_move_writer = mp.Pipe(duplex=False)
+        self._watched_queues = []
+        self._ensure_workers()
+
+    def _ensure_workers(self):
+        """Start (or restart, if one died) the worker processes."""
+        for index, worker in enumerate(self.processes):
+            if worker is not None:
+                if worker[0].is_alive():
+                    continue
+                worker[1].close()
+            reader, writer = mp.Pipe(duplex=False)
+            p = mp.Process(target=_pool_worker_main,
+                           args=(index, self.job_queue, self.slots, self.generation, self.root_best, self.worker_nodes,
+                                 self.hash_mb, self._shared_tt_buffer, writer),
+                           daemon=True)
+            p.start()
+            writer.close()       # the worker holds the only write end now
+            self.processes[index] = (p, reader)
+
+    def _watch_user_moves(self, user_move_queue):
+        """Forward user_move_queue onto self.user_move_reader (one thread per queue, started once)."""
+        if any(q is user_move_queue for q in self._watched_queues):
             return
-        nb, new_rights, new_en_passant = simulate_move(board, from_sq, to_sq, castling_rights, en_passant_target)
-        # after root move, it's opponent's turn
-        opp = "black" if maximizing_color == "white" else "white"
-        score = minimax(nb, maximizing_color, opp, root_depth - 1, -math.inf, math.inf,
-                        stop_event=master_stop_event, castling_rights=new_rights, en_passant_target=new_en_passant)
-        # worker_stop_event might have been set while minimax was running; ensure not storing stale results
-        if not worker_stop_event.is_set() and not master_stop_event.is_set():
-            return_dict[f"{from_sq}{to_sq}"] = score
-    except Exception:
-        # don't crash the worker silently; store a low score to mark failure
-        return_dict[f"{from_sq}{to_sq}"] = -9999999
+        self._watched_queues.append(user_move_queue)
+        threading.Thread(target=_forward_user_moves, args=(user_move_queue, self._user_move_writer),
+                         daemon=True).start()
+
+    def new_search(self):
+        """Called once per engine_search so workers age their transposition tables."""
+        self.search_seq += 1
+        self.nodes = 0
+        self._nodes_base = sum(self.worker_nodes)
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.tt_hits = self.tt_misses = self.tt_collisions = 0
+
+    def tt_stats(self):
+        """TranspositionTable.stats() summed over the workers, for the jobs since new_search()."""
+        probes = self.tt_hits + self.tt_misses
+        return {
+            "hits": self.tt_hits, "misses": self.tt_misses, "collisions": self.tt_collisions,
+            "hit_rate": self.tt_hits / probes if probes else 0.0,
+        }
+
+    def _post(self, pos, roots, depth, pv_lines, alpha, beta):
+        """Queue the jobs of one batch; returns (job_id, number of jobs)."""
+        self.generation.value += 1
+        job_id = self.generation.value
+        self.root_best.value = -INF_SCORE
+        if self.parallel == PARALLEL_LAZY:
+            best, rest = roots[:1], roots[1:]
+            pv = pv_lines.get(move_name(roots[0]), [])
+            jobs = []
+            for index in range(self.size):
+                shift = index % len(rest) if rest else 0
+                jobs.append((0, best + rest[shift:] + rest[:shift], depth + (index & 1), pv))
+        else:
+            jobs = [(move, [move], depth, pv_lines.get(move_name(move), [])) for move in roots]
+        for index, (move, _, _, _) in enumerate(jobs):
+            slot = self.slots[index]
+            slot.done = 0
+            slot.stop = 0
+            slot.move = move
+            slot.job_id = job_id
+        # root-split workers share their best score as a bound; lazy helpers search
+        # different depths, so their scores are not comparable
+        share_bound = self.parallel == PARALLEL_SPLIT
+        for index, (_, moves, job_depth, pv) in enumerate(jobs):
+            self.job_queue.put((job_id, self.search_seq, index, pos, moves, job_depth, pv,
+                                alpha, beta, share_bound))
+        return job_id, len(jobs)
+
+    def run_iteration(self, pos, roots, depth, pv_lines, user_move_queue, hard_deadline,
+                      alpha=-INF_SCORE, beta=INF_SCORE, stop_event=None):
+        """
+        Search the root moves to depth on the pool with the aspiration window (alpha, beta).
+        Returns (results, status, selected):
+          results: {move_key: (score, pv_line, bound)} for the jobs that finished (PARALLEL_LAZY
+                   only reports the best move of the deepest finished job); bound is TT_EXACT
+                   or TT_UPPER for moves that failed low
+          status: "done", "timeout", "stopped" (stop_event was set) or "abort"
+          selected: user move key that matched a root move (other jobs were stopped), or None
+        stop_event: optional threading/multiprocessing Event polled every STOP_POLL_INTERVAL
+        """
+        self._ensure_workers()
+        if user_move_queue is not None:
+            self._watch_user_moves(user_move_queue)
+        readers = [reader for _, reader in self.processes]
+        for reader in readers:
+            _drain(reader)   # drop notifications of earlier batches
+        slots = self.slots
+        lazy = self.parallel == PARALLEL_LAZY
+        root_keys = {move_name(move): index for index, move in enumerate(roots)}
+        job_id, job_count = self._post(pos, roots, depth, pv_lines, alpha, beta)
+
+        status = "done"
+        selected = None
+        sentinels = [p.sentinel for p, _ in self.processes]
+        waitables = readers + sentinels
+        if user_move_queue is not None:
+            waitables.append(self.user_move_reader)
+        try:
+            # block until a worker finishes a job, a worker dies, the user moves or time runs out
+            while True:
+                done = [slots[index] for index in range(job_count) if slots[index].done == job_id]
+                if len(done) >= job_count or (lazy and any(slot.has_score for slot in done)):
+                    break
+                if stop_event is not None and stop_event.is_set():
+                    status = "stopped"
+                    break
+                timeout = None
+                if hard_deadline is not None:
+                    timeout = hard_deadline - time.time()
+                    if timeout <= 0:
+                        status = "timeout"
+                        break
+                if stop_event is not None:
+                    timeout = STOP_POLL_INTERVAL if timeout is None else min(timeout, STOP_POLL_INTERVAL)
+                ready = connection.wait(waitables, timeout)
+                if not ready:
+                    if stop_event is not None and (hard_deadline is None or time.time() < hard_deadline):
+                        continue   # just a poll for the stop event
+                    status = "timeout"
+                    break
+
+                if any(sentinel in ready for sentinel in sentinels):
+                    # a worker crashed and its job is lost; give up on this batch
+                    status = "abort"
+                    break
+
+                # user interrupt: selective stop logic
+                if self.user_move_reader in ready:
+                    user_move = self.user_move_reader.recv()
+                    if user_move is not None:
+                        # normalize input (expect "E2E4" or "E7E8Q")
+                        user_move_str = user_move.strip().upper()
+                        # If this user_move matches exactly one root move, stop all others
+                        if user_move_str in root_keys:
+                            selected = user_move_str
+                            if lazy:
+                                # every helper searches the whole root: restart them on that move only
+                                job_id, job_count = self._post(pos, [roots[root_keys[user_move_str]]],
+                                                               depth, pv_lines, alpha, beta)
+                            else:
+                                # stop every job except the one matching user_move_str
+                                for index in range(job_count):
+                                    if index != root_keys[user_move_str]:
+                                        slots[index].stop = 1
+                            # continue to wait for the matching job (or timeout)
+                        else:
+                            # user move doesn't match any root – abort all jobs (safe)
+                            status = "abort"
+                            break
+
+                for reader in readers:
+                    _drain(reader)
+        finally:
+            # retire this job id: anything still running or queued stops immediately
+            self.generation.value += 1
+
+        results = {}
+        best_depth = -1
+        for index in range(job_count):
+            slot = slots[index]
+            if slot.done != job_id:
+                continue
+            self.cutoffs += slot.cutoffs
+            self.first_cutoffs += slot.first_cutoffs
+            self.tt_hits += slot.tt_hits
+            self.tt_misses += slot.tt_misses
+            self.tt_collisions += slot.tt_collisions
+            if not slot.has_score:
+                continue
+            score, line, bound = _slot_result(slot)
+            if not lazy:
+                results[move_name(slot.move)] = (score, line, bound)
+            elif slot.depth > best_depth and line:
+                best_depth = slot.depth
+                results = {move_name(line[0]): (score, line, bound)}
+        self.nodes = sum(self.worker_nodes) - self._nodes_base
+        return results, status, selected
+
+    def close(self):
+        self.generation.value += 1
+        for _ in self.processes:
+            self.job_queue.put(None)
+        for p, reader in self.processes:
+            p.join(timeout=1.0)
+            if p.is_alive():
+                p.terminate()
+            reader.close()
+        self.processes = []
+
+
+STOP_POLL_INTERVAL = 0.05     # seconds between stop_event checks while waiting on the workers
+
+
+_default_pool = None
+
+
+def get_default_pool(max_workers=None, hash_mb=DEFAULT_HASH_MB, parallel=PARALLEL_SPLIT):
+    """Process-wide pool reused by engine_search calls that don't pass their own."""
+    global _default_pool
+    size = max_workers or mp.cpu_count()
+    if _default_pool is not None and (_default_pool.size, _default_pool.hash_mb, _default_pool.parallel) != (size, hash_mb, parallel):
+        _default_pool.close()
+        _default_pool = None
+    if _default_pool is None:
+        _default_pool = WorkerPool(size, hash_mb, parallel)
+    return _default_pool
+
+
+# ---------------------------
+# Iterative deepening driver with time control
+# time_limit is a per-move budget in seconds:
+#   - no new iteration is started once SOFT_TIME_FRACTION of it has been used
+#   - a running iteration is stopped HARD_TIME_MARGIN before it runs out (but never before
+#     the soft deadline, so very short budgets still complete an iteration)
+# The best move always comes from the last completed iteration.
+# A set stop_event ends the search the same way (used by the UCI "stop" command), and
+# max_nodes ends it after the first iteration that reaches that many nodes.
+# From ASPIRATION_MIN_DEPTH on, iterations start with a window of ASPIRATION_WINDOW around the
+# previous score; fail highs are re-searched by the workers, fail lows by the driver.
+# ---------------------------
+
+SOFT_TIME_FRACTION = 0.5
+HARD_TIME_MARGIN = 0.15
+MAX_SEARCH_DEPTH = 64
+ASPIRATION_WINDOW = 50       # centipawns either side of the previous iteration's score
+ASPIRATION_MIN_DEPTH = 3
+
+
+def _best_result(results):
+    """(move_key, (score, pv_line, bound)) of the best root move; exact scores win ties with bounds."""
+    return max(results.items(), key=lambda kv: (kv[1][0], kv[1][2] == TT_EXACT))
 
 
 # engine_search (selective termination)
-def engine_search(board, color, depth, user_move_queue=None, time_limit=None, max_workers=None, castling_rights=None, en_passant_target=None):
+def engine_search(board, color, depth, user_move_queue=None, time_limit=None, max_workers=None, castling_rights=None, en_passant_target=None, hash_mb=DEFAULT_HASH_MB, pool=None, parallel=PARALLEL_SPLIT, backend=None, stop_event=None, info=None, max_nodes=None):
     """
-    Multiprocess search that supports selective termination.
+    Multiprocess iterative-deepening search that supports selective termination.
+    Root moves are searched on pool (default: a persistent process-wide WorkerPool of
+    max_workers processes running the parallel mode, PARALLEL_SPLIT or PARALLEL_LAZY).
+    depth: maximum depth (None searches until time_limit runs out).
+    time_limit (optional): per-move budget in seconds, see SOFT_TIME_FRACTION / HARD_TIME_MARGIN.
     castling_rights (optional): dict as produced by infer_castling_rights_from_board or your game controller.
     en_passant_target (optional): square like "E3" representing current en-passant target (or None).
+    hash_mb: transposition table budget in MB, per worker for PARALLEL_SPLIT, shared for
+             PARALLEL_LAZY (0 disables the table).
+    backend: board backend, BACKEND_MAILBOX or BACKEND_BITBOARD (default: BOARD_BACKEND).
+    stop_event (optional): Event that stops the search when set.
+    info (optional): info(depth, score, pv_line, nodes, seconds) after every completed iteration.
+    max_nodes (optional): no new iteration once the search has visited this many nodes.
     """
-    manager = mp.Manager()
-    return_dict = manager.dict()
-    master_stop_event = mp.Event()   # global (time limit / full abort)
+    start_time = time.time()
+    soft_deadline = hard_deadline = None
+    if time_limit is not None:
+        soft_deadline = start_time + time_limit * SOFT_TIME_FRACTION
+        # short budgets (fast time controls) still get their soft part to finish an iteration
+        hard_deadline = start_time + max(time_limit * SOFT_TIME_FRACTION, time_limit - HARD_TIME_MARGIN)
+    if depth is None:
+        depth = MAX_SEARCH_DEPTH
 
     if castling_rights is None:
         castling_rights = infer_castling_rights_from_board(board)
 
+    # convert once; workers only ever see the compact Position
+    pos = position_class(backend).from_dict(board, color, castling_rights, en_passant_target)
+
     # generate root legal moves for engine side
-    legal = generate_legal_moves(board, color, castling_rights, en_passant_target=en_passant_target)
-    roots = []
-    for fr, tos in legal.items():
-        for to in tos:
-            roots.append((fr, to))
+    roots = pos.legal_moves()
     if not roots:
         return None, None, None
 
-    if max_workers is None:
-        max_workers = mp.cpu_count()
-
-    # Start processes with their own worker_stop_event
-    processes = []               # list of Process
-    worker_events = {}           # move_key -> Event
-    proc_map = {}                # move_key -> Process
-
-    for fr, to in roots:
-        move_key = f"{fr}{to}"
-        worker_stop_event = mp.Event()
-        p = mp.Process(
-            target=worker_task,
-            args=(fr, to, board, color, depth, return_dict, worker_stop_event, master_stop_event, castling_rights, en_passant_target)
-        )
-        p.start()
-        processes.append(p)
-        worker_events[move_key] = worker_stop_event
-        proc_map[move_key] = p
-
-    start_time = time.time()
-    try:
-        # monitor processes and user interrupt queue
+    if pool is None:
+        pool = get_default_pool(max_workers, hash_mb, parallel)
+    pool.new_search()
+
+    best_key, best_score = None, None
+    pv_lines = {}                # move_key -> line from the previous iteration
+    for current_depth in range(1, depth + 1):
+        # aspiration window around the previous iteration's score
+        alpha, beta = -INF_SCORE, INF_SCORE
+        if best_score is not None and current_depth >= ASPIRATION_MIN_DEPTH and abs(best_score) < MATE_BOUND:
+            alpha, beta = best_score - ASPIRATION_WINDOW, best_score + ASPIRATION_WINDOW
         while True:
-            alive = any(p.is_alive() for p in processes)
-            if not alive:
+            results, status, selected = pool.run_iteration(pos, roots, current_depth, pv_lines,
+                                                           user_move_queue, hard_deadline, alpha, beta,
+                                                           stop_event)
+            if selected is not None:
+                # the user picked a root move: only that line matters from now on
+                roots = [move for move in roots if move_name(move) == selected]
+            if status != "done" or not results or alpha == -INF_SCORE:
                 break
+            if all(bound == TT_UPPER for _, _, bound in results.values()):
+                # every root move failed low: re-search with the window open downwards
+                alpha = -INF_SCORE
+                continue
+            break
+        if status != "done" or not results:
+            # interrupted: keep the previous iteration's move, unless we have nothing at all
+            if best_key is None and results:
+                best_key, (best_score, _, _) = _best_result(results)
+            break
 
-            # user interrupt: selective stop logic
-            if user_move_queue is not None:
-                try:
-                    user_move = user_move_queue.get_nowait()  # non-blocking
-                    if user_move is not None:
-                        # normalize input (expect "E2E4" or "E7E8Q")
-                        user_move_str = user_move.strip().upper()
-                        # If this user_move matches exactly one root worker, stop all others
-                        if user_move_str in worker_events:
-                            # stop every worker except the one matching user_move_str
-                            for key, evt in worker_events.items():
-                                if key != user_move_str:
-                                    evt.set()
-                            # continue to wait for the matching worker (or timeout)
-                        else:
-                            # user move doesn't match any root – abort all workers (safe)
-                            master_stop_event.set()
-                except Exception: pass
-
-            # time limit
-            if time_limit is not None and (time.time() - start_time) > time_limit:
-                master_stop_event.set()
-                break
+        best_key, (best_score, best_line, _) = _best_result(results)
+        pv_lines = {key: line for key, (score, line, bound) in results.items()}
+        # next iteration: best move (and its PV) first, the rest by score
+        roots.sort(key=lambda move: results.get(move_name(move), (-INF_SCORE,))[0], reverse=True)
+        if info is not None:
+            info(current_depth, best_score, best_line, pool.nodes, time.time() - start_time)
 
-            time.sleep(0.03)
-    finally:
-        # ensure processes terminate
-        for key, p in proc_map.items():
-            p.join(timeout=0.1)
-            if p.is_alive():
-                try:
-                    p.terminate()
-                except Exception:
-                    pass
-        # give small window for return_dict writes to flush
-        time.sleep(0.02)
-
-    # choose best available result
-    if len(return_dict) == 0:
-        return None, None, None
+        if soft_deadline is not None and time.time() >= soft_deadline:
+            break
+        if max_nodes is not None and pool.nodes >= max_nodes:
+            break
 
-    best_key, best_score = max(return_dict.items(), key=lambda kv: kv[1])
+    if best_key is None:
+        # nothing finished in time: any legal move beats no move
+        best_key = move_name(roots[0])
     best_from = best_key[:2]
     best_to = best_key[2:]   # allow promotion suffix (e.g. "E8Q")
     return best_from, best_to, best_score
@@ -773,11 +2042,21 @@ def engine_search(board, color, depth, user_move_queue=None, time_limit=None, ma
 # Task tuple format: ('SEARCH', board_dict, color, depth, time_limit [, castling_rights [, en_passant_target]])
 # Note: en_passant_target is optional and should be a square (e.g. "E3") or None.
 # ---------------------------
-def engine_process_main(task_queue, user_move_queue, result_queue):
+def engine_process_main(task_queue, user_move_queue, result_queue, parallel=PARALLEL_SPLIT):
     """
     Loop that waits for a SEARCH task.
+    The worker pool (parallel mode PARALLEL_SPLIT or PARALLEL_LAZY) is started once here
+    and reused by every search until QUIT.
     Note: must be started in a separate process from main (use mp.Process(target=engine_process_main, ...))
     """
+    pool = WorkerPool(parallel=parallel)
+    try:
+        _engine_loop(task_queue, user_move_queue, result_queue, pool)
+    finally:
+        pool.close()
+
+
+def _engine_loop(task_queue, user_move_queue, result_queue, pool):
     while True:
         task = task_queue.get()
         if task is None:
@@ -787,19 +2066,24 @@ def engine_process_main(task_queue, user_move_queue, result_queue):
         cmd = task[0]
         if cmd == "SEARCH":
             # Support formats:
+            # ('SEARCH', fen, depth, time_limit)
             # ('SEARCH', board, color, depth, time_limit)
             # ('SEARCH', board, color, depth, time_limit, castling_rights)
             # ('SEARCH', board, color, depth, time_limit, castling_rights, en_passant_target)
             castling_rights = None
             en_passant_target = None
-            if len(task) >= 6:
-                _, board, color, depth, time_limit, castling_rights = task[:6]
+            if isinstance(task[1], str):
+                board, color, castling_rights, en_passant_target = from_fen(task[1])[:4]
+                depth, time_limit = task[2:4]
             else:
-                _, board, color, depth, time_limit = task[:5]
-            if len(task) >= 7:
-                en_passant_target = task[6]
+                if len(task) >= 6:
+                    _, board, color, depth, time_limit, castling_rights = task[:6]
+                else:
+                    _, board, color, depth, time_limit = task[:5]
+                if len(task) >= 7:
+                    en_passant_target = task[6]
             # We pass the same user_move_queue through so engine_search can monitor it
-            from_sq, to_sq, score = engine_search(board, color, depth, user_move_queue=user_move_queue, time_limit=time_limit, castling_rights=castling_rights, en_passant_target=en_passant_target)
+            from_sq, to_sq, score = engine_search(board, color, depth, user_move_queue=user_move_queue, time_limit=time_limit, castling_rights=castling_rights, en_passant_target=en_passant_target, pool=pool)
             result_queue.put(("RESULT", from_sq, to_sq, score))
         elif cmd == "QUIT":
             break
@@ -820,11 +2104,12 @@ def engine_process_main(task_queue, user_move_queue, result_queue):
 #     user_interrupt_q = mp.Queue()
 #     result_q = mp.Queue()
 #
-#     # spawn engine process (this process will spawn worker processes per root move)
+#     # spawn engine process (this process starts a persistent pool of search workers)
 #     engine_proc = mp.Process(target=engine_process_main, args=(task_q, user_interrupt_q, result_q))
 #     engine_proc.start()
 #
-#     # send a search task. Optionally include castling rights as 6th element and en-passant as 7th:
+#     # send a search task. Optionally include castling rights as 6th element and en-passant as 7th,
+#     # or send the whole position as FEN: task_q.put(("SEARCH", fen, 4, 10.0))
 #     # task_q.put(("SEARCH", chessboard.current_board_arrangement.copy(), "black", 4, 10.0, castling_rights_dict, "E3"))
 #     task_q.put(("SEARCH", chessboard.current_board_arrangement.copy(), "black", 4, 10.0))  # depth=4, time_limit=10s
 #
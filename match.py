@@ -0,0 +1,435 @@
+# match.py
+# Engine-vs-engine match runner: plays games between two engine configurations on a process
+# pool and reports the score, the Elo difference with its error bar and an SPRT verdict.
+#
+# usage: python match.py engine:depth=3 new:depth=3 [--games 20] [--concurrency 4]
+#                        [--openings book.txt] [--pgn games.pgn] [--sprt 0,5] [--max-plies 400]
+#        python match.py engine:tc=10+0.1 native:depth=4
+#
+# A player is kind[:option=value,...]:
+#   engine   engine.py (engine_search on a WorkerPool kept for the whole match in every process)
+#   new      engine_new.py (the dict engine)
+#   native   the C++ library on an engine handle (fixed depth, cut short by time=/tc=)
+# options:   depth=N, time=seconds per move, tc=base+inc in seconds (a game clock; running out
+#            loses), for engine and native threads=N, hash=MB, and for engine
+#            backend=mailbox|bitboard, parallel=split|lazy
+#
+# Openings come from a file with one per line: a FEN / EPD, or UCI moves played from the start
+# position ("e2e4 e7e5 g1f3"); '#' starts a comment. Without a file the bench.py lines are used.
+# Every opening is played twice with colours reversed. Games end on mate, stalemate,
+# threefold repetition, the 50-move rule, insufficient material or after --max-plies (draw).
+# --sprt elo0,elo1 stops the match as soon as the test accepts either hypothesis.
+
+import argparse
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+from engine import KING, PAWN, KNIGHT, BISHOP, WHITE, BLACK, SQUARE_NAMES
+
+# ---------------------------
+# SAN (for the PGN output)
+# ---------------------------
+
+SAN_LETTERS = {engine.KNIGHT: "N", engine.BISHOP: "B", engine.ROOK: "R", engine.QUEEN: "Q", KING: "K"}
+
+
+def san(pos, move, legal=None):
+    """Standard algebraic notation of the legal move in pos ('Nbd7', 'exd6', 'e8=Q+', 'O-O')."""
+    if legal is None:
+        legal = pos.legal_moves()
+    fr, to, promo = move & 63, (move >> 6) & 63, move >> 12
+    piece = pos.board[fr]
+    ptype = piece & 7
+    capture = pos.board[to] or (ptype == PAWN and to == pos.ep)
+    if ptype == KING and abs(to - fr) == 2:
+        text = "O-O" if to > fr else "O-O-O"
+    elif ptype == PAWN:
+        text = (SQUARE_NAMES[fr][0].lower() + "x" if capture else "") + SQUARE_NAMES[to].lower()
+        if promo:
+            text += "=" + SAN_LETTERS[promo]
+    else:
+        rivals = [m & 63 for m in legal if m != move and (m >> 6) & 63 == to and pos.board[m & 63] == piece]
+        origin = ""
+        if rivals:
+            name = SQUARE_NAMES[fr].lower()
+            if all(sq & 7 != fr & 7 for sq in rivals):
+                origin = name[0]
+            elif all(sq >> 3 != fr >> 3 for sq in rivals):
+                origin = name[1]
+            else:
+                origin = name
+        text = SAN_LETTERS[ptype] + origin + ("x" if capture else "") + SQUARE_NAMES[to].lower()
+    pos.make_move(move)
+    if pos.in_check():
+        text += "+" if pos.legal_moves() else "#"
+    pos.unmake_move()
+    return text
+
+
+# ---------------------------
+# Players (one instance per spec and process, so pools and tables survive between games)
+# ---------------------------
+
+def parse_spec(spec):
+    """'engine:depth=3,tc=10+0.1' -> ('engine', {'depth': '3', 'tc': '10+0.1'})."""
+    kind, _, rest = spec.partition(":")
+    options = {}
+    for item in rest.split(","):
+        if item:
+            key, _, value = item.partition("=")
+            options[key.strip()] = value.strip()
+    if kind not in PLAYER_KINDS:
+        raise ValueError("unknown player kind %r (expected one of %s)" % (kind, ", ".join(PLAYER_KINDS)))
+    return kind, options
+
+
+class Player:
+    """
+    Options shared by the players of every kind. Each kind picks moves with
+    choose(pos, time_limit) -> move name or None; time_limit is the budget for this move
+    (None: depth only).
+    """
+
+    def __init__(self, options):
+        self.depth = int(options["depth"]) if "depth" in options else None
+        self.options = options
+
+
+class EnginePlayer(Player):
+    def __init__(self, options):
+        Player.__init__(self, options)
+        self.pool = engine.WorkerPool(int(options.get("threads", 1)),
+                                      int(options.get("hash", engine.DEFAULT_HASH_MB)),
+                                      options.get("parallel", engine.PARALLEL_SPLIT))
+        self.backend = options.get("backend")
+
+    def choose(self, pos, time_limit):
+        from_sq, to_sq, _ = engine.engine_search(pos.to_dict(), pos.color, self.depth, time_limit=time_limit,
+                                                 castling_rights=pos.castling_rights_dict(),
+                                                 en_passant_target=pos.en_passant_square(),
+                                                 pool=self.pool, backend=self.backend)
+        return from_sq + to_sq if from_sq else None
+
+
+class DictPlayer(Player):
+    def choose(self, pos, time_limit):
+        import engine_new
+        from_sq, to_sq, _ = engine_new.engine_search(pos.to_dict(), pos.color, self.depth or MAX_DICT_DEPTH,
+                                                     time_limit=time_limit, max_workers=1,
+                                                     castling_rights=pos.castling_rights_dict(),
+                                                     en_passant_target=pos.en_passant_square())
+        return from_sq + to_sq if from_sq else None
+
+
+class NativePlayer(Player):
+    def __init__(self, options):
+        import native
+        import uci
+        Player.__init__(self, options)
+        self.lib = uci.load_native()
+        if self.lib is None:
+            raise RuntimeError("no engine library with get_best_move_fen found (set CHESS_ENGINE_LIB)")
+        self.handle = native.create_handle(self.lib, int(options.get("threads", 1)),
+                                           int(options["hash"]) if "hash" in options else None)
+
+    def choose(self, pos, time_limit):
+        import native
+        name = native.best_move(self.lib, pos, self.depth or NATIVE_DEFAULT_DEPTH, self.handle, time_limit)[0]
+        if name is None and self.handle is not None:
+            # the time limit cut the fixed-depth search before any root move finished
+            name = engine.move_name(pos.legal_moves()[0])
+        return name
+
+
+PLAYER_KINDS = {"engine": EnginePlayer, "new": DictPlayer, "native": NativePlayer}
+MAX_DICT_DEPTH = 64          # engine_new needs a depth; a time limit ends it earlier
+NATIVE_DEFAULT_DEPTH = 4
+
+_players = {}
+
+
+def get_player(spec):
+    if spec not in _players:
+        kind, options = parse_spec(spec)
+        _players[spec] = PLAYER_KINDS[kind](options)
+    return _players[spec]
+
+
+def parse_tc(text):
+    """'10+0.1' -> (10.0, 0.1) seconds."""
+    base, _, increment = text.partition("+")
+    return float(base), float(increment or 0)
+
+
+# ---------------------------
+# One game
+# ---------------------------
+
+def insufficient_material(pos):
+    """Bare kings, or a single knight or bishop against a bare king."""
+    pieces = [piece & 7 for piece in pos.board if piece and piece & 7 != KING]
+    return not pieces or (len(pieces) == 1 and pieces[0] in (KNIGHT, BISHOP))
+
+
+def play_game(fen, white_spec, black_spec, max_plies):
+    """
+    Play one game from fen. Returns (result, termination, san_moves) with result "1-0",
+    "0-1" or "1/2-1/2" from white's view. Runs in the pool workers.
+    """
+    board, color, rights, ep, halfmove, _ = engine.from_fen(fen)
+    pos = engine.Position.from_dict(board, color, rights, ep)
+    specs = {WHITE: white_spec, BLACK: black_spec}
+    clocks = {}
+    for side, spec in specs.items():
+        options = parse_spec(spec)[1]
+        if "tc" in options:
+            clocks[side] = parse_tc(options["tc"])[0]
+    seen = {pos.key: 1}
+    moves = []
+    for _ in range(max_plies):
+        legal = pos.legal_moves()
+        if not legal:
+            if not pos.in_check():
+                return "1/2-1/2", "stalemate", moves
+            return ("0-1" if pos.side == WHITE else "1-0"), "checkmate", moves
+        if halfmove >= 100:
+            return "1/2-1/2", "50-move rule", moves
+        if insufficient_material(pos):
+            return "1/2-1/2", "insufficient material", moves
+        side = pos.side
+        spec = specs[side]
+        options = parse_spec(spec)[1]
+        time_limit = float(options["time"]) if "time" in options else None
+        if side in clocks:
+            import uci
+            base, increment = parse_tc(options["tc"])
+            other = clocks.get(side ^ BLACK, clocks[side])
+            params = {"wtime": 1000 * (clocks[side] if side == WHITE else other),
+                      "btime": 1000 * (clocks[side] if side == BLACK else other),
+                      "winc": 1000 * increment, "binc": 1000 * increment}
+            time_limit = uci.time_budget(params, side == WHITE)
+        start = time.time()
+        name = get_player(spec).choose(pos, time_limit)
+        if side in clocks:
+            clocks[side] -= time.time() - start
+            if clocks[side] < 0:
+                return ("0-1" if side == WHITE else "1-0"), "time forfeit", moves
+            clocks[side] += parse_tc(options["tc"])[1]
+        by_name = {engine.move_name(move): move for move in legal}
+        move = by_name.get(name) if name else None
+        if move is None and name:
+            move = by_name.get(name + "Q")   # generators that promote implicitly
+        if move is None:
+            return ("0-1" if side == WHITE else "1-0"), "illegal move %s" % name, moves
+        moves.append(san(pos, move, legal))
+        fr, to = move & 63, (move >> 6) & 63
+        halfmove = 0 if pos.board[fr] & 7 == PAWN or pos.board[to] else halfmove + 1
+        pos.make_move(move)
+        seen[pos.key] = seen.get(pos.key, 0) + 1
+        if seen[pos.key] >= 3:
+            return "1/2-1/2", "threefold repetition", moves
+    return "1/2-1/2", "adjudicated after %d plies" % max_plies, moves
+
+
+def _play_job(job):
+    index, fen, white_spec, black_spec, max_plies = job
+    result, termination, moves = play_game(fen, white_spec, black_spec, max_plies)
+    return index, result, termination, moves
+
+
+# ---------------------------
+# Openings and PGN
+# ---------------------------
+
+def load_openings(path):
+    """FENs of the openings in path (see the header), or of the bench.py lines without one."""
+    if path is None:
+        import bench
+        return [pos.to_fen() for pos in bench.bench_positions().values()]
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if "/" in line:
+                fields = line.split(";", 1)[0].split()
+                if len(fields) < 6 or not fields[4].isdigit():
+                    fields = fields[:4]     # EPD: no move clocks, maybe opcodes
+                engine.from_fen(" ".join(fields))     # raises ValueError on a bad line
+                openings.append(" ".join(fields))
+                continue
+            pos = engine.Position.from_fen(engine.START_FEN)
+            plies = line.split()
+            for text in plies:
+                legal = {engine.move_name(move): move for move in pos.legal_moves()}
+                if text.upper() not in legal:
+                    raise ValueError("illegal opening move %s in %r" % (text, line))
+                pos.make_move(legal[text.upper()])
+            openings.append(pos.to_fen(0, 1 + len(plies) // 2))
+    return openings
+
+
+def pgn_game(fen, white, black, result, termination, moves, round_number):
+    """One game as PGN text."""
+    headers = [("Event", "match.py"), ("Site", "?"), ("Date", time.strftime("%Y.%m.%d")),
+               ("Round", str(round_number)), ("White", white), ("Black", black), ("Result", result)]
+    if fen != engine.START_FEN:
+        headers += [("SetUp", "1"), ("FEN", fen)]
+    headers += [("PlyCount", str(len(moves))), ("Termination", termination)]
+    fields = fen.split()
+    number = int(fields[5]) if len(fields) > 5 else 1
+    black_first = len(fields) > 1 and fields[1] == "b"
+    tokens = []
+    for index, text in enumerate(moves):
+        white_move = (index % 2 == 0) != black_first
+        if white_move:
+            tokens.append("%d." % number)
+        elif index == 0:
+            tokens.append("%d..." % number)
+        tokens.append(text)
+        if not white_move:
+            number += 1
+    tokens.append(result)
+    lines, line = [], ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    lines.append(line)
+    return "".join('[%s "%s"]\n' % pair for pair in headers) + "\n" + "\n".join(lines) + "\n\n"
+
+
+# ---------------------------
+# Statistics
+# ---------------------------
+
+def score_from_elo(elo):
+    return 1.0 / (1.0 + 10 ** (-elo / 400.0))
+
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return 400.0 * math.log10(score / (1.0 - score))
+
+
+def _score_and_variance(wins, draws, losses):
+    games = wins + draws + losses
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return score, variance
+
+
+def elo_interval(wins, draws, losses, z=1.96):
+    """(elo, low, high): the Elo difference and its 95% confidence interval (z sigmas)."""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0, 0.0
+    score, variance = _score_and_variance(wins, draws, losses)
+    margin = z * math.sqrt(variance / games)
+    return elo_from_score(score), elo_from_score(score - margin), elo_from_score(score + margin)
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 (elo1) against H0 (elo0), normal approximation of the score."""
+    games = wins + draws + losses
+    if not games:
+        return 0.0
+    score, variance = _score_and_variance(wins, draws, losses)
+    if variance == 0:
+        return 0.0
+    s0, s1 = score_from_elo(elo0), score_from_elo(elo1)
+    return games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def sprt_status(wins, draws, losses, elo0, elo1, alpha=0.05, beta=0.05):
+    """(llr, lower, upper, verdict) with verdict "H0 accepted", "H1 accepted" or "continue"."""
+    llr = sprt_llr(wins, draws, losses, elo0, elo1)
+    lower, upper = sprt_bounds(alpha, beta)
+    verdict = "H1 accepted" if llr >= upper else "H0 accepted" if llr <= lower else "continue"
+    return llr, lower, upper, verdict
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine-vs-engine match on a process pool")
+    parser.add_argument("first", help="player spec, e.g. engine:depth=3")
+    parser.add_argument("second", help="player spec, e.g. new:depth=3")
+    parser.add_argument("--games", type=int, default=20, help="games to play (pairs of reversed colours)")
+    parser.add_argument("--concurrency", type=int, default=1, help="games played at the same time")
+    parser.add_argument("--openings", help="file of FEN/EPD lines or UCI move lines")
+    parser.add_argument("--pgn", help="append the games to this PGN file")
+    parser.add_argument("--max-plies", type=int, default=400, help="adjudicate longer games as draws")
+    parser.add_argument("--sprt", help="elo0,elo1: stop when the SPRT accepts a hypothesis")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for spec in (args.first, args.second):
+        parse_spec(spec)     # fail before starting any process
+    sprt = tuple(float(x) for x in args.sprt.split(",")) if args.sprt else None
+    openings = load_openings(args.openings)
+    jobs = []
+    for index in range(args.games):
+        fen = openings[(index // 2) % len(openings)]
+        first_white = index % 2 == 0
+        white, black = (args.first, args.second) if first_white else (args.second, args.first)
+        jobs.append((index, fen, white, black, args.max_plies))
+
+    wins = draws = losses = 0
+    pgn = open(args.pgn, "a") if args.pgn else None
+    executor = ProcessPoolExecutor(args.concurrency)
+    try:
+        futures = [executor.submit(_play_job, job) for job in jobs]
+        for finished, future in enumerate(as_completed(futures), 1):
+            index, result, termination, moves = future.result()
+            _, fen, white, black, _ = jobs[index]
+            first_score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+            if white != args.first:
+                first_score = 1.0 - first_score
+            if first_score == 1.0:
+                wins += 1
+            elif first_score == 0.0:
+                losses += 1
+            else:
+                draws += 1
+            print(f"game {index + 1:>3} ({finished}/{len(jobs)}): {white} - {black} {result} ({termination}, "
+                  f"{len(moves)} plies)  score +{wins} ={draws} -{losses}", flush=True)
+            if pgn is not None:
+                pgn.write(pgn_game(fen, white, black, result, termination, moves, index + 1))
+                pgn.flush()
+            if sprt is not None and sprt_status(wins, draws, losses, sprt[0], sprt[1],
+                                                args.alpha, args.beta)[3] != "continue":
+                for pending in futures:
+                    pending.cancel()
+                break
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if pgn is not None:
+            pgn.close()
+
+    games = wins + draws + losses
+    if not games:
+        return
+    elo, low, high = elo_interval(wins, draws, losses)
+    print(f"Score of {args.first} vs {args.second}: +{wins} ={draws} -{losses} "
+          f"[{(wins + 0.5 * draws) / games:.3f}] {games} games")
+    print(f"Elo difference: {elo:.1f} +/- {(high - low) / 2:.1f} (95%: {low:.1f} .. {high:.1f})")
+    if sprt is not None:
+        llr, lower, upper, verdict = sprt_status(wins, draws, losses, sprt[0], sprt[1], args.alpha, args.beta)
+        print(f"SPRT elo0={sprt[0]:g} elo1={sprt[1]:g}: llr {llr:.2f} ({lower:.2f}, {upper:.2f}) {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# native.py
+# ctypes bridge to the C++ engine libraries (engine.cpp, Replit_ChessEngine.cpp).
+#
+# The libraries are built with the Makefile (libengine.so / libreplit_engine.so, or .dll on Windows)
+# and found by load_library: first the path in the flavour's environment variable, then next to
+# this package, then the working directory. When none loads, callers play with the Python
+# engine (engine.engine_search) instead.
+#
+# Positions go to the library as a binary board instead of JSON or FEN: Position.board is
+# already the 64-byte piece-code buffer the C++ side reads (same codes as the Piece enum in
+# Replit_ChessEngine.cpp), so it is passed without copying, and castling rights, side to move
+# and en passant travel packed into one int (see pack_flags).
+
+import ctypes
+import math
+import os
+import sys
+
+import engine
+from engine import BLACK, NO_SQUARE
+
+# ---------------------------
+# Binary position
+# ---------------------------
+
+FLAG_BLACK_TO_MOVE = 0x10
+FLAG_EP_SHIFT = 8            # en passant square + 1 in bits 8..14, 0 for none
+MOVE_BUFFER = 8
+MATE_CP = 30000              # the C++ search reports mates as +-infinity
+
+
+def pack_flags(pos):
+    """Castling bits (WK=1 WQ=2 BK=4 BQ=8, as Position.castling), side to move and en passant in one int."""
+    flags = pos.castling
+    if pos.side == BLACK:
+        flags |= FLAG_BLACK_TO_MOVE
+    if pos.ep != NO_SQUARE:
+        flags |= (pos.ep + 1) << FLAG_EP_SHIFT
+    return flags
+
+
+def board_buffer(pos):
+    """A ctypes view of pos.board (no copy; valid while pos.board is)."""
+    return (ctypes.c_ubyte * 64).from_buffer(pos.board)
+
+
+# ---------------------------
+# Finding the library
+# ---------------------------
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# flavour: (environment variable, library name). The file is libNAME.so (libNAME.dylib on macOS)
+# or NAME.dll on Windows; never a bare engine.so, which Python would import instead of engine.py.
+LIBRARIES = {
+    "engine": ("CHESS_ENGINE_LIB", "engine"),
+    "replit": ("CHESS_REPLIT_ENGINE_LIB", "replit_engine"),
+}
+
+_loaded = {}
+
+
+def library_file(name):
+    if sys.platform == "win32":
+        return name + ".dll"
+    return "lib" + name + (".dylib" if sys.platform == "darwin" else ".so")
+
+
+def library_candidates(flavour="engine"):
+    """Paths tried for flavour, in order."""
+    env_var, name = LIBRARIES[flavour]
+    paths = [os.environ[env_var]] if os.environ.get(env_var) else []
+    paths += [os.path.join(directory, library_file(name)) for directory in (PACKAGE_DIR, os.getcwd())]
+    if flavour == "replit" and os.environ.get("LOCALAPPDATA"):
+        # where the Windows build of the Replit engine used to be installed by hand
+        paths.append(os.path.join(os.environ["LOCALAPPDATA"], "Python", "Chess", "engine.dll"))
+    return list(dict.fromkeys(paths))
+
+
+def load_library(flavour="engine", required=()):
+    """
+    The first library for flavour that loads and exports every name in required, or None.
+    Loaded once per process; the engine.cpp flavour comes back with its signatures set up.
+    """
+    key = (flavour, tuple(required))
+    if key not in _loaded:
+        lib = None
+        for path in library_candidates(flavour):
+            if not os.path.exists(path):
+                continue
+            try:
+                candidate = ctypes.CDLL(path)
+            except OSError:        # wrong platform or architecture
+                continue
+            if all(hasattr(candidate, name) for name in required):
+                lib = candidate
+                break
+        if lib is not None and flavour == "engine":
+            setup(lib)
+        _loaded[key] = lib
+    return _loaded[key]
+
+
+def create_handle(lib, threads=0, hash_mb=None):
+    """
+    A persistent engine handle on lib (search threads started once; threads 0: one per core),
+    with its transposition table sized to hash_mb when given, or None if lib has no engine_create.
+    """
+    if not hasattr(lib, "engine_create"):
+        return None
+    handle = lib.engine_create(threads)
+    if hash_mb is not None and hasattr(lib, "engine_set_hash"):
+        lib.engine_set_hash(handle, hash_mb)
+    return handle
+
+
+def open_engine(threads=0, hash_mb=None):
+    """(library, handle) for best_move: the engine.cpp library and a handle on it, or (None, None)."""
+    lib = load_library("engine", ("get_best_move_fen",))
+    if lib is None:
+        return None, None
+    return lib, create_handle(lib, threads, hash_mb)
+
+
+# ---------------------------
+# Library calls
+# ---------------------------
+
+def setup(lib):
+    """Declare the argument types of the engine.cpp entry points lib exports; returns lib."""
+    out = [ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_double)]
+    board = [ctypes.POINTER(ctypes.c_ubyte), ctypes.c_int]
+    signatures = {
+        "get_best_move": [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int] + out,
+        "perft_count": [ctypes.c_char_p] * 4 + [ctypes.c_int],
+        "get_best_move_fen": [ctypes.c_char_p, ctypes.c_int] + out,
+        "get_best_move_board": board + [ctypes.c_int] + out,
+        "engine_create": [ctypes.c_int],
+        "engine_destroy": [ctypes.c_void_p],
+        "engine_stop": [ctypes.c_void_p],
+        "engine_set_hash": [ctypes.c_void_p, ctypes.c_int],
+        "engine_new_game": [ctypes.c_void_p],
+        "engine_best_move_fen": [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_double] + out,
+        "engine_best_move_board": [ctypes.c_void_p] + board + [ctypes.c_int, ctypes.c_double] + out,
+    }
+    for name, argtypes in signatures.items():
+        if hasattr(lib, name):
+            function = getattr(lib, name)
+            function.argtypes = argtypes
+            function.restype = {"engine_create": ctypes.c_void_p, "perft_count": ctypes.c_longlong}.get(name)
+    return lib
+
+
+def best_move(lib, pos, depth, handle=None, time_limit=None):
+    """
+    (move name, score) for pos from the C++ engine; the move is None when it has nothing to
+    play (or was stopped before any root move finished). time_limit needs a handle.
+    Uses the binary entry points when the library has them, else FEN.
+    """
+    out_from = ctypes.create_string_buffer(MOVE_BUFFER)
+    out_to = ctypes.create_string_buffer(MOVE_BUFFER)
+    score = ctypes.c_double(0.0)
+    limit = -1.0 if time_limit is None else time_limit
+    if handle is not None and hasattr(lib, "engine_best_move_board"):
+        lib.engine_best_move_board(handle, board_buffer(pos), pack_flags(pos), depth, limit,
+                                   out_from, out_to, ctypes.byref(score))
+    elif handle is not None:
+        lib.engine_best_move_fen(handle, pos.to_fen().encode(), depth, limit, out_from, out_to, ctypes.byref(score))
+    elif hasattr(lib, "get_best_move_board"):
+        lib.get_best_move_board(board_buffer(pos), pack_flags(pos), depth, out_from, out_to, ctypes.byref(score))
+    else:
+        lib.get_best_move_fen(pos.to_fen().encode(), depth, out_from, out_to, ctypes.byref(score))
+    if not out_from.value:
+        return None, 0
+    cp = 0 if math.isnan(score.value) else max(-MATE_CP, min(MATE_CP, score.value))
+    return (out_from.value + out_to.value).decode().upper(), int(cp)
+
+
+def position_from_dict(board, color):
+    """The Position for a square dict from the game front-ends (castling rights inferred from the board)."""
+    return engine.Position.from_dict(board, color, engine.infer_castling_rights_from_board(board))
@@ -0,0 +1,108 @@
+# parity.py
+# Checks that the array-board search of engine.cpp plays exactly like the string-map search it
+# replaced: same best move and same score on every position of a corpus, at a fixed depth.
+# The string-map search is still exported as get_best_move_fen_legacy for this.
+# Also compares the native perft counts with the Python move generator (engine.Position).
+#
+# usage: python parity.py [--depth 3] [--perft-depth 3] [--positions start,kiwipete]
+#
+# Exits with status 1 on any difference. Both searches run on threads started per call, so the
+# times include that; they are there to show the gap, bench.py is the benchmark.
+
+import argparse
+import ctypes
+import math
+import sys
+import time
+
+import engine
+import native
+from bench import bench_positions
+from perft import POSITIONS, native_perft, perft
+
+# ---------------------------
+# Corpus: the perft and benchmark positions plus mates, stalemate, en passant, promotion
+# and castling corner cases
+# ---------------------------
+
+EXTRA_POSITIONS = {
+    "mate white": "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1",
+    "mate black": "r5k1/8/8/8/8/8/5PPP/6K1 b - - 0 1",
+    "mated": "R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1",
+    "stalemate": "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+    "en passant": "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "promotion": "8/P7/8/8/8/8/6k1/4K3 w - - 0 1",
+    "underpromotion": "8/8/8/8/8/8/p3k3/2K5 b - - 0 1",
+    "castle through check": "r3k2r/8/8/8/2b5/8/8/R3K2R w KQkq - 0 1",
+}
+
+
+def corpus():
+    """{name: FEN}"""
+    positions = {name: fen for name, (fen, _) in POSITIONS.items()}
+    positions.update({"bench " + name: pos.to_fen() for name, pos in bench_positions().items()})
+    positions.update(EXTRA_POSITIONS)
+    return positions
+
+
+# ---------------------------
+# Comparison
+# ---------------------------
+
+def search(function, fen, depth):
+    """(move name, score, seconds) from one of the FEN entry points."""
+    out_from = ctypes.create_string_buffer(native.MOVE_BUFFER)
+    out_to = ctypes.create_string_buffer(native.MOVE_BUFFER)
+    score = ctypes.c_double(0.0)
+    start = time.time()
+    function(fen.encode(), depth, out_from, out_to, ctypes.byref(score))
+    return (out_from.value + out_to.value).decode(), score.value, time.time() - start
+
+
+def same_score(a, b):
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Array-board vs string-map search parity for engine.cpp")
+    parser.add_argument("--depth", type=int, default=3, help="search depth")
+    parser.add_argument("--perft-depth", type=int, default=3, help="perft depth (0 skips perft)")
+    parser.add_argument("--positions", help="comma separated names (default: the whole corpus)")
+    args = parser.parse_args()
+
+    lib = native.load_library("engine", ("get_best_move_fen", "get_best_move_fen_legacy", "perft_count"))
+    if lib is None:
+        sys.exit("no engine library with get_best_move_fen_legacy found (run make)")
+    lib.get_best_move_fen_legacy.argtypes = lib.get_best_move_fen.argtypes
+    lib.get_best_move_fen_legacy.restype = None
+
+    positions = corpus()
+    names = args.positions.split(",") if args.positions else list(positions)
+    failures = 0
+    legacy_time = array_time = 0.0
+    print(f"{len(names)} positions, depth {args.depth}")
+    for name in names:
+        fen = positions[name]
+        legacy_move, legacy_score, legacy_seconds = search(lib.get_best_move_fen_legacy, fen, args.depth)
+        array_move, array_score, array_seconds = search(lib.get_best_move_fen, fen, args.depth)
+        legacy_time += legacy_seconds
+        array_time += array_seconds
+        problems = []
+        if array_move != legacy_move or not same_score(array_score, legacy_score):
+            problems.append(f"search: {array_move} {array_score} vs {legacy_move} {legacy_score}")
+        if args.perft_depth:
+            expected = perft(engine.Position.from_fen(fen), args.perft_depth)
+            nodes = native_perft(lib, fen, args.perft_depth)
+            if nodes != expected:
+                problems.append(f"perft {args.perft_depth}: {nodes} vs {expected}")
+        failures += bool(problems)
+        status = "OK" if not problems else "; ".join(problems)
+        print(f"{name:<22} {array_move or '-':<6} {array_score:>9} {legacy_seconds:>8.3f}s {array_seconds:>8.3f}s  {status}")
+    speedup = legacy_time / array_time if array_time else 0.0
+    print(f"string map {legacy_time:.2f}s, array {array_time:.2f}s ({speedup:.1f}x); "
+          f"{failures} of {len(names)} positions differ")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# perft.py
+# Perft / divide for every move generator in the repo: counts the leaf nodes of the legal
+# move tree to a fixed depth, compares them with the published counts and reports nodes/s.
+#
+# usage: python perft.py [--depth 3] [--positions start,kiwipete] [--backends mailbox,bitboard]
+#                        [--divide] [--processes 4]
+#
+# Backends:
+#   mailbox   engine.Position
+#   bitboard  bitboard.BitboardPosition
+#   dict      the original dict generator (engine_new.py)
+#   chess     chess.chessboard.generate_legal_moves (needs pygame; no castling, en passant
+#             or promotion handling, so its counts are expected to differ)
+#   native    perft_count from the C++ library (engine.cpp), when it can be loaded
+# --processes splits the root moves over a process pool (all backends except native).
+# --divide prints the count below every root move, the usual way to find a generator bug.
+
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+import native
+
+# ---------------------------
+# Positions: FEN and the published leaf counts for depth 1, 2, 3...
+# ---------------------------
+
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+              (20, 400, 8902, 197281, 4865609, 119060324)),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 (48, 2039, 97862, 4085603, 193690690)),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                (14, 191, 2812, 43238, 674624, 11030083)),
+    "promotions": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                   (6, 264, 9467, 422333, 15833292)),
+    "talkchess": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  (44, 1486, 62379, 2103487, 89941194)),
+    "middlegame": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                   (46, 2079, 89890, 3894594, 164075551)),
+}
+
+def _other(color):
+    return "black" if color == "white" else "white"
+
+
+# ---------------------------
+# Counting, per backend
+# ---------------------------
+
+def perft(pos, depth):
+    """Leaf nodes of the legal move tree below pos (any Position backend)."""
+    if depth == 0:
+        return 1
+    moves = pos.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        pos.make_move(move)
+        nodes += perft(pos, depth - 1)
+        pos.unmake_move()
+    return nodes
+
+
+def perft_dict(board, color, castling_rights, en_passant_target, depth):
+    """The same count with the original dict move generator (engine_new.py)."""
+    import engine_new
+    if depth == 0:
+        return 1
+    legal = engine_new.generate_legal_moves(board, color, castling_rights, en_passant_target)
+    if depth == 1:
+        return sum(len(targets) for targets in legal.values())
+    nodes = 0
+    for fr, targets in legal.items():
+        for to in targets:
+            child, rights, ep = engine_new.simulate_move(board, fr, to, castling_rights, en_passant_target)
+            nodes += perft_dict(child, _other(color), rights, ep, depth - 1)
+    return nodes
+
+
+def _chess_legal(board, color):
+    """chess.py's generator works on the class-level board and returns both colours' moves."""
+    import chess
+    generator = chess.chessboard
+    generator.current_board_arrangement = board
+    return generator, {fr: targets for fr, targets in generator.generate_legal_moves().items()
+                       if board[fr].startswith(color) and targets}
+
+
+def perft_chess(board, color, depth):
+    if depth == 0:
+        return 1
+    generator, legal = _chess_legal(board, color)
+    if depth == 1:
+        return sum(len(targets) for targets in legal.values())
+    nodes = 0
+    for fr, targets in legal.items():
+        for to in targets:
+            generator.current_board_arrangement = board
+            nodes += perft_chess(generator.simulate_move(fr, to), _other(color), depth - 1)
+    return nodes
+
+
+def root_moves(backend, fen):
+    """Names ('E2E4', 'E7E8Q') of the legal root moves as backend generates them."""
+    board, color, rights, ep = engine.from_fen(fen)[:4]
+    if backend == "dict":
+        import engine_new
+        legal = engine_new.generate_legal_moves(board, color, rights, ep)
+    elif backend == "chess":
+        legal = _chess_legal(board, color)[1]
+    else:
+        pos = engine.position_class(backend).from_dict(board, color, rights, ep)
+        return [engine.move_name(move) for move in pos.legal_moves()]
+    return [fr + to for fr, targets in legal.items() for to in targets]
+
+
+def count_move(backend, fen, name, depth):
+    """Leaf nodes depth plies below root move name (one divide job; runs in pool workers too)."""
+    board, color, rights, ep = engine.from_fen(fen)[:4]
+    fr, to = name[:2], name[2:]
+    if backend == "dict":
+        import engine_new
+        child, rights, ep = engine_new.simulate_move(board, fr, to, rights, ep)
+        return perft_dict(child, _other(color), rights, ep, depth)
+    if backend == "chess":
+        generator = _chess_legal(board, color)[0]
+        return perft_chess(generator.simulate_move(fr, to), _other(color), depth)
+    pos = engine.position_class(backend).from_dict(board, color, rights, ep)
+    pos.make_move(engine.move_from_strings(fr, to))
+    return perft(pos, depth)
+
+
+def divide(backend, fen, depth, executor=None):
+    """{root move name: leaf nodes below it} to depth (depth >= 1), optionally on a process pool."""
+    names = root_moves(backend, fen)
+    if executor is None:
+        counts = [count_move(backend, fen, name, depth - 1) for name in names]
+    else:
+        counts = list(executor.map(count_move, [backend] * len(names), [fen] * len(names),
+                                   names, [depth - 1] * len(names)))
+    return dict(zip(names, counts))
+
+
+# ---------------------------
+# Native library
+# ---------------------------
+
+def load_native():
+    """The C++ engine library with perft_count, or None (see native.load_library)."""
+    return native.load_library("engine", ("perft_count",))
+
+
+def native_perft(lib, fen, depth):
+    board, color, _, ep = engine.from_fen(fen)[:4]
+    castling = fen.split()[2]
+    return lib.perft_count(json.dumps(board).encode(), color.encode(), castling.encode(),
+                           (ep or "").encode(), depth)
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+BACKENDS = ("mailbox", "bitboard", "dict", "chess", "native")
+
+
+def available(backend):
+    """None if backend can run here, else the reason it cannot."""
+    if backend == "chess":
+        try:
+            import chess   # noqa: F401  (pulls in pygame)
+        except ImportError as exc:
+            return str(exc)
+    elif backend == "native" and load_native() is None:
+        return "no engine library with perft_count found"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft / divide over the move generators")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--positions", default=",".join(POSITIONS), help="comma separated names from POSITIONS")
+    parser.add_argument("--backends", default="mailbox,bitboard", help="comma separated, from " + ",".join(BACKENDS))
+    parser.add_argument("--divide", action="store_true", help="print the count below every root move")
+    parser.add_argument("--processes", type=int, default=1, help="split root moves over this many processes")
+    args = parser.parse_args()
+
+    executor = ProcessPoolExecutor(args.processes) if args.processes > 1 else None
+    try:
+        for backend in args.backends.split(","):
+            reason = available(backend)
+            if reason:
+                print(f"{backend}: skipped ({reason})")
+                continue
+            for name in args.positions.split(","):
+                fen, known = POSITIONS[name]
+                start = time.time()
+                if backend == "native":
+                    split = None
+                    nodes = native_perft(load_native(), fen, args.depth)
+                else:
+                    split = divide(backend, fen, args.depth, executor)
+                    nodes = sum(split.values())
+                seconds = time.time() - start
+                expected = known[args.depth - 1] if args.depth <= len(known) else None
+                status = "?" if expected is None else ("OK" if nodes == expected else f"MISMATCH (expected {expected})")
+                nps = int(nodes / seconds) if seconds else 0
+                print(f"{backend:<9} {name:<11} depth {args.depth}: {nodes:>10} {status:<8} {seconds:>8.2f}s {nps:>9} nps")
+                if args.divide and split:
+                    for move in sorted(split):
+                        print(f"    {move}: {split[move]}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
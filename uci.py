@@ -0,0 +1,406 @@
+# uci.py
+# UCI front-end: speaks the Universal Chess Interface on stdin/stdout so the engine can be
+# driven by GUIs and tournament managers (cutechess-cli, Arena, ...).
+#
+# usage: python uci.py [--threads 4] [--hash 16] [--parallel split|lazy] [--backend mailbox|bitboard]
+#        python uci.py --native [--native-depth 4]
+#
+# The Python engine keeps one WorkerPool for the whole session; every "go" runs engine_search
+# on a background thread against it, so "stop", "ponderhit" and "isready" are answered while
+# the search runs. --native searches with the C++ library (engine.cpp) instead, on one engine
+# handle for the session (engine_create). Its search is fixed-depth, so "go" searches to the
+# given depth or --native-depth; the time budget and "stop" cut that search short. The handle's
+# transposition table is sized by Hash and cleared by ucinewgame.
+#
+# Supported: uci, debug, isready, setoption (Hash, Threads, Ponder), ucinewgame,
+# position [startpos | fen <fen>] [moves ...], go [depth N] [movetime ms] [wtime ms] [btime ms]
+# [winc ms] [binc ms] [movestogo N] [nodes N] [infinite] [ponder], stop, ponderhit, quit.
+
+import argparse
+import sys
+import threading
+import time
+
+import engine
+import native
+
+ENGINE_NAME = "engine.py"
+ENGINE_AUTHOR = "the chess engine authors"
+
+# ---------------------------
+# Time management
+# ---------------------------
+
+DEFAULT_MOVES_TO_GO = 30     # moves still to play when the GUI does not send movestogo
+INCREMENT_SHARE = 0.8        # part of the increment spent on this move
+MAX_TIME_SHARE = 0.5         # never plan to use more than this part of the clock on one move
+MOVE_OVERHEAD = 0.05         # seconds kept back for the GUI and process start-up
+MIN_MOVE_TIME = 0.05
+STOP_RETRY_INTERVAL = 0.05   # seconds between engine_stop calls while a native search ignores them
+
+GO_INT_PARAMS = ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes", "mate")
+GO_FLAGS = ("infinite", "ponder")
+
+
+def parse_go(tokens):
+    """'go' arguments -> dict of the integer parameters plus the flags set to True."""
+    params = {}
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token in GO_FLAGS:
+            params[token] = True
+        elif token in GO_INT_PARAMS and index + 1 < len(tokens):
+            try:
+                params[token] = int(tokens[index + 1])
+            except ValueError:
+                pass
+            index += 1
+        index += 1
+    return params
+
+
+def time_budget(params, white):
+    """Seconds to spend on this move (None: no time limit)."""
+    if "movetime" in params:
+        return max(MIN_MOVE_TIME, params["movetime"] / 1000.0 - MOVE_OVERHEAD)
+    remaining = params.get("wtime" if white else "btime")
+    if remaining is None:
+        return None
+    remaining /= 1000.0
+    increment = params.get("winc" if white else "binc", 0) / 1000.0
+    moves_to_go = params.get("movestogo") or DEFAULT_MOVES_TO_GO
+    budget = remaining / moves_to_go + increment * INCREMENT_SHARE
+    budget = min(budget, remaining * MAX_TIME_SHARE, remaining - MOVE_OVERHEAD)
+    return max(MIN_MOVE_TIME, budget)
+
+
+# ---------------------------
+# Output helpers
+# ---------------------------
+
+def uci_move(name):
+    """'E7E8Q' (engine key format) -> 'e7e8q'."""
+    return name.lower()
+
+
+def uci_score(score):
+    """Side-to-move score -> 'cp 35' or 'mate 3' / 'mate -2' (moves, not plies)."""
+    if abs(score) >= engine.MATE_BOUND:
+        plies = engine.MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return "mate %d" % (moves if score > 0 else -moves)
+    return "cp %d" % score
+
+
+def native_score(score, depth):
+    """
+    native.best_move's score as an engine.py score for uci_score. The C++ search reports a
+    mate (native.MATE_CP after clamping) without its distance, so it becomes a mate in at
+    most depth plies.
+    """
+    if abs(score) >= native.MATE_CP:
+        return engine.MATE_SCORE - depth if score > 0 else depth - engine.MATE_SCORE
+    return score
+
+
+# ---------------------------
+# Native library
+# ---------------------------
+
+def load_native():
+    """The C++ engine library with its entry points declared (see native.load_library), or None."""
+    return native.load_library("engine", ("get_best_move_fen",))
+
+
+# ---------------------------
+# Protocol
+# ---------------------------
+
+class UciEngine:
+    """One UCI session: the current position, the options and the search thread."""
+
+    def __init__(self, threads=None, hash_mb=engine.DEFAULT_HASH_MB, parallel=engine.PARALLEL_SPLIT,
+                 backend=None, native_lib=None, native_depth=4, out=None):
+        self.threads = threads or engine.mp.cpu_count()
+        self.hash_mb = hash_mb
+        self.parallel = parallel
+        self.backend = backend
+        self.native_lib = native_lib
+        self.native_handle = None
+        self.open_native(threads or 0)
+        self.native_depth = native_depth
+        self.out = out or sys.stdout
+        self.out_lock = threading.Lock()
+        self.pool = None
+        self.position = engine.Position.from_fen(engine.START_FEN)
+        self.search_thread = None
+        self.stop_event = threading.Event()
+        self.release = threading.Event()     # set when a ponder/infinite search may report bestmove
+        self.stop_timer = None
+        self.go_params = {}
+        self.pv = []
+
+    def send(self, line):
+        with self.out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    # --- commands ---------------------------------------------------------
+
+    def handle(self, line):
+        """Run one command line; returns False on quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        cmd, args = tokens[0], tokens[1:]
+        if cmd == "uci":
+            self.send("id name " + ENGINE_NAME + (" (native)" if self.native_lib else ""))
+            self.send("id author " + ENGINE_AUTHOR)
+            self.send("option name Hash type spin default %d min 0 max 4096" % self.hash_mb)
+            self.send("option name Threads type spin default %d min 1 max 256" % self.threads)
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif cmd == "isready":
+            self.send("readyok")
+        elif cmd == "setoption":
+            self.set_option(args)
+        elif cmd == "ucinewgame":
+            self.finish()
+            if self.native_handle is not None and hasattr(self.native_lib, "engine_new_game"):
+                self.native_lib.engine_new_game(self.native_handle)
+            self.set_position(["startpos"])
+        elif cmd == "position":
+            self.finish()
+            self.set_position(args)
+        elif cmd == "go":
+            self.finish()
+            self.go(parse_go(args))
+        elif cmd == "stop":
+            self.stop()
+        elif cmd == "ponderhit":
+            self.ponderhit()
+        elif cmd == "quit":
+            self.stop()
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+            if self.native_handle is not None:
+                self.native_lib.engine_destroy(self.native_handle)
+                self.native_handle = None
+            return False
+        # debug, register and unknown commands are ignored, as the protocol asks
+        return True
+
+    def set_option(self, args):
+        if "name" not in args:
+            return
+        rest = args[args.index("name") + 1:]
+        if "value" in rest:
+            name = " ".join(rest[:rest.index("value")]).lower()
+            value = " ".join(rest[rest.index("value") + 1:])
+        else:
+            name, value = " ".join(rest).lower(), ""
+        try:
+            if name == "hash":
+                self.hash_mb = max(0, int(value))
+            elif name == "threads":
+                self.threads = max(1, int(value))
+            else:
+                return
+        except ValueError:
+            return
+        # the pool is rebuilt with the new size on the next search, the native handle now
+        self.finish()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        if name == "hash":
+            self.set_native_hash()
+        elif self.native_handle is not None:
+            self.open_native(self.threads)
+
+    def open_native(self, threads):
+        """(Re)create the native engine handle with threads search threads (0: one per core)."""
+        if self.native_handle is not None:
+            self.native_lib.engine_destroy(self.native_handle)
+            self.native_handle = None
+        if self.native_lib is not None:
+            self.native_handle = native.create_handle(self.native_lib, threads, self.hash_mb)
+
+    def set_native_hash(self):
+        """Size the native handle's transposition table to the Hash option."""
+        if self.native_handle is not None and hasattr(self.native_lib, "engine_set_hash"):
+            self.native_lib.engine_set_hash(self.native_handle, self.hash_mb)
+
+    def set_position(self, args):
+        if not args:
+            return
+        moves = []
+        if "moves" in args:
+            moves = args[args.index("moves") + 1:]
+            args = args[:args.index("moves")]
+        if args[0] == "startpos":
+            fen = engine.START_FEN
+        elif args[0] == "fen":
+            fen = " ".join(args[1:])
+        else:
+            return
+        try:
+            board, color, rights, ep = engine.from_fen(fen)[:4]
+        except ValueError as exc:
+            self.send("info string bad fen: %s" % exc)
+            return
+        pos = engine.Position.from_dict(board, color, rights, ep)
+        for text in moves:
+            legal = {engine.move_name(move): move for move in pos.legal_moves()}
+            move = legal.get(text.upper())
+            if move is None:
+                self.send("info string illegal move %s" % text)
+                break
+            pos.make_move(move)
+        self.position = pos
+
+    def go(self, params):
+        self.go_params = params
+        self.pv = []
+        self.stop_event = threading.Event()
+        self.release = threading.Event()
+        if not (params.get("ponder") or params.get("infinite")):
+            self.release.set()
+        if not self.native_lib:
+            # start the workers here: forking from the search thread while the main thread
+            # sits in a stdin read would leave the children stuck on the stdin lock
+            self._pool()
+        target = self._search_native if self.native_lib else self._search
+        self.search_thread = threading.Thread(target=target, args=(params, self.stop_event, self.release),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def stop(self):
+        """Stop the running search (if any) and wait for its bestmove."""
+        if self.stop_timer is not None:
+            self.stop_timer.cancel()
+            self.stop_timer = None
+        if self.search_thread is None:
+            return
+        self._request_stop()
+        self.release.set()
+        self.search_thread.join(STOP_RETRY_INTERVAL)
+        while self.search_thread.is_alive():
+            # engine_stop only reaches a native search that has started: say it again
+            self._request_stop()
+            self.search_thread.join(STOP_RETRY_INTERVAL)
+        self.search_thread = None
+
+    def finish(self):
+        """Let a timed or fixed-depth search run to its bestmove; ponder/infinite ones are stopped."""
+        if self.search_thread is not None and not self.release.is_set():
+            self.stop()
+        elif self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def ponderhit(self):
+        """The opponent played the expected move: keep searching, now on our own clock."""
+        params = dict(self.go_params)
+        params.pop("ponder", None)
+        self.go_params = params
+        budget = None if params.get("infinite") else time_budget(params, self.position.side == engine.WHITE)
+        if budget is None:
+            if not params.get("infinite"):
+                self.release.set()   # no clock given: finish the search as a plain "go"
+            return
+        self.stop_timer = threading.Timer(budget, self._request_stop)
+        self.stop_timer.daemon = True
+        self.stop_timer.start()
+        self.release.set()
+
+    # --- search threads -----------------------------------------------------
+
+    def _request_stop(self):
+        self.stop_event.set()
+        if self.native_handle is not None:
+            self.native_lib.engine_stop(self.native_handle)
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = engine.WorkerPool(self.threads, self.hash_mb, self.parallel)
+        return self.pool
+
+    def _info(self, depth, score, line, nodes, seconds):
+        self.pv = [engine.move_name(move) for move in line]
+        ms = int(seconds * 1000)
+        nps = int(nodes / seconds) if seconds > 0 else 0
+        self.send("info depth %d score %s nodes %d nps %d time %d pv %s"
+                  % (depth, uci_score(score), nodes, nps, ms, " ".join(uci_move(name) for name in self.pv)))
+
+    def _search(self, params, stop_event, release):
+        pos = self.position
+        waiting = params.get("ponder") or params.get("infinite")
+        time_limit = None if waiting else time_budget(params, pos.side == engine.WHITE)
+        try:
+            from_sq, to_sq, _ = engine.engine_search(
+                pos.to_dict(), pos.color, params.get("depth"), time_limit=time_limit,
+                castling_rights=pos.castling_rights_dict(), en_passant_target=pos.en_passant_square(),
+                pool=self._pool(), backend=self.backend, stop_event=stop_event, info=self._info,
+                max_nodes=params.get("nodes"))
+        except Exception as exc:   # report and still answer with a move, GUIs wait for one
+            self.send("info string search failed: %r" % (exc,))
+            from_sq = to_sq = None
+        release.wait()
+        self._send_bestmove(from_sq + to_sq if from_sq else None)
+
+    def _search_native(self, params, stop_event, release):
+        depth = params.get("depth") or self.native_depth
+        waiting = params.get("ponder") or params.get("infinite")
+        time_limit = None if waiting else time_budget(params, self.position.side == engine.WHITE)
+        start = time.time()
+        name, score = native.best_move(self.native_lib, self.position, depth, self.native_handle, time_limit)
+        seconds = time.time() - start
+        if name is None and self.position.legal_moves():
+            # cut short before any root move finished: any legal move beats none
+            name = engine.move_name(self.position.legal_moves()[0])
+        elif name is not None:
+            self.pv = [name]
+            self.send("info depth %d score %s time %d pv %s"
+                      % (depth, uci_score(native_score(score, depth)), int(seconds * 1000), uci_move(name)))
+        release.wait()
+        self._send_bestmove(name)
+
+    def _send_bestmove(self, name):
+        if name is None:
+            self.send("bestmove 0000")
+            return
+        line = "bestmove " + uci_move(name)
+        if len(self.pv) > 1 and self.pv[0] == name:
+            line += " ponder " + uci_move(self.pv[1])
+        self.send(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UCI front-end for the chess engine")
+    parser.add_argument("--threads", type=int, default=None, help="search processes (default: cpu count)")
+    parser.add_argument("--hash", type=int, default=engine.DEFAULT_HASH_MB, help="hash size in MB")
+    parser.add_argument("--parallel", choices=engine.PARALLEL_MODES, default=engine.PARALLEL_SPLIT)
+    parser.add_argument("--backend", choices=engine.BOARD_BACKENDS, default=engine.BACKEND_MAILBOX)
+    parser.add_argument("--native", action="store_true", help="search with the C++ library")
+    parser.add_argument("--native-depth", type=int, default=4, help="--native: depth when go gives none")
+    args = parser.parse_args()
+
+    native_lib = None
+    if args.native:
+        native_lib = load_native()
+        if native_lib is None:
+            sys.exit("no engine library with get_best_move_fen found (set CHESS_ENGINE_LIB)")
+    uci = UciEngine(args.threads, args.hash, args.parallel, args.backend, native_lib, args.native_depth)
+    try:
+        for line in sys.stdin:
+            if not uci.handle(line):
+                break
+    finally:
+        uci.handle("quit")
+
+
+if __name__ == "__main__":
+    main()